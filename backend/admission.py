@@ -0,0 +1,110 @@
+"""
+Допуск запросов к обработке.
+
+Одновременно выполняется не больше max_active обработок; ожидающих – не
+больше max_waiting, и каждый ждёт не дольше wait_timeout. Кроме числа слотов
+учитывается оценка памяти: стоимость обработки считается по размерам
+загрузок (xlsx в памяти openpyxl занимает в десятки раз больше, чем на
+диске), и сумма стоимостей выполняемых обработок не превышает memory_budget.
+Когда мест нет, запрос получает 429 с Retry-After; обработка, которая сама
+по себе больше бюджета, – 413.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+
+# Оценка памяти: байт в памяти на байт загрузки + постоянная часть на обработку
+MEMORY_PER_UPLOAD_BYTE = 30
+MEMORY_BASE_COST = 64 * 1024 * 1024
+
+
+def estimate_cost(sizes: Iterable[int]) -> int:
+    """Оценка памяти обработки по размерам загруженных файлов."""
+    return MEMORY_BASE_COST + MEMORY_PER_UPLOAD_BYTE * sum(sizes)
+
+
+def physical_memory() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class Admission:
+    """Слоты обработки с ограниченной очередью ожидания и бюджетом памяти."""
+
+    def __init__(self, max_active: int, max_waiting: int, memory_budget: int,
+                 wait_timeout: float, retry_after: int):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.memory_budget = memory_budget
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiting = 0
+        self._reserved = 0
+        self._cond = asyncio.Condition()
+
+    def _fits(self, cost: int) -> bool:
+        if self._active >= self.max_active:
+            return False
+        # Первая обработка допускается всегда, если она укладывается в бюджет сама по себе
+        return self._active == 0 or self._reserved + cost <= self.memory_budget
+
+    def _reject(self, detail: str):
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+    def check(self, cost: int):
+        """Проверка до постановки в очередь: 413 – больше бюджета, 429 – очередь заполнена."""
+        if cost > self.memory_budget:
+            raise HTTPException(status_code=413, detail=(
+                f"Файлы слишком велики для обработки: оценка {cost // (1024 * 1024)} МБ памяти "
+                f"при бюджете {self.memory_budget // (1024 * 1024)} МБ"))
+        if self._waiting >= self.max_waiting and not self._fits(cost):
+            self._reject("Сервер занят: очередь обработки заполнена. Повторите позже.")
+
+    @asynccontextmanager
+    async def slot(self, cost: int, queued: bool = False):
+        """Занимает слот на время обработки.
+
+        queued=True – для уже принятой работы (фоновые задания, отчёты пакета):
+        ждёт без ограничения по времени и не учитывается в max_waiting.
+        """
+        if not queued:
+            self.check(cost)
+        else:
+            cost = min(cost, self.memory_budget)
+        async with self._cond:
+            if not self._fits(cost):
+                if not queued:
+                    self._waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait_for(lambda: self._fits(cost)),
+                                           None if queued else self.wait_timeout)
+                except asyncio.TimeoutError:
+                    self._reject("Сервер занят: обработка не началась за отведённое время. Повторите позже.")
+                finally:
+                    if not queued:
+                        self._waiting -= 1
+            self._active += 1
+            self._reserved += cost
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._active -= 1
+                self._reserved -= cost
+                self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_active": self.max_active,
+            "max_waiting": self.max_waiting,
+            "reserved_bytes": self._reserved,
+            "memory_budget_bytes": self.memory_budget,
+        }
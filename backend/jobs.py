@@ -0,0 +1,185 @@
+"""
+Фоновые задания обработки отчётов.
+
+JobStore хранит состояние заданий (очередь → выполнение → готово/ошибка),
+текущий этап и прогресс, а результаты пишет на локальный диск. Готовые
+результаты удаляются по истечении TTL и при превышении общего объёма
+(сначала самые старые).
+"""
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+FINISHED_STATES = (STATE_DONE, STATE_FAILED, STATE_CANCELLED)
+
+
+class JobStore:
+    """Реестр заданий в памяти процесса + файлы результатов в results_dir."""
+
+    def __init__(self, results_dir: str, ttl_seconds: float, max_total_bytes: int, max_active: int):
+        self.results_dir = results_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.max_active = max_active
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        os.makedirs(results_dir, exist_ok=True)
+
+    # ------------------- Жизненный цикл -------------------
+
+    def create(self, kind: str, **meta) -> Optional[dict]:
+        """Регистрирует задание; None, если активных заданий уже max_active."""
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j["state"] not in FINISHED_STATES)
+            if active >= self.max_active:
+                return None
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "kind": kind,
+                "state": STATE_QUEUED,
+                "stage": "queued",
+                "done": None,
+                "total": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "result_path": None,
+                "result_size": 0,
+                "media_type": None,
+                "filename": None,
+                "version": 0,  # увеличивается при каждом изменении (по нему поток событий замечает обновления)
+                **meta,
+            }
+            self._jobs[job_id] = job
+            return dict(job)
+
+    def start(self, job_id: str, **meta):
+        """Задание начало выполняться; meta – уточнённые при запуске поля (например, cache)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(meta)
+                job["state"] = STATE_RUNNING
+                job["stage"] = "started"
+                job["started_at"] = time.time()
+                job["version"] += 1
+
+    def update_progress(self, job_id: str, stage: str, done: Optional[int] = None, total: Optional[int] = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["state"] == STATE_RUNNING:
+                job["stage"] = stage
+                job["done"] = done
+                job["total"] = total
+                job["version"] += 1
+
+    def finish(self, job_id: str, chunks: Iterable[bytes], media_type: str, filename: str):
+        """Пишет результат на диск и помечает задание готовым."""
+        path = os.path.join(self.results_dir, job_id)
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] == STATE_CANCELLED:
+                # задание успели удалить или отменить – результат никому не нужен
+                os.remove(path)
+                return
+            job.update(state=STATE_DONE, stage="done", finished_at=time.time(), result_path=path,
+                       result_size=size, media_type=media_type, filename=filename, version=job["version"] + 1)
+        self.evict()
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(state=STATE_FAILED, stage="failed", finished_at=time.time(), error=error,
+                           version=job["version"] + 1)
+
+    def cancel(self, job_id: str) -> bool:
+        """Помечает незавершённое задание отменённым."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] in FINISHED_STATES:
+                return False
+            job.update(state=STATE_CANCELLED, stage="cancelled", finished_at=time.time(),
+                       version=job["version"] + 1)
+            return True
+
+    def remove(self, job_id: str) -> bool:
+        """Удаляет задание вместе с файлом результата."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return False
+        if job["result_path"] and os.path.exists(job["result_path"]):
+            os.remove(job["result_path"])
+        return True
+
+    # ------------------- Чтение -------------------
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def counts(self) -> Dict[str, int]:
+        """Число заданий по состояниям (для метрик)."""
+        counts = {state: 0 for state in (STATE_QUEUED, STATE_RUNNING, STATE_DONE, STATE_FAILED, STATE_CANCELLED)}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+        return counts
+
+    def public_view(self, job: dict) -> dict:
+        """Состояние задания для ответа API (без путей на диске)."""
+        done, total = job["done"], job["total"]
+        percent = round(100.0 * done / total, 1) if done is not None and total else None
+        if job["state"] == STATE_DONE:
+            percent = 100.0
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "state": job["state"],
+            "stage": job["stage"],
+            "progress": {"done": done, "total": total, "percent": percent},
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "error": job["error"],
+            "result_size": job["result_size"] if job["state"] == STATE_DONE else None,
+        }
+
+    # ------------------- Очистка -------------------
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Удаляет просроченные задания и самые старые результаты сверх лимита объёма."""
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job["state"] in FINISHED_STATES and now - job["finished_at"] > self.ttl_seconds:
+                    removed.append(self._jobs.pop(job_id))
+            finished = sorted((j for j in self._jobs.values() if j["state"] == STATE_DONE),
+                              key=lambda j: j["finished_at"])
+            total = sum(j["result_size"] for j in finished)
+            for job in finished:
+                if total <= self.max_total_bytes:
+                    break
+                total -= job["result_size"]
+                removed.append(self._jobs.pop(job["id"]))
+        for job in removed:
+            if job["result_path"] and os.path.exists(job["result_path"]):
+                os.remove(job["result_path"])
+        return len(removed)
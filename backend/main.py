@@ -1,7 +1,12 @@
 import sys
 from pathlib import Path
 from io import BytesIO
+import asyncio
+import json
+import time
 import traceback
+import zipfile
+from contextlib import asynccontextmanager
 
 # Добавляем корневую директорию в путь для импортов
 current_dir = Path(__file__).parent
@@ -9,27 +14,98 @@ project_root = current_dir.parent
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(current_dir))
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from typing import List, Optional
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-# Импортируем процессоры
-try:
-    from processors import processor_rus, processor_foreign, processor_third
-except ImportError as e:
-    print(f"Ошибка импорта процессоров: {e}")
-    # Создаем заглушки для отладки
-    class MockProcessor:
-        @staticmethod
-        def process(schedule_bytes, report_bytes, params):
-            raise HTTPException(500, "Процессор не загружен")
+from processors import processor_rus
+from processors.results import OUTPUT_FORMATS, OUTPUT_JSON, OUTPUT_CSV, OUTPUT_BOTH, iter_ndjson, iter_csv
+from processors.results import ProcessingCancelled
+from processors.xlsx_io import resolve_compression
+from processors.processor_rus import index_stats
+from processors import PROCESSOR_VERSION
+from processors.stage_timer import StageTimer
+
+import config
+from admission import Admission, estimate_cost, physical_memory
+from jobs import JobStore, FINISHED_STATES, STATE_CANCELLED, STATE_DONE, STATE_FAILED, STATE_QUEUED
+import metrics
+from profiling import (PROFILE_RETURNS, PROFILE_RETURN_REPORT, PROFILE_RETURN_STATS, PROFILE_RETURN_TABLE,
+                       ProfileStore, check_admin)
+from result_cache import CACHE_HIT, CACHE_MISS, ResultCache, make_key
+from schedule_store import ScheduleStore
+from uploads import SpooledUpload, cleanup_uploads, spool_upload
+from worker_pool import WorkerPool, build_index, run_processor, run_profiled
+
+# Фоновые задания: состояние в памяти, результаты на диске с TTL и лимитом объёма
+job_store = JobStore(config.JOBS_DIR, config.JOB_RESULT_TTL, config.JOB_RESULTS_MAX_BYTES, config.JOB_QUEUE_LIMIT)
+
+# Кэш результатов: повторный запрос с теми же файлами и параметрами отдаётся с диска
+result_cache = ResultCache(config.RESULT_CACHE_DIR, config.RESULT_CACHE_TTL, config.RESULT_CACHE_MAX_BYTES)
+
+# Разобранные сетки для повторного использования по schedule_id (LRU в памяти)
+schedule_store = ScheduleStore(config.SCHEDULE_CACHE_SIZE)
+
+# Профили запросов с profile=1 (только для администратора): каталог с лимитом числа и объёма
+profile_store = ProfileStore(config.PROFILES_DIR, config.PROFILES_MAX_COUNT, config.PROFILES_MAX_BYTES)
+
+# Пул процессов обработки: создаётся при старте, чтобы сопоставление не блокировало цикл событий
+worker_pool = WorkerPool(config.PROCESS_WORKERS, on_progress=job_store.update_progress)
 
-    processor_rus = MockProcessor()
-    processor_foreign = MockProcessor()
-    processor_third = MockProcessor()
+# Допуск к обработке: не больше слотов, чем процессов пула, и оценка памяти по размерам загрузок
+admission = Admission(
+    max_active=config.ADMISSION_MAX_ACTIVE or max(worker_pool.workers, 1),
+    max_waiting=config.ADMISSION_MAX_WAITING,
+    memory_budget=config.ADMISSION_MEMORY_BUDGET or int((physical_memory() or 4 * 1024 ** 3) * 0.6),
+    wait_timeout=config.ADMISSION_WAIT_TIMEOUT,
+    retry_after=config.ADMISSION_RETRY_AFTER,
+)
+
+# Метрики «на момент опроса»: очередь обработки, задания, кэш результатов, сетки
+metrics.REGISTRY.callback("vyborg_pool_workers", "Процессов в пуле обработки", lambda: worker_pool.workers)
+metrics.REGISTRY.callback("vyborg_admission_active", "Выполняемые обработки",
+                          lambda: admission.snapshot()["active"])
+metrics.REGISTRY.callback("vyborg_admission_waiting", "Запросы, ожидающие слота обработки (глубина очереди)",
+                          lambda: admission.snapshot()["waiting"])
+metrics.REGISTRY.callback("vyborg_admission_reserved_bytes", "Оценка памяти выполняемых обработок",
+                          lambda: admission.snapshot()["reserved_bytes"])
+metrics.REGISTRY.callback("vyborg_jobs", "Фоновые задания по состояниям", job_store.counts, ("state",))
+metrics.REGISTRY.callback("vyborg_result_cache_requests_total", "Обращения к кэшу результатов",
+                          lambda: {"hit": result_cache.info()["hits"], "miss": result_cache.info()["misses"]},
+                          ("result",), kind="counter")
+metrics.REGISTRY.callback("vyborg_result_cache_bytes", "Объём кэша результатов на диске",
+                          lambda: result_cache.info()["bytes"])
+metrics.REGISTRY.callback("vyborg_schedules_stored", "Сеток, сохранённых через /api/schedules",
+                          lambda: len(schedule_store))
+
+
+async def _evict_periodically():
+    while True:
+        await asyncio.sleep(config.JOB_EVICT_INTERVAL)
+        removed = job_store.evict()
+        if removed:
+            print(f"Удалено просроченных заданий: {removed}")
+        removed = await asyncio.to_thread(result_cache.evict)
+        if removed:
+            print(f"Удалено записей кэша результатов: {removed}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_pool.start()
+    evict_task = asyncio.create_task(_evict_periodically())
+    try:
+        yield
+    finally:
+        evict_task.cancel()
+        worker_pool.shutdown()
 
-app = FastAPI(title="Обработка отчётов", description="API для обработки отчётов российских и иностранных передач")
+
+app = FastAPI(title="Обработка отчётов", description="API для обработки отчётов российских и иностранных передач",
+              lifespan=lifespan)
 
 # Добавляем CORS middleware
 app.add_middleware(
@@ -41,170 +117,941 @@ app.add_middleware(
 )
 
 
-@app.post("/api/process/rus")
-async def process_rus_report(
+
+class RequestSizeLimit:
+    """Отклоняет слишком большие запросы по Content-Length до разбора multipart.
+
+    Обычный ASGI-слой, а не @app.middleware("http"): BaseHTTPMiddleware подменяет канал
+    receive, и request.is_disconnected() в обработчиках не видит отключения клиента
+    (см. _run_until_disconnect).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > config.MAX_REQUEST_SIZE:
+                response = JSONResponse(status_code=413, content={
+                    "detail": f"Запрос больше {config.MAX_REQUEST_SIZE // (1024 * 1024)} МБ"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(RequestSizeLimit)
+
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _validate_output(output: str) -> str:
+    output = (output or "xlsx").strip().lower()
+    if output not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output должен быть одним из: {', '.join(OUTPUT_FORMATS)}")
+    return output
+
+
+def _validate_compression(compression: str) -> str:
+    try:
+        name, _ = resolve_compression(compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return name
+
+
+def _add_counts(total: dict, counts: dict) -> dict:
+    """Прибавляет счётчики counts к total (вложенные словари – рекурсивно)."""
+    for name, value in counts.items():
+        if isinstance(value, dict):
+            _add_counts(total.setdefault(name, {}), value)
+        elif isinstance(value, (int, float)):
+            total[name] = total.get(name, 0) + value
+    return total
+
+
+class RequestLog:
+    """Замеры этапов одного запроса: заголовок Server-Timing и одна JSON-строка в лог."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.timer = StageTimer()
+        self.status = 500
+        self.fields = {}
+        self.strategies = {}
+        self.matcher = None
+        self._started = time.perf_counter()
+
+    def record(self, result):
+        """Этапы обработки из воркера и итоги сопоставления; у пакета – суммы по всем отчётам."""
+        self.timer.merge(result.stats.get("timings", {}))
+        _add_counts(self.strategies, result.stats.get("strategies", {}))
+        if result.stats.get("matcher"):
+            self.matcher = _add_counts(self.matcher or {}, result.stats["matcher"])
+        _add_counts(self.fields, {k: result.stats[k] for k in ("matched", "unmatched", "total_rows")
+                                  if k in result.stats})
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self._started) * 1000
+        return ", ".join(filter(None, [self.timer.server_timing(), f"total;dur={total:.1f}"]))
+
+    def emit(self):
+        total = time.perf_counter() - self._started
+        print(json.dumps({
+            "event": "request",
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "total_ms": round(total * 1000, 1),
+            "stages_ms": self.timer.as_ms(),
+            **self.fields,
+            **({"matcher": self.matcher} if self.matcher else {}),
+        }, ensure_ascii=False))
+        metrics.observe_request(self.endpoint, self.status, total, self.timer.as_dict(),
+                                self.fields.get("report_bytes"), self.strategies, self.matcher)
+
+
+def _save_headers(result) -> dict:
+    """Заголовки со статистикой сохранения xlsx: уровень сжатия, сэкономленные байты и время."""
+    save = result.stats.get("save") if result.stats else None
+    if not save:
+        return {}
+    return {
+        "X-Xlsx-Compression": save["compression"],
+        "X-Xlsx-Bytes": str(save["bytes"]),
+        "X-Xlsx-Bytes-Saved": str(save["saved_bytes"]),
+        "X-Xlsx-Save-Time-Ms": f"{save['seconds'] * 1000:.1f}",
+    }
+
+
+def _matcher_headers(result) -> dict:
+    """Счётчики matcher этой обработки: X-Matcher-Stats и X-Matcher-Strategies ('имя=значение, ...')."""
+    matcher = result.stats.get("matcher") if result.stats else None
+    if not matcher:
+        return {}
+    norm_cache = matcher.get("norm_cache", {})
+    counts = {k: v for k, v in matcher.items() if isinstance(v, int)}
+    counts.update(norm_cache_hits=norm_cache.get("hits", 0), norm_cache_misses=norm_cache.get("misses", 0))
+    return {
+        "X-Matcher-Stats": ", ".join(f"{k}={v}" for k, v in counts.items()),
+        "X-Matcher-Strategies": ", ".join(f"{k}={v}" for k, v in matcher["strategies"].items()) or "none",
+    }
+
+
+def _render_result(result, output: str, filename_stem: str):
+    """Результат в запрошенном формате: (поток байтов, media_type, имя файла)."""
+    if output == OUTPUT_JSON:
+        return iter_ndjson(result.records), "application/x-ndjson", f"{filename_stem}.jsonl"
+    if output == OUTPUT_CSV:
+        return iter_csv(result.records), "text/csv; charset=utf-8", f"{filename_stem}.csv"
+    if output == OUTPUT_BOTH:
+        mem = BytesIO()
+        with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f"{filename_stem}.xlsx", result.xlsx)
+            zf.writestr(f"{filename_stem}.jsonl", b"".join(iter_ndjson(result.records)))
+        return [mem.getvalue()], "application/zip", f"{filename_stem}.zip"
+    return [result.xlsx], XLSX_MEDIA_TYPE, f"{filename_stem}.xlsx"
+
+
+async def _result_response(result, output: str, filename_stem: str, cache_key: Optional[str] = None,
+                           req: Optional[RequestLog] = None) -> StreamingResponse:
+    """Отдаёт результат обработки в запрошенном формате (xlsx, JSON Lines, CSV или zip с xlsx и JSON).
+
+    С cache_key результат сохраняется в кэш результатов; req добавляет заголовок Server-Timing.
+    """
+    chunks, media_type, filename = _render_result(result, output, filename_stem)
+    save_headers = _save_headers(result) if output not in (OUTPUT_JSON, OUTPUT_CSV) else {}
+    headers = {"Content-Disposition": f"attachment; filename={filename}", **save_headers}
+    if cache_key is not None:
+        chunks = list(chunks)
+        await asyncio.to_thread(result_cache.put, cache_key, chunks, media_type, filename, save_headers)
+        headers["X-Cache"] = CACHE_MISS
+    # Счётчики matcher – только у свежей обработки (в кэш результатов не сохраняются)
+    headers.update(_matcher_headers(result))
+    if req is not None:
+        req.record(result)
+        req.status = 200
+        req.fields["cache"] = headers.get("X-Cache")
+        headers["Server-Timing"] = req.server_timing()
+    return StreamingResponse(iter(chunks), media_type=media_type, headers=headers)
+
+
+async def _run_until_disconnect(request: Request, req: RequestLog, cost: int, *args, profile: Optional[dict] = None):
+    """run_processor(*args) в слоте допуска; если клиент отключился, обработка отменяется.
+
+    Пока запрос ждёт слота, ожидание просто прерывается; если обработка уже
+    идёт в пуле, выставляется токен отмены, и процессор останавливается на
+    ближайшей проверке, освобождая воркер. Ответ в этом случае – 499.
+    profile – параметры профилирования (см. _profile_options); тогда обработка идёт под run_profiled.
+    """
+    cancel = worker_pool.cancel_token()
+    dispatched = False
+    disconnected = False
+
+    async def work():
+        nonlocal dispatched
+        waited = time.perf_counter()
+        async with admission.slot(cost):
+            req.timer.add("queue", time.perf_counter() - waited)
+            dispatched = True
+            if profile is not None:
+                return await worker_pool.run(run_profiled, profile, *args, cancel)
+            return await worker_pool.run(run_processor, *args, cancel)
+
+    task = asyncio.create_task(work())
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=config.DISCONNECT_CHECK_INTERVAL)
+            if not task.done() and await request.is_disconnected():
+                disconnected = True
+                print(f"Клиент отключился – обработка {req.endpoint} отменяется")
+                if dispatched:
+                    cancel.set()
+                else:
+                    task.cancel()
+                break
+        return await task
+    except ProcessingCancelled:
+        raise HTTPException(status_code=499, detail="Обработка отменена: клиент отключился")
+    except asyncio.CancelledError:
+        if disconnected and task.cancelled():
+            raise HTTPException(status_code=499, detail="Обработка отменена: клиент отключился")
+        cancel.set()
+        raise
+
+
+def _require_admin(request: Request):
+    if not check_admin(request.headers.get("x-admin-token"), config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Профилирование доступно только администратору")
+
+
+def _validate_profile_return(profile_return: str) -> str:
+    profile_return = (profile_return or "").strip().lower()
+    if profile_return not in PROFILE_RETURNS:
+        raise HTTPException(status_code=400,
+                            detail=f"profile_return должен быть одним из: {', '.join(PROFILE_RETURNS)}")
+    return profile_return
+
+
+def _profile_options(request: Request, profile: bool, profile_memory: bool, profile_return: str) -> Optional[dict]:
+    """Параметры профилирования для run_profiled или None, если профиль не запрошен.
+
+    Профилировать может только администратор (заголовок X-Admin-Token).
+    """
+    if not profile:
+        return None
+    _require_admin(request)
+    return {"dir": profile_store.profile_dir, "id": profile_store.new_id(), "memory": profile_memory,
+            "top_n": config.PROFILE_TOP_N, "return": _validate_profile_return(profile_return)}
+
+
+def _profile_headers(result) -> dict:
+    info = result.stats["profile"]
+    headers = {"X-Profile-Id": info["id"], "X-Profile-Time-Ms": f"{info['seconds'] * 1000:.1f}"}
+    if "peak_bytes" in info:
+        headers["X-Profile-Peak-Bytes"] = str(info["peak_bytes"])
+    return headers
+
+
+async def _profiled_response(result, profile: dict, output: str, filename_stem: str, req: RequestLog):
+    """Ответ на запрос с profile=1: отчёт, таблица топ-N или файл .prof (profile_return)."""
+    await asyncio.to_thread(profile_store.evict, profile["id"])
+    print(f"Профиль запроса {req.endpoint} сохранён: {profile['id']}")
+    headers = {**_profile_headers(result), **_matcher_headers(result)}
+    if profile["return"] == PROFILE_RETURN_REPORT:
+        response = await _result_response(result, output, filename_stem, req=req)
+        response.headers.update(headers)
+        return response
+    # Таблица или файл профиля вместо отчёта
+    req.record(result)
+    req.status = 200
+    headers["Server-Timing"] = req.server_timing()
+    paths = profile_store.paths(profile["id"])
+    if paths is None:
+        raise HTTPException(status_code=410, detail="Профиль запроса уже удалён по лимиту")
+    prof_path, txt_path = paths
+    if profile["return"] == PROFILE_RETURN_TABLE:
+        return FileResponse(txt_path, media_type="text/plain; charset=utf-8", headers=headers)
+    return FileResponse(prof_path, media_type="application/octet-stream",
+                        filename=f"profile_{profile['id']}.prof", headers=headers)
+
+
+def _cache_key(kind: str, schedule_hash: str, report: SpooledUpload, params: dict) -> str:
+    return make_key(kind, schedule_hash, report.sha256, params, PROCESSOR_VERSION)
+
+
+class _CachedFileResponse(FileResponse):
+    """Файл закреплённой записи кэша; закрепление снимается, когда ответ отправлен или прерван."""
+
+    def __init__(self, cache_key: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await asyncio.to_thread(result_cache.release, self.cache_key)
+
+
+def _cached_response(cache_key: str, entry: dict, req: RequestLog) -> FileResponse:
+    """Ответ из кэша результатов: тот же файл и заголовки, что при первой обработке.
+
+    entry – запись, закреплённая get(cache_key, pin=True): пока файл отдаётся, очистка кэша его не удалит.
+    """
+    req.status = 200
+    req.fields["cache"] = CACHE_HIT
+    headers = {**entry["headers"], "X-Cache": CACHE_HIT, "Server-Timing": req.server_timing()}
+    return _CachedFileResponse(cache_key, entry["path"], media_type=entry["media_type"],
+                               filename=entry["filename"], headers=headers)
+
+
+def _iter_file(path: str, chunk_size: int = 1024 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def _spool(upload: UploadFile, uploads: List[SpooledUpload]) -> SpooledUpload:
+    """Загрузка во временный файл; uploads – список для удаления файлов по окончании запроса."""
+    spooled = await spool_upload(upload, config.UPLOADS_DIR, config.MAX_FILE_SIZE, config.ALLOWED_EXTENSIONS)
+    uploads.append(spooled)
+    return spooled
+
+
+async def _read_schedule(schedule_file: Optional[UploadFile], schedule_id: Optional[str],
+                         uploads: List[SpooledUpload]):
+    """Сетка запроса: (путь к файлу, None, sha256) для загрузки или (None, индекс, sha256) для schedule_id."""
+    if schedule_id:
+        item = schedule_store.get(schedule_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Сетка не найдена (возможно, вытеснена). Загрузите её заново.")
+        return None, item["index"], item["sha256"]
+    if schedule_file is None:
+        raise HTTPException(status_code=400, detail="Нужен файл сетки (schedule_file) или schedule_id")
+    schedule = await _spool(schedule_file, uploads)
+    if schedule.size == 0:
+        raise HTTPException(status_code=400, detail="Файл сетки пуст")
+    return schedule.path, None, schedule.sha256
+
+
+def _upload_cost(uploads: List[SpooledUpload]) -> int:
+    return estimate_cost(u.size for u in uploads)
+
+
+def _schedule_name(schedule_file: Optional[UploadFile], schedule_id: Optional[str]) -> str:
+    return f"сетка {schedule_id}" if schedule_id else schedule_file.filename
+
+
+@app.post("/api/schedules", status_code=201)
+async def upload_schedule(
     schedule_file: UploadFile = File(..., description="Файл сетки"),
-    report_file: UploadFile = File(..., description="Файл отчёта"),
-    max_shows: int = Form(3, description="Максимальное количество показов"),
-    fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
-    min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
-    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки")
+    schedule_sheet: Optional[str] = Form(None, description="Лист сетки (по умолчанию первый)")
 ):
-    """Обработка российского отчёта"""
+    """Разбирает сетку один раз; schedule_id затем передаётся в /api/process/* вместо файла"""
+    uploads = []
     try:
-        # Валидация параметров
-        if max_shows < 1 or max_shows > 10:
-            raise HTTPException(status_code=400, detail="max_shows должен быть от 1 до 10")
+        schedule = await _spool(schedule_file, uploads)
+        if schedule.size == 0:
+            raise HTTPException(status_code=400, detail="Файл сетки пуст")
 
-        if not (0.0 <= fuzzy_cutoff <= 1.0):
-            raise HTTPException(status_code=400, detail="fuzzy_cutoff должен быть от 0.0 до 1.0")
+        started = time.perf_counter()
+        async with admission.slot(_upload_cost(uploads)):
+            matcher_index = await worker_pool.run(build_index, schedule.path, {'schedule_sheet': schedule_sheet})
+        stats = {**index_stats(matcher_index), "parse_seconds": round(time.perf_counter() - started, 3)}
+        # Лист сетки входит в хэш: от него зависит индекс, а значит и ключ кэша результатов
+        schedule_hash = f"{schedule.sha256}:{schedule_sheet}" if schedule_sheet else schedule.sha256
+        schedule_id = schedule_store.add(matcher_index, stats, schedule_file.filename, schedule_hash)
+        print(f"Сетка {schedule_file.filename} сохранена как {schedule_id}: {stats}")
+        return {"schedule_id": schedule_id, "filename": schedule_file.filename, "stats": stats}
 
-        if not (0.0 <= min_token_overlap <= 1.0):
-            raise HTTPException(status_code=400, detail="min_token_overlap должен быть от 0.0 до 1.0")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ошибка разбора сетки: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка разбора сетки: {str(e)}")
+    finally:
+        cleanup_uploads(uploads)
 
-        # Читаем файлы
-        schedule_bytes = await schedule_file.read()
-        report_bytes = await report_file.read()
 
-        if len(schedule_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Файл сетки пуст")
+@app.get("/api/schedules/{schedule_id}")
+async def get_schedule(schedule_id: str):
+    """Статистика сохранённой сетки"""
+    item = schedule_store.get(schedule_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Сетка не найдена")
+    return {"schedule_id": schedule_id, "filename": item["filename"], "stats": item["stats"]}
+
+
+@app.delete("/api/schedules/{schedule_id}", status_code=204)
+async def delete_schedule(schedule_id: str):
+    """Удаляет сохранённую сетку"""
+    if not schedule_store.remove(schedule_id):
+        raise HTTPException(status_code=404, detail="Сетка не найдена")
+
+
+def _sheet_list(sheet_names: str) -> List[str]:
+    """Листы из формы ("лист1, лист2"); пусто – российский и иностранный."""
+    return [name.strip() for name in sheet_names.split(",") if name.strip()] or processor_rus.COMBINED_SHEET_NAMES
+
+
+def _match_params(max_shows: int, fuzzy_cutoff: float, min_token_overlap: float, delete_unmatched: bool,
+                  output: str, compression: Optional[str]) -> dict:
+    """Проверяет параметры сопоставления из формы и собирает params процессора."""
+    if max_shows < 1 or max_shows > 10:
+        raise HTTPException(status_code=400, detail="max_shows должен быть от 1 до 10")
+
+    if not (0.0 <= fuzzy_cutoff <= 1.0):
+        raise HTTPException(status_code=400, detail="fuzzy_cutoff должен быть от 0.0 до 1.0")
+
+    if not (0.0 <= min_token_overlap <= 1.0):
+        raise HTTPException(status_code=400, detail="min_token_overlap должен быть от 0.0 до 1.0")
 
-        if len(report_bytes) == 0:
+    params = {
+        'max_shows': max_shows,
+        'fuzzy_cutoff': fuzzy_cutoff,
+        'min_token_overlap': min_token_overlap,
+        'delete_unmatched': delete_unmatched,
+        'output': _validate_output(output),
+    }
+    if compression is not None:
+        params['compression'] = _validate_compression(compression)
+    return params
+
+
+async def _process_report(request: Request, endpoint: str, kind: str, description: str,
+                          schedule_file: Optional[UploadFile], schedule_id: Optional[str], report_file: UploadFile,
+                          form: dict, profile: bool, profile_memory: bool, profile_return: str,
+                          sheet_names: Optional[str] = None, cache: bool = True):
+    """Общий путь /api/process/*: проверка параметров → загрузки → кэш → обработка в пуле → ответ.
+
+    endpoint – имя в логах и метриках и ключ кэша; kind – процессор (см. run_processor);
+    description – «российского отчёта» и т.п. для сообщений; form – параметры сопоставления
+    для _match_params; sheet_names – листы (combined), cache=False – без кэша результатов.
+    """
+    uploads = []
+    req = RequestLog(endpoint)
+    filename_stem = f"report_{endpoint}_ready"
+    try:
+        params = _match_params(**form)
+        output = params['output']
+        profile_opts = _profile_options(request, profile, profile_memory, profile_return)
+        if sheet_names is not None:
+            params['sheet_names'] = _sheet_list(sheet_names)
+            description = f"листов {params['sheet_names']}"
+
+        # Загрузки пишутся во временные файлы (сетка – загруженная или сохранённая ранее по schedule_id)
+        with req.timer.stage("upload"):
+            schedule_path, matcher_index, schedule_hash = await _read_schedule(schedule_file, schedule_id, uploads)
+            report = await _spool(report_file, uploads)
+        req.fields["report_bytes"] = report.size
+
+        if report.size == 0:
             raise HTTPException(status_code=400, detail="Файл отчёта пуст")
 
-        # Параметры обработки
-        params = {
-            'max_shows': max_shows,
-            'fuzzy_cutoff': fuzzy_cutoff,
-            'min_token_overlap': min_token_overlap,
-            'delete_unmatched': delete_unmatched
-        }
+        # Тот же запрос уже обрабатывался – отдаём сохранённый результат (профилируемый обрабатывается заново)
+        cache_key = _cache_key(endpoint, schedule_hash, report, params) if cache else None
+        cached = result_cache.get(cache_key, pin=True) if cache_key is not None and profile_opts is None else None
+        if cached is not None:
+            print(f"Результат взят из кэша: {report_file.filename}")
+            return _cached_response(cache_key, cached, req)
 
         # Обрабатываем
-        print(f"Начинаем обработку российского отчёта. Файлы: {schedule_file.filename}, {report_file.filename}")
-        result_bytes = processor_rus.process(schedule_bytes, report_bytes, params)
-        print(f"Обработка завершена успешно. Размер результата: {len(result_bytes)} байт")
+        print(f"Начинаем обработку {description}. Файлы: {_schedule_name(schedule_file, schedule_id)}, {report_file.filename}")
+        try:
+            result = await _run_until_disconnect(request, req, _upload_cost(uploads),
+                                                 kind, schedule_path, report.path, params, None, matcher_index,
+                                                 profile=profile_opts)
+        except ValueError as e:
+            # неизвестные листы отчёта
+            if sheet_names is None:
+                raise
+            raise HTTPException(status_code=400, detail=str(e))
+        print(f"Обработка завершена успешно. Записей: {len(result.records)}, "
+              f"размер xlsx: {len(result.xlsx) if result.xlsx is not None else 0} байт")
 
-        # Возвращаем файл
-        return StreamingResponse(
-            BytesIO(result_bytes),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=report_rus_ready.xlsx"}
-        )
+        # Возвращаем результат в запрошенном формате
+        if profile_opts is not None:
+            return await _profiled_response(result, profile_opts, output, filename_stem, req)
+        return await _result_response(result, output, filename_stem, cache_key, req)
 
-    except HTTPException:
+    except HTTPException as e:
+        req.status = e.status_code
         raise
     except PermissionError as e:
         print(f"Ошибка доступа к файлу: {e}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Ошибка доступа к временным файлам. Попробуйте еще раз.")
     except Exception as e:
-        print(f"Ошибка обработки российского отчёта: {e}")
+        print(f"Ошибка обработки {description}: {e}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
+    finally:
+        cleanup_uploads(uploads)
+        req.emit()
+
+
+@app.post("/api/process/rus")
+async def process_rus_report(
+    request: Request,
+    schedule_file: Optional[UploadFile] = File(None, description="Файл сетки"),
+    schedule_id: Optional[str] = Form(None, description="Id сетки, загруженной через /api/schedules"),
+    report_file: UploadFile = File(..., description="Файл отчёта"),
+    max_shows: int = Form(3, description="Максимальное количество показов"),
+    fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
+    min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    compression: str = Form("default", description="Сжатие xlsx: store, fast, default, best или 0-9"),
+    profile: bool = Form(False, description="Профилировать обработку (только администратор, заголовок X-Admin-Token)"),
+    profile_memory: bool = Form(False, description="С profile: замерять и память (tracemalloc)"),
+    profile_return: str = Form("report", description="С profile: report (отчёт и X-Profile-Id), table (топ-N) или stats (файл .prof)")
+):
+    """Обработка российского отчёта"""
+    form = dict(max_shows=max_shows, fuzzy_cutoff=fuzzy_cutoff, min_token_overlap=min_token_overlap,
+                delete_unmatched=delete_unmatched, output=output, compression=compression)
+    return await _process_report(request, "rus", "rus", "российского отчёта", schedule_file, schedule_id,
+                                 report_file, form, profile, profile_memory, profile_return)
 
 
 @app.post("/api/process/foreign")
 async def process_foreign_report(
-    schedule_file: UploadFile = File(..., description="Файл сетки"),
+    request: Request,
+    schedule_file: Optional[UploadFile] = File(None, description="Файл сетки"),
+    schedule_id: Optional[str] = Form(None, description="Id сетки, загруженной через /api/schedules"),
     report_file: UploadFile = File(..., description="Файл отчёта"),
     max_shows: int = Form(3, description="Максимальное количество показов"),
     fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
     min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
-    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки")
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    compression: str = Form("default", description="Сжатие xlsx: store, fast, default, best или 0-9"),
+    profile: bool = Form(False, description="Профилировать обработку (только администратор, заголовок X-Admin-Token)"),
+    profile_memory: bool = Form(False, description="С profile: замерять и память (tracemalloc)"),
+    profile_return: str = Form("report", description="С profile: report (отчёт и X-Profile-Id), table (топ-N) или stats (файл .prof)")
 ):
     """Обработка иностранного отчёта"""
+    form = dict(max_shows=max_shows, fuzzy_cutoff=fuzzy_cutoff, min_token_overlap=min_token_overlap,
+                delete_unmatched=delete_unmatched, output=output, compression=compression)
+    return await _process_report(request, "foreign", "foreign", "иностранного отчёта", schedule_file, schedule_id,
+                                 report_file, form, profile, profile_memory, profile_return)
+
+
+@app.post("/api/process/combined")
+async def process_combined_report(
+    request: Request,
+    schedule_file: Optional[UploadFile] = File(None, description="Файл сетки"),
+    schedule_id: Optional[str] = Form(None, description="Id сетки, загруженной через /api/schedules"),
+    report_file: UploadFile = File(..., description="Файл отчёта"),
+    sheet_names: str = Form("", description="Листы через запятую (по умолчанию российский и иностранный)"),
+    max_shows: int = Form(3, description="Максимальное количество показов"),
+    fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
+    min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    compression: str = Form("default", description="Сжатие xlsx: store, fast, default, best или 0-9"),
+    profile: bool = Form(False, description="Профилировать обработку (только администратор, заголовок X-Admin-Token)"),
+    profile_memory: bool = Form(False, description="С profile: замерять и память (tracemalloc)"),
+    profile_return: str = Form("report", description="С profile: report (отчёт и X-Profile-Id), table (топ-N) или stats (файл .prof)")
+):
+    """Обработка нескольких листов отчёта за один проход (одна сетка, одна загрузка и одно сохранение книги)"""
+    form = dict(max_shows=max_shows, fuzzy_cutoff=fuzzy_cutoff, min_token_overlap=min_token_overlap,
+                delete_unmatched=delete_unmatched, output=output, compression=compression)
+    return await _process_report(request, "combined", "rus", "отчёта по листам", schedule_file, schedule_id,
+                                 report_file, form, profile, profile_memory, profile_return, sheet_names=sheet_names)
+
+
+@app.post("/api/process/third")
+async def process_third_report(
+    request: Request,
+    schedule_file: UploadFile = File(..., description="Файл сетки"),
+    report_file: UploadFile = File(..., description="Файл отчёта"),
+    max_shows: int = Form(3, description="Максимальное количество показов"),
+    fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
+    min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    profile: bool = Form(False, description="Профилировать обработку (только администратор, заголовок X-Admin-Token)"),
+    profile_memory: bool = Form(False, description="С profile: замерять и память (tracemalloc)"),
+    profile_return: str = Form("report", description="С profile: report (отчёт и X-Profile-Id), table (топ-N) или stats (файл .prof)")
+):
+    """Пока заглушка: возвращает файл отчёта без изменений."""
+    form = dict(max_shows=max_shows, fuzzy_cutoff=fuzzy_cutoff, min_token_overlap=min_token_overlap,
+                delete_unmatched=delete_unmatched, output=output, compression=None)
+    return await _process_report(request, "third", "third", "третьего отчёта", schedule_file, None,
+                                 report_file, form, profile, profile_memory, profile_return, cache=False)
+
+
+BATCH_KINDS = ("rus", "foreign")
+
+
+async def _process_batch_item(kind: str, report: SpooledUpload, params: dict, matcher_index):
+    """Один отчёт пакета: возвращает (результат или None, строка сводки)."""
+    started = time.perf_counter()
+    summary = {"file": report.filename, "status": "ok", "error": None}
     try:
-        # Валидация параметров
-        if max_shows < 1 or max_shows > 10:
-            raise HTTPException(status_code=400, detail="max_shows должен быть от 1 до 10")
+        if report.size == 0:
+            raise ValueError("Файл отчёта пуст")
+        async with admission.slot(_upload_cost([report]), queued=True):
+            result = await worker_pool.run(run_processor, kind, None, report.path, params, None, matcher_index)
+        summary.update({k: result.stats.get(k) for k in ("matched", "unmatched", "total_rows")})
+    except Exception as e:
+        print(f"Ошибка обработки отчёта пакета {report.filename}: {e}")
+        result = None
+        summary.update(status="error", error=str(e))
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return result, summary
 
-        if not (0.0 <= fuzzy_cutoff <= 1.0):
-            raise HTTPException(status_code=400, detail="fuzzy_cutoff должен быть от 0.0 до 1.0")
 
-        if not (0.0 <= min_token_overlap <= 1.0):
-            raise HTTPException(status_code=400, detail="min_token_overlap должен быть от 0.0 до 1.0")
+@app.post("/api/process/batch")
+async def process_batch(
+    schedule_file: Optional[UploadFile] = File(None, description="Файл сетки"),
+    schedule_id: Optional[str] = Form(None, description="Id сетки, загруженной через /api/schedules"),
+    report_files: List[UploadFile] = File(..., description="Файлы отчётов"),
+    report_type: str = Form("rus", description="Тип отчётов: rus или foreign"),
+    max_shows: int = Form(3, description="Максимальное количество показов"),
+    fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
+    min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    compression: str = Form("default", description="Сжатие xlsx: store, fast, default, best или 0-9")
+):
+    """Пакетная обработка: одна сетка и N отчётов.
 
-        # Читаем файлы
-        schedule_bytes = await schedule_file.read()
-        report_bytes = await report_file.read()
+    Индекс сетки строится один раз, отчёты обрабатываются параллельно в пуле процессов.
+    Ответ – zip с результатами и summary.json (сводка по каждому файлу).
+    """
+    uploads = []
+    req = RequestLog("batch")
+    try:
+        if report_type not in BATCH_KINDS:
+            raise HTTPException(status_code=400, detail=f"report_type должен быть одним из: {', '.join(BATCH_KINDS)}")
 
-        if len(schedule_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Файл сетки пуст")
+        params = _match_params(max_shows, fuzzy_cutoff, min_token_overlap, delete_unmatched, output, compression)
+        output = params['output']
 
-        if len(report_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Файл отчёта пуст")
+        with req.timer.stage("upload"):
+            schedule_path, matcher_index, schedule_hash = await _read_schedule(schedule_file, schedule_id, uploads)
+            reports = [await _spool(f, uploads) for f in report_files]
+        req.fields["report_bytes"] = sum(report.size for report in reports)
+        # Пакет принимается целиком, если есть место в очереди; дальше отчёты ждут слотов без ограничения
+        admission.check(max(_upload_cost([u]) for u in uploads))
 
-        # Параметры обработки
-        params = {
-            'max_shows': max_shows,
-            'fuzzy_cutoff': fuzzy_cutoff,
-            'min_token_overlap': min_token_overlap,
-            'delete_unmatched': delete_unmatched
-        }
+        # Индекс сетки – один раз на весь пакет
+        print(f"Пакетная обработка: {_schedule_name(schedule_file, schedule_id)}, отчётов: {len(report_files)}")
+        started = time.perf_counter()
+        if matcher_index is None:
+            with req.timer.stage("index"):
+                async with admission.slot(_upload_cost(uploads[:1]), queued=True):
+                    matcher_index = await worker_pool.run(build_index, schedule_path, params)
+        index_seconds = time.perf_counter() - started
 
-        # Обрабатываем
-        print(f"Начинаем обработку иностранного отчёта. Файлы: {schedule_file.filename}, {report_file.filename}")
-        result_bytes = processor_foreign.process(schedule_bytes, report_bytes, params)
-        print(f"Обработка завершена успешно. Размер результата: {len(result_bytes)} байт")
+        items = await asyncio.gather(*[
+            _process_batch_item(report_type, report, params, matcher_index) for report in reports
+        ])
+
+        mem = BytesIO()
+        used_names = set()
+        with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as zf:
+            for (result, summary) in items:
+                if result is None:
+                    continue
+                req.record(result)
+                base_stem = stem = Path(summary["file"]).stem + "_ready"
+                n = 2
+                while stem in used_names:
+                    stem = f"{base_stem}_{n}"
+                    n += 1
+                used_names.add(stem)
+                chunks, _, filename = _render_result(result, output, stem)
+                zf.writestr(filename, b"".join(chunks))
+                summary["output"] = filename
+            zf.writestr("summary.json", json.dumps({
+                "index_seconds": round(index_seconds, 3),
+                "index_keys": len(matcher_index),
+                "total_seconds": round(time.perf_counter() - started, 3),
+                "files": [summary for _, summary in items],
+            }, ensure_ascii=False, indent=2))
+        mem.seek(0)
 
-        # Возвращаем файл
+        failed = sum(1 for _, summary in items if summary["status"] != "ok")
+        print(f"Пакет обработан: {len(items) - failed} успешно, {failed} с ошибками")
+        req.status = 200
+        req.fields.update(files=len(items), failed=failed)
         return StreamingResponse(
-            BytesIO(result_bytes),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=report_foreign_ready.xlsx"}
+            mem,
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": "attachment; filename=reports_batch_ready.zip",
+                "X-Batch-Files": str(len(items)),
+                "X-Batch-Failed": str(failed),
+                "Server-Timing": req.server_timing(),
+            }
         )
 
-    except HTTPException:
+    except HTTPException as e:
+        req.status = e.status_code
         raise
-    except PermissionError as e:
-        print(f"Ошибка доступа к файлу: {e}")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail="Ошибка доступа к временным файлам. Попробуйте еще раз.")
     except Exception as e:
-        print(f"Ошибка обработки иностранного отчёта: {e}")
+        print(f"Ошибка пакетной обработки: {e}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
+    finally:
+        cleanup_uploads(uploads)
+        req.emit()
 
 
-@app.post("/api/process/third")
-async def process_third_report(
-    schedule_file: UploadFile = File(..., description="Файл сетки"),
+JOB_KINDS = ("rus", "foreign", "combined", "third")
+
+# Фоновые задачи заданий (ссылки держим, чтобы задачи не собрал сборщик мусора)
+_job_tasks = set()
+# Незавершённые задания: job_id -> (задача asyncio, токен отмены) для DELETE /api/jobs/{job_id}
+_job_controls = {}
+
+
+async def _finish_from_cache(job_id: str, cache_key: str) -> bool:
+    """Результат задания из кэша результатов; False – записи нет (вытеснена), задание обрабатывается."""
+    cached = result_cache.get(cache_key, pin=True)
+    if cached is None:
+        return False
+    try:
+        job_store.start(job_id, cache=CACHE_HIT)
+        await asyncio.to_thread(job_store.finish, job_id, _iter_file(cached["path"]),
+                                cached["media_type"], cached["filename"])
+        return True
+    except FileNotFoundError:
+        print(f"Файл кэша для задания {job_id} пропал – обрабатываем заново")
+        return False
+    finally:
+        await asyncio.to_thread(result_cache.release, cache_key)
+
+
+async def _run_job(job_id: str, kind: str, schedule_path: Optional[str], report_path: str, params: dict,
+                   output: str, matcher_index=None, uploads: Optional[List[SpooledUpload]] = None,
+                   cache_key: Optional[str] = None):
+    req = RequestLog(f"job:{kind}")
+    req.fields["job_id"] = job_id
+    if uploads:
+        req.fields["report_bytes"] = uploads[-1].size
+    try:
+        # Кэш проверяется при запуске: пока задание ждало, запись могла быть вытеснена
+        if cache_key is not None and await _finish_from_cache(job_id, cache_key):
+            req.status = 200
+            req.fields["cache"] = CACHE_HIT
+            print(f"Задание {job_id} ({kind}) выполнено из кэша")
+            return
+        # Задание остаётся в состоянии queued, пока не освободится слот обработки
+        waited = time.perf_counter()
+        async with admission.slot(_upload_cost(uploads or []), queued=True):
+            req.timer.add("queue", time.perf_counter() - waited)
+            job_store.start(job_id, cache=CACHE_MISS)
+            result = await worker_pool.run(run_processor, kind, schedule_path, report_path, params, job_id,
+                                           matcher_index, _job_controls[job_id][1])
+        req.record(result)
+        chunks, media_type, filename = _render_result(result, output, f"report_{kind}_ready")
+        if cache_key is not None:
+            chunks = list(chunks)
+            await asyncio.to_thread(result_cache.put, cache_key, chunks, media_type, filename)
+            req.fields["cache"] = CACHE_MISS
+        await asyncio.to_thread(job_store.finish, job_id, chunks, media_type, filename)
+        req.status = 200
+        print(f"Задание {job_id} ({kind}) выполнено")
+    except (ProcessingCancelled, asyncio.CancelledError):
+        req.status = 499
+        job_store.cancel(job_id)
+        print(f"Задание {job_id} ({kind}) отменено")
+    except Exception as e:
+        print(f"Ошибка выполнения задания {job_id} ({kind}): {e}")
+        print(traceback.format_exc())
+        job_store.fail(job_id, str(e))
+    finally:
+        _job_controls.pop(job_id, None)
+        req.emit()
+        cleanup_uploads(uploads or [])
+
+
+@app.post("/api/jobs/{report_type}", status_code=202)
+async def create_job(
+    report_type: str,
+    schedule_file: Optional[UploadFile] = File(None, description="Файл сетки"),
+    schedule_id: Optional[str] = Form(None, description="Id сетки, загруженной через /api/schedules"),
     report_file: UploadFile = File(..., description="Файл отчёта"),
+    sheet_names: str = Form("", description="Для combined: листы через запятую (по умолчанию российский и иностранный)"),
     max_shows: int = Form(3, description="Максимальное количество показов"),
     fuzzy_cutoff: float = Form(0.70, description="Порог нечёткого поиска (0.0-1.0)"),
     min_token_overlap: float = Form(0.50, description="Минимальное пересечение токенов (0.0-1.0)"),
-    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки")
+    delete_unmatched: bool = Form(False, description="Удалять несовпадающие строки"),
+    output: str = Form("xlsx", description="Формат результата: xlsx, json, csv или both"),
+    compression: str = Form("default", description="Сжатие xlsx: store, fast, default, best или 0-9")
 ):
-    """Пока заглушка: возвращает файл отчёта без изменений."""
+    """Ставит обработку отчёта в очередь и сразу возвращает id задания"""
+    if report_type not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Неизвестный тип отчёта: {report_type}")
+
+    params = _match_params(max_shows, fuzzy_cutoff, min_token_overlap, delete_unmatched, output, compression)
+    output = params['output']
+    if report_type == "combined":
+        params['sheet_names'] = _sheet_list(sheet_names)
+
+    # Загрузки пишутся во временные файлы и удаляются после выполнения задания
+    uploads = []
     try:
-        schedule_bytes = await schedule_file.read()
-        report_bytes = await report_file.read()
-        if len(report_bytes) == 0:
+        if report_type == "third":
+            schedule_path, matcher_index, schedule_hash = None, None, None
+        else:
+            schedule_path, matcher_index, schedule_hash = await _read_schedule(schedule_file, schedule_id, uploads)
+        report = await _spool(report_file, uploads)
+
+        if report.size == 0:
             raise HTTPException(status_code=400, detail="Файл отчёта пуст")
-        params = {
-            'max_shows': max_shows,
-            'fuzzy_cutoff': fuzzy_cutoff,
-            'min_token_overlap': min_token_overlap,
-            'delete_unmatched': delete_unmatched
-        }
-        result_bytes = processor_third.process(schedule_bytes, report_bytes, params)
-        return StreamingResponse(
-            BytesIO(result_bytes),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=report_third_ready.xlsx"}
-        )
-    except HTTPException:
+        admission.check(_upload_cost(uploads))
+
+        cache_key = _cache_key(report_type, schedule_hash, report, params) if report_type != "third" else None
+
+        job = job_store.create(report_type, cache=CACHE_MISS)
+        if job is None:
+            raise HTTPException(status_code=429, detail="Слишком много заданий в очереди. Повторите позже.",
+                                headers={"Retry-After": "30"})
+    except BaseException:
+        cleanup_uploads(uploads)
         raise
-    except Exception as e:
-        print(f"Ошибка обработки третьего отчёта: {e}")
-        raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
+
+    print(f"Задание {job['id']} ({report_type}) поставлено в очередь. Файлы: {_schedule_name(schedule_file, schedule_id)}, {report_file.filename}")
+    task = asyncio.create_task(_run_job(job["id"], report_type, schedule_path, report.path, params, output,
+                                        matcher_index, uploads, cache_key))
+    _job_tasks.add(task)
+    _job_controls[job["id"]] = (task, worker_pool.cancel_token())
+    task.add_done_callback(_job_tasks.discard)
+
+    return {
+        "job_id": job["id"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+        "result_url": f"/api/jobs/{job['id']}/result",
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Состояние задания: state, stage и прогресс"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено или его результат уже удалён")
+    return job_store.public_view(job)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Поток событий задания (Server-Sent Events).
+
+    event: progress – смена этапа или прогресс сопоставления (строк из total);
+    event: done / failed / cancelled – итог, после него поток закрывается.
+    data – то же, что GET /api/jobs/{job_id}.
+    """
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено или его результат уже удалён")
+
+    async def stream():
+        version = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            job = job_store.get(job_id)
+            if job is None:
+                yield _sse(STATE_FAILED, {"job_id": job_id, "state": STATE_FAILED, "error": "Задание удалено"})
+                return
+            if job["version"] != version:
+                version = job["version"]
+                last_sent = time.monotonic()
+                finished = job["state"] in FINISHED_STATES
+                yield _sse(job["state"] if finished else "progress", job_store.public_view(job))
+                if finished:
+                    return
+            elif time.monotonic() - last_sent > config.JOB_EVENTS_KEEPALIVE:
+                last_sent = time.monotonic()
+                yield ": ping\n\n"
+            await asyncio.sleep(config.JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Отменяет незавершённое задание или удаляет завершённое вместе с результатом"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено или его результат уже удалён")
+    if job["state"] in FINISHED_STATES:
+        job_store.remove(job_id)
+        return Response(status_code=204)
+
+    control = _job_controls.get(job_id)
+    if control is not None:
+        task, cancel = control
+        cancel.set()
+        if job["state"] == STATE_QUEUED:
+            # ещё ждёт слота – в пул не попадёт
+            task.cancel()
+    job_store.cancel(job_id)
+    print(f"Задание {job_id} отменено клиентом")
+    return job_store.public_view(job_store.get(job_id))
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Результат готового задания"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено или его результат уже удалён")
+    if job["state"] == STATE_FAILED:
+        raise HTTPException(status_code=500, detail=f"Ошибка обработки: {job['error']}")
+    if job["state"] == STATE_CANCELLED:
+        raise HTTPException(status_code=410, detail="Задание отменено")
+    if job["state"] != STATE_DONE:
+        return JSONResponse(status_code=409, content=job_store.public_view(job))
+    return FileResponse(job["result_path"], media_type=job["media_type"], filename=job["filename"],
+                        headers={"X-Cache": job["cache"]})
+
+
+@app.get("/api/profiles")
+async def list_profiles(request: Request):
+    """Сохранённые профили запросов, от новых к старым (только администратор)"""
+    _require_admin(request)
+    return {"profiles": await asyncio.to_thread(profile_store.list)}
+
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, profile_return: str = "table"):
+    """Профиль запроса: таблица топ-N (profile_return=table) или файл .prof (stats), только администратор"""
+    _require_admin(request)
+    profile_return = _validate_profile_return(profile_return)
+    paths = profile_store.paths(profile_id)
+    if paths is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден (возможно, удалён по лимиту)")
+    prof_path, txt_path = paths
+    if profile_return == PROFILE_RETURN_STATS:
+        return FileResponse(prof_path, media_type="application/octet-stream", filename=f"profile_{profile_id}.prof")
+    return FileResponse(txt_path, media_type="text/plain; charset=utf-8")
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.get("/health")
 async def health_check():
     """Проверка здоровья сервиса"""
-    return {"status": "ok", "message": "Сервис работает"}
+    return {"status": "ok", "message": "Сервис работает", "admission": admission.snapshot()}
 
 
 # Монтируем статические файлы в самом конце, чтобы API endpoints имели приоритет
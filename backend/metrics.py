@@ -0,0 +1,220 @@
+"""
+Метрики сервиса в текстовом формате Prometheus (/metrics).
+
+Реестр живёт в памяти процесса и не требует внешних сервисов: счётчики и
+гистограммы обновляются по итогам запросов (RequestLog в main), а значения
+«на момент опроса» (очередь пула, кэш) берутся функциями при каждом опросе.
+"""
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: нужны метки {self.labelnames}, переданы {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Iterable[float] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelValues, list] = {}  # [счётчики по корзинам, сумма, количество]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Значения берутся функцией при опросе: число или {значения меток: число}."""
+
+    def __init__(self, name, help, fn: Callable, labelnames=(), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, k if isinstance(k, tuple) else (k,))} {_format_value(v)}"
+            for k, v in sorted(values.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=()) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, labelnames=(), kind="gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, fn, labelnames, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name}: ошибка сбора: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Корзины времени (секунды) и размеров (байты)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(2 ** p * 1024 for p in range(4, 18, 2))  # 16KB … 128MB
+
+REQUESTS = REGISTRY.counter("vyborg_requests_total", "Запросы обработки по типу отчёта и HTTP-статусу",
+                            ("endpoint", "status"))
+REQUEST_ERRORS = REGISTRY.counter("vyborg_request_errors_total", "Запросы обработки, завершившиеся ошибкой (5xx)",
+                                  ("endpoint",))
+REQUEST_SECONDS = REGISTRY.histogram("vyborg_request_seconds", "Полное время запроса обработки",
+                                     ("endpoint",), SECONDS_BUCKETS)
+STAGE_SECONDS = REGISTRY.histogram("vyborg_stage_seconds", "Время этапов обработки",
+                                   ("endpoint", "stage"), SECONDS_BUCKETS)
+INPUT_BYTES = REGISTRY.histogram("vyborg_input_bytes", "Размер загруженного отчёта", ("endpoint",), BYTES_BUCKETS)
+ROWS = REGISTRY.counter("vyborg_rows_total", "Строки отчётов по результату сопоставления (стратегия matcher или unmatched)",
+                        ("endpoint", "strategy"))
+
+
+MATCHER_CALLS = REGISTRY.counter("vyborg_matcher_calls_total", "Названия, сопоставленные matcher (уникальные в отчёте)",
+                                 ("endpoint",))
+MATCHER_REUSED = REGISTRY.counter("vyborg_matcher_reused_rows_total",
+                                  "Строки, взявшие результат уже сопоставленного названия", ("endpoint",))
+MATCHER_KEYS = REGISTRY.counter("vyborg_matcher_keys_total",
+                                "Ключи сетки в сопоставлении: scored – оценены, pruned – пустая база (без оценки), "
+                                "candidate – прошли отбор", ("endpoint", "result"))
+MATCHER_RESULTS = REGISTRY.counter("vyborg_matcher_results_total",
+                                   "Вызовы matcher по сработавшей стратегии (empty – пустой результат)",
+                                   ("endpoint", "strategy"))
+MATCHER_NORM_CACHE = REGISTRY.counter("vyborg_matcher_norm_cache_total", "Обращения к кэшу нормализации названий",
+                                      ("endpoint", "result"))
+
+
+def observe_matcher(endpoint: str, matcher: Dict):
+    """Счётчики matcher из stats['matcher'] результата обработки."""
+    MATCHER_CALLS.inc(matcher["calls"], endpoint=endpoint)
+    MATCHER_REUSED.inc(matcher["reused"], endpoint=endpoint)
+    for result, key in (("scored", "keys_scored"), ("pruned", "keys_pruned"), ("candidate", "candidates")):
+        MATCHER_KEYS.inc(matcher[key], endpoint=endpoint, result=result)
+    for strategy, n in matcher["strategies"].items():
+        MATCHER_RESULTS.inc(n, endpoint=endpoint, strategy=strategy)
+    MATCHER_RESULTS.inc(matcher["empty"], endpoint=endpoint, strategy="empty")
+    norm_cache = matcher.get("norm_cache") or {}
+    for result, key in (("hit", "hits"), ("miss", "misses")):
+        MATCHER_NORM_CACHE.inc(norm_cache.get(key, 0), endpoint=endpoint, result=result)
+
+
+def observe_request(endpoint: str, status: int, seconds: float, stages: Dict[str, float],
+                    input_bytes: Optional[int] = None, strategies: Optional[Dict[str, int]] = None,
+                    matcher: Optional[Dict] = None):
+    """Итог одного запроса обработки."""
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    if status >= 500:
+        REQUEST_ERRORS.inc(endpoint=endpoint)
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+    for stage, stage_seconds in stages.items():
+        STAGE_SECONDS.observe(stage_seconds, endpoint=endpoint, stage=stage)
+    if input_bytes is not None:
+        INPUT_BYTES.observe(input_bytes, endpoint=endpoint)
+    for strategy, n in (strategies or {}).items():
+        ROWS.inc(n, endpoint=endpoint, strategy=strategy)
+    if matcher:
+        observe_matcher(endpoint, matcher)
@@ -1,2 +1,5 @@
 # Processors package
 
+# Версия логики обработки: входит в ключ кэша результатов (result_cache),
+# увеличивать при любом изменении, влияющем на выходные файлы
+PROCESSOR_VERSION = "4"
@@ -0,0 +1,255 @@
+# cell_parsers.py – разбор времени и дат из ячеек с кэшем по значению
+"""Разбор значений ячеек: время показа и даты заголовков.
+
+В сетке немного разных значений ("6:00", доля суток 0.25, заголовки дат),
+но каждое повторяется тысячи раз. Строки разбираются один раз: результат
+запоминается в ограниченном LRU-кэше по самой строке. Числа (доли суток и
+серийные даты Excel) переводятся арифметикой, без регулярок и strptime.
+
+Модули исторически трактуют значения немного по-разному (допустимые
+диапазоны чисел, разделители, вид результата) – для каждого здесь свой
+разборщик, поведение сохранено:
+  time_label      – shared.parse_time_from_str ("H:MM")
+  date_label      – shared.parse_date_label_ru ("DD.MM.YYYY")
+  grid_time, grid_date     – schedule_index._parse_time / _parse_header_date
+  strict_time, strict_date – strict_match._parse_time / _parse_header_date
+  excel_time      – time_transfer.coerce_time
+"""
+from __future__ import annotations
+import logging
+import math
+import re
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import pandas as pd
+
+CACHE_SIZE = 4096   # сколько разных строк помнит каждый кэш
+
+SECONDS_PER_DAY = 24 * 3600
+MS_PER_DAY = SECONDS_PER_DAY * 1000
+
+MONTHS_RU = {"января": "01", "февраля": "02", "марта": "03", "апреля": "04", "мая": "05", "июня": "06",
+             "июля": "07", "августа": "08", "сентября": "09", "октября": "10", "ноября": "11", "декабря": "12"}
+
+_CLOCK_RE = re.compile(r"^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*$")
+_HOUR_RE = re.compile(r"\d{1,2}")
+_GRID_TIME_RE = re.compile(r"^(\d{1,2})[:\.](\d{2})(?::(\d{2}))?$")
+_TIME_TOKEN_RE = re.compile(r"^(\d{1,2})[:.](\d{1,2})(?::(\d{1,2}))?$")
+_DATE_WORDS_RE = re.compile(r"(\d{1,2})\s+([А-Яа-яЁё]+)\s+(\d{4})")
+_DATE_DOTS_RE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})")
+_DATE_SHORT_RE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{2})$")
+_WS_RE = re.compile(r"\s+")
+
+
+def _seconds_to_time(total: int) -> time:
+    return time(total // 3600, (total % 3600) // 60, total % 60)
+
+
+def fraction_to_time(f: float) -> time:
+    """Доля суток Excel → время (с округлением до секунды, по модулю суток)."""
+    return _seconds_to_time(int(round(f * SECONDS_PER_DAY)) % SECONDS_PER_DAY)
+
+
+# ------------------- shared -------------------
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _time_label_text(s: str) -> Optional[str]:
+    m = _CLOCK_RE.match(s)
+    if m:
+        h, mi = int(m.group(1)), int(m.group(2))
+        if 0 <= h < 24 and 0 <= mi < 60:
+            return f"{h}:{mi:02d}"
+    # одиночное число – час
+    if _HOUR_RE.fullmatch(s):
+        h = int(s)
+        if 0 <= h < 24:
+            return f"{h}:00"
+    return None
+
+
+def time_label(x) -> Optional[str]:
+    """Время показа строкой "H:MM" (строки "6:00", доли суток 0.25, часы 6, datetime)."""
+    if x is None or (isinstance(x, float) and math.isnan(x)):
+        return None
+    if isinstance(x, (pd.Timestamp, datetime)):
+        if x is pd.NaT:
+            return None
+        return f"{int(x.hour)}:{int(x.minute):02d}"
+    if isinstance(x, (int, float)):
+        f = float(x)
+        if 0.0 <= f < 1.0:
+            total = int(f * SECONDS_PER_DAY)
+            return f"{total // 3600}:{(total % 3600) // 60:02d}"
+        if f < 24 and math.isfinite(f):
+            return f"{int(f)}:00"
+    try:
+        s = str(x).strip()
+    except Exception:
+        return None
+    return _time_label_text(s)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def date_label(text: str) -> Optional[str]:
+    """Дата заголовка "DD.MM.YYYY" из "Понедельник, 1 сентября 2025", "01.09.2025", "01.09.25"."""
+    try:
+        m = _DATE_WORDS_RE.search(text)
+        if m:
+            d, mon, y = m.groups()
+            mon_num = MONTHS_RU.get(_WS_RE.sub(" ", mon.strip().lower().replace("ё", "е")))
+            if mon_num:
+                return f"{int(d):02d}.{mon_num}.{int(y)}"
+        m = _DATE_DOTS_RE.search(text)
+        if m:
+            d, mon, y = m.groups()
+            return f"{int(d):02d}.{int(mon):02d}.{int(y)}"
+        m = _DATE_SHORT_RE.search(text)
+        if m:
+            d, mon, y = m.groups()
+            year_short = int(y)
+            full_year = 2000 + year_short if year_short < 50 else 1900 + year_short
+            return f"{int(d):02d}.{int(mon):02d}.{full_year}"
+    except Exception as e:
+        logging.error(f"Ошибка парсинга даты '{text}': {e}")
+    return None
+
+
+# ------------------- schedule_index -------------------
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _grid_time_text(s: str) -> Optional[time]:
+    try:
+        f = float(s)
+        if -1.0 < f < 2.0:
+            return fraction_to_time(f)
+    except ValueError:
+        pass
+    m = _GRID_TIME_RE.match(s.strip())
+    if m:
+        h, mi, se = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+        if 0 <= h < 24 and 0 <= mi < 60 and 0 <= se < 60:
+            return time(h, mi, se)
+    return None
+
+
+def grid_time(val) -> Optional[time]:
+    """Время строки сетки: datetime, доля суток (-1..2) или "HH:MM[:SS]" / "HH.MM"."""
+    if val is None:
+        return None
+    if isinstance(val, (pd.Timestamp, datetime)):
+        return time(val.hour, val.minute, val.second)
+    if isinstance(val, (int, float)) and -1.0 < val < 2.0:
+        return fraction_to_time(float(val))
+    return _grid_time_text(str(val))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _grid_date_text(text: str) -> Optional[date]:
+    m = _DATE_WORDS_RE.search(text)
+    if not m:
+        return None
+    mon = MONTHS_RU.get(m.group(2).lower())
+    if not mon:
+        return None
+    return date(int(m.group(3)), int(mon), int(m.group(1)))
+
+
+def grid_date(text) -> Optional[date]:
+    """Дата заголовка сетки вида "1 сентября 2025"."""
+    return _grid_date_text(str(text))
+
+
+# ------------------- strict_match -------------------
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _strict_time_text(s: str) -> Optional[time]:
+    s = ' '.join(s.strip().lower().split())
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def strict_time(val) -> Optional[time]:
+    """Время строгого индекса: доля суток (-1..3) или строка "ЧЧ:ММ[:СС]"."""
+    if isinstance(val, float):
+        if -1.0 < val < 3.0:
+            return fraction_to_time(val)
+        return None
+    if isinstance(val, str):
+        return _strict_time_text(val)
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def strict_date(s: str) -> Optional[date]:
+    """Дата "ДД.ММ.ГГГГ" или "ГГГГ-ММ-ДД"."""
+    s = ' '.join(s.strip().lower().split())
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+# ------------------- time_transfer -------------------
+
+def serial_time(value: float) -> time:
+    """Время из серийной даты Excel: дробная часть суток, с точностью до миллисекунды."""
+    ms = int(round((value % 1) * MS_PER_DAY)) % MS_PER_DAY
+    seconds, ms = divmod(ms, 1000)
+    return time(seconds // 3600, (seconds % 3600) // 60, seconds % 60, ms * 1000)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _excel_time_text(s: str) -> Optional[time]:
+    m = _TIME_TOKEN_RE.match(s)
+    if m:
+        h, mi, se = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+        if 0 <= h < 24 and 0 <= mi < 60 and 0 <= se < 60:
+            return time(h, mi, se)
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def excel_time(value) -> Optional[time]:
+    """time, datetime, серийная дата/доля суток Excel (int/float), строки HH:MM[:SS]."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, time):
+        return value
+    if isinstance(value, datetime):
+        return time(value.hour, value.minute, value.second)
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return serial_time(value)
+    return _excel_time_text(str(value).strip())
+
+
+# ------------------- Кэш -------------------
+
+_CACHED = (_time_label_text, date_label, _grid_time_text, _grid_date_text, _strict_time_text, strict_date,
+           _excel_time_text)
+
+
+def cache_info() -> Dict[str, int]:
+    hits = misses = size = 0
+    for fn in _CACHED:
+        info = fn.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    return {"hits": hits, "misses": misses, "size": size}
+
+
+def clear_cache() -> None:
+    for fn in _CACHED:
+        fn.cache_clear()
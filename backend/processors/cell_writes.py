@@ -0,0 +1,78 @@
+# cell_writes.py – буфер записей в ячейки отчёта
+"""Буфер записей (row, col, value, number_format).
+
+Во время сопоставления процессоры только копят записи, а в книгу они
+попадают одним отсортированным пакетом (по колонкам, затем по строкам).
+Формат числа разрешается в numFmtId один раз на формат, а стиль ячейки
+берётся из общего прототипа StyleArray вместо повторного прохода через
+дескриптор number_format openpyxl для каждой ячейки.
+
+Отсортированный пакет (sorted_writes) можно передать и другому способу
+записи, не только openpyxl.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+
+CellWrite = Tuple[int, int, Any, Optional[str]]
+
+
+class CellWriteBuffer:
+    """Накопитель записей в ячейки одного листа."""
+
+    def __init__(self) -> None:
+        self._writes: List[CellWrite] = []
+
+    def add(self, row: int, col: int, value: Any, number_format: Optional[str] = None) -> None:
+        self._writes.append((row, col, value, number_format))
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def sorted_writes(self) -> List[CellWrite]:
+        """Записи по колонкам, затем по строкам; при повторной записи в ячейку побеждает последняя."""
+        return sorted(self._writes, key=lambda w: (w[1], w[0]))
+
+    def __iter__(self) -> Iterator[CellWrite]:
+        return iter(self.sorted_writes())
+
+    def clear(self) -> None:
+        self._writes.clear()
+
+    def apply(self, ws) -> int:
+        """Записывает накопленное в лист openpyxl и очищает буфер. Возвращает число записей."""
+        wb = ws.parent
+        fmt_ids: Dict[str, int] = {}
+        prototypes: Dict[Tuple[Tuple[int, ...], int], StyleArray] = {}
+        cells = ws._cells
+        count = 0
+        for row, col, value, number_format in self.sorted_writes():
+            cell = cells.get((row, col))
+            if cell is None:
+                cell = ws.cell(row=row, column=col)
+            cell.value = value
+            if number_format is not None:
+                fmt_id = fmt_ids.get(number_format)
+                if fmt_id is None:
+                    fmt_id = _number_format_id(wb, number_format)
+                    fmt_ids[number_format] = fmt_id
+                current = tuple(cell._style) if cell._style is not None else (0,) * 9
+                proto = prototypes.get((current, fmt_id))
+                if proto is None:
+                    proto = StyleArray(current)
+                    proto.numFmtId = fmt_id
+                    prototypes[(current, fmt_id)] = proto
+                # копия прототипа: openpyxl меняет стиль ячейки на месте
+                cell._style = StyleArray(proto)
+            count += 1
+        self.clear()
+        return count
+
+
+def _number_format_id(wb, number_format: str) -> int:
+    """numFmtId формата так же, как его вычисляет openpyxl при присваивании cell.number_format."""
+    if number_format in BUILTIN_FORMATS_REVERSE:
+        return BUILTIN_FORMATS_REVERSE[number_format]
+    return wb._number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
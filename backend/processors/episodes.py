@@ -0,0 +1,199 @@
+# episodes.py – разбор номеров серий за один проход
+"""Номера серий/выпусков в названии передачи.
+
+Название разбивается на токены одним проходом регулярки, затем конечный
+автомат собирает группы номеров: число, диапазон ("63-64", "1 – 120"),
+список ("63,64", "3 и 4", "63 64") и порядковые формы ("5-я"). Группа
+считается номерами серий, если рядом стоит слово-маркер (серия, серии,
+сер., выпуск, вып., эпизод, часть – до или после группы). Если таких групп
+нет, номерами серий считается группа в конце названия. Группа в начале
+названия, за которой идут слова («Часть 2. Возвращение»), – часть самого
+названия. Коды через дефис («А-4», «Т-34») – одно слово, а числа длиннее
+MAX_EPISODE_DIGITS – годы, коды и т.п., не серии: они остаются в названии.
+
+Результат – отсортированный список непересекающихся интервалов
+((1, 120),) вместо множества всех номеров: сборники серий не раздувают
+память, а сравнение с индексом идёт по интервалам.
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+Interval = Tuple[int, int]
+Intervals = Tuple[Interval, ...]
+
+MARKERS = frozenset({
+    "серия", "серии", "серий", "сер",
+    "выпуск", "выпуски", "выпусков", "вып",
+    "эпизод", "эпизоды", "эпизодов",
+    "часть", "части", "частей",
+})
+LIST_WORDS = frozenset({"и"})
+MAX_EPISODE_DIGITS = 3   # числа длиннее – годы, коды и т.п., не серии
+
+_TOKEN_RE = re.compile(
+    r"(?P<ord>\d{1,3})\s*-?\s*(?:ая|ый|ой|я|й)\b"   # порядковое: 5-я, 2 й
+    r"|(?P<code>[^\W\d_]+-\d+\b|\d+-[^\W\d_]+)"      # код: а-4, т-34, 10-летие
+    r"|(?P<word>\w+)"
+    r"|(?P<dash>[-–—])"
+    r"|(?P<sep>[,;&])"
+    r"|(?P<punct>\S)"
+)
+_WS_RE = re.compile(r"\s+")
+_SPACE_PUNCT_RE = re.compile(r"\s+([.,;:!?])")
+_PUNCT_RUN_RE = re.compile(r"[.,;:]+([.,;:])")
+
+# Виды токенов
+_NUM, _MARK, _SEP, _DASH, _PUNCT, _WORD = range(6)
+
+
+def _tokens(text: str) -> List[Tuple[int, int, int, int]]:
+    """[(вид, число, начало, конец)]"""
+    out = []
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "ord":
+            out.append((_NUM, int(m.group("ord")), m.start(), m.end()))
+        elif kind == "code":
+            out.append((_WORD, 0, m.start(), m.end()))
+        elif kind == "word":
+            w = m.group()
+            if w.isdigit():
+                if len(w) <= MAX_EPISODE_DIGITS:
+                    out.append((_NUM, int(w), m.start(), m.end()))
+                else:
+                    out.append((_WORD, 0, m.start(), m.end()))
+            elif w in MARKERS:
+                out.append((_MARK, 0, m.start(), m.end()))
+            elif w in LIST_WORDS:
+                out.append((_SEP, 0, m.start(), m.end()))
+            else:
+                out.append((_WORD, 0, m.start(), m.end()))
+        elif kind == "dash":
+            out.append((_DASH, 0, m.start(), m.end()))
+        elif kind == "sep":
+            out.append((_SEP, 0, m.start(), m.end()))
+        else:
+            out.append((_PUNCT, 0, m.start(), m.end()))
+    return out
+
+
+def merge(intervals: Iterable[Interval]) -> Intervals:
+    """Сортирует интервалы и склеивает пересекающиеся и соседние."""
+    out: List[List[int]] = []
+    for lo, hi in sorted(intervals):
+        if out and lo <= out[-1][1] + 1:
+            if hi > out[-1][1]:
+                out[-1][1] = hi
+        else:
+            out.append([lo, hi])
+    return tuple((lo, hi) for lo, hi in out)
+
+
+def from_numbers(numbers: Iterable[int]) -> Intervals:
+    return merge((n, n) for n in numbers)
+
+
+def contains(intervals: Intervals, n: int) -> bool:
+    i = bisect_right(intervals, (n, float("inf"))) - 1
+    return i >= 0 and intervals[i][0] <= n <= intervals[i][1]
+
+
+def overlaps(intervals: Intervals, numbers: Iterable[int]) -> bool:
+    """Есть ли среди numbers хотя бы один номер из intervals."""
+    return any(contains(intervals, n) for n in numbers)
+
+
+def count(intervals: Intervals) -> int:
+    return sum(hi - lo + 1 for lo, hi in intervals)
+
+
+def iter_episodes(intervals: Intervals) -> Iterator[int]:
+    """Номера серий по возрастанию (без построения множества)."""
+    for lo, hi in intervals:
+        yield from range(lo, hi + 1)
+
+
+def split_episodes(text: str) -> Tuple[str, Intervals]:
+    """Разбирает нормализованное название: (текст без номеров серий и маркеров, интервалы).
+
+    Из текста убираются все слова-маркеры и группы номеров, признанные сериями.
+    """
+    tokens = _tokens(text)
+    n = len(tokens)
+    # группы: [интервалы, индекс первого токена, индекс последнего токена, маркер до, маркер после]
+    groups = []
+    cur = None
+    mark_pending = False
+    state = None   # None | _NUM | _DASH | _SEP – что ожидается внутри группы
+    i = 0
+    while i < n:
+        kind, value, _, _ = tokens[i]
+        if cur is not None:
+            if kind == _NUM:
+                if state == _DASH:
+                    lo = cur[0][-1][0]
+                    cur[0][-1] = (min(lo, value), max(lo, value))
+                else:
+                    # после запятой/«и» или просто через пробел – следующий номер списка
+                    cur[0].append((value, value))
+                cur[2] = i
+                state = _NUM
+                i += 1
+                continue
+            if state == _NUM and kind in (_DASH, _SEP):
+                state = kind
+                i += 1
+                continue
+            if state == _NUM and kind == _MARK:
+                cur[4] = True
+                cur[2] = i
+            groups.append(cur)
+            cur = None
+            state = None
+            if kind == _MARK:
+                # «2 выпуск 3» – маркер относится и к следующей группе
+                mark_pending = True
+                i += 1
+                continue
+            # висящий разделитель («63,» «5 -») не входит в группу – токен разбирается заново
+        if kind == _NUM:
+            cur = [[(value, value)], i, i, mark_pending, False]
+            mark_pending = False
+            state = _NUM
+        elif kind == _MARK:
+            mark_pending = True
+        elif kind in (_WORD, _SEP):
+            mark_pending = False
+        i += 1
+    if cur is not None:
+        groups.append(cur)
+
+    words = [i for i, t in enumerate(tokens) if t[0] == _WORD]
+    if words:
+        # группа до первого слова названия, после которой слова есть, – часть названия
+        groups = [g for g in groups if g[1] > words[0] or g[2] > words[-1]]
+    marked = [g for g in groups if g[3] or g[4]]
+    if marked:
+        episodic = marked
+    else:
+        # номер в конце названия: после группы только знаки препинания
+        episodic = [g for g in groups[-1:]
+                    if all(t[0] in (_PUNCT, _DASH, _SEP) for t in tokens[g[2] + 1:])]
+
+    intervals = merge(iv for g in episodic for iv in g[0])
+    drop = [(tokens[g[1]][2], tokens[g[2]][3]) for g in episodic]
+    drop += [(start, end) for kind, _, start, end in tokens if kind == _MARK]
+    if not drop:
+        return text, intervals
+    drop.sort()
+    parts, pos = [], 0
+    for start, end in drop:
+        if start > pos:
+            parts.append(text[pos:start])
+        pos = max(pos, end)
+    parts.append(text[pos:])
+    rest = _SPACE_PUNCT_RE.sub(r"\1", _WS_RE.sub(" ", " ".join(parts)))
+    rest = _PUNCT_RUN_RE.sub(r"\1", rest).strip()
+    return rest, intervals
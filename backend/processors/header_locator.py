@@ -0,0 +1,121 @@
+# header_locator.py – поиск строки заголовков отчёта с кэшем по шаблону
+"""Поиск строки заголовков.
+
+Первые max_rows строк читаются один раз значениями (iter_rows), а не через
+ws.cell по каждой ячейке. Результат запоминается по ключу
+(имя листа, вид поиска, отпечаток текста строки заголовков). Для следующего
+отчёта по тому же шаблону читаются строки только до ранее найденной: если её
+отпечаток совпал и ни одна строка выше не подходит (иначе свежий поиск
+вернул бы её), остальные строки не читаются и заголовок не разбирается заново.
+"""
+from __future__ import annotations
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+HEADER_SCAN_ROWS = 200     # сколько первых строк просматривается при поиске
+CACHE_SIZE = 256           # сколько шаблонов помнит кэш
+
+_WS_RE = re.compile(r"\s+")
+
+# (лист, вид поиска, отпечаток) -> (строка заголовков, результат match_row)
+_cache: "OrderedDict[Tuple[str, Hashable, str], Tuple[int, Any]]" = OrderedDict()
+# (лист, вид поиска) -> строки, где раньше находились заголовки (последняя – первой)
+_known_rows: Dict[Tuple[str, Hashable], List[int]] = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def norm_header(value: Any) -> str:
+    """Текст ячейки заголовка: нижний регистр, ё→е, схлопнутые пробелы."""
+    if value is None:
+        return ""
+    return _WS_RE.sub(" ", str(value).strip().lower().replace("ё", "е"))
+
+
+def row_fingerprint(values: Sequence[Any]) -> str:
+    """Отпечаток строки заголовков по нормализованному тексту ячеек."""
+    text = "\x1f".join(norm_header(v) for v in values).rstrip("\x1f")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def read_rows(ws, max_rows: int = HEADER_SCAN_ROWS) -> List[Tuple[Any, ...]]:
+    """Значения первых max_rows строк листа одним проходом."""
+    last = min(max_rows, ws.max_row)
+    if last < 1:
+        return []
+    return list(ws.iter_rows(min_row=1, max_row=last, values_only=True))
+
+
+def _first_match(rows: Sequence[Tuple[Any, ...]],
+                 match_row: Callable[[Tuple[Any, ...]], Any]) -> Optional[Tuple[int, Any]]:
+    for row, values in enumerate(rows, start=1):
+        result = match_row(values)
+        if result is not None:
+            return row, result
+    return None
+
+
+def locate_header(ws, key: Hashable, match_row: Callable[[Tuple[Any, ...]], Any],
+                  max_rows: int = HEADER_SCAN_ROWS) -> Optional[Tuple[int, Any]]:
+    """Находит первую строку, для которой match_row(values) не None.
+
+    key описывает вид поиска (например, набор кандидатов названий колонок) и
+    вместе с именем листа и отпечатком строки образует ключ кэша.
+    Возвращает (номер строки, результат match_row) или None.
+    """
+    sheet_key = (ws.title, key)
+    for row in _known_rows.get(sheet_key, ()):
+        if row > min(max_rows, ws.max_row):
+            continue
+        rows = read_rows(ws, row)
+        cache_key = (ws.title, key, row_fingerprint(rows[-1]))
+        cached = _cache.get(cache_key)
+        if cached is None or cached[0] != row:
+            continue
+        # Подходящая строка выше известной – это и есть ответ свежего поиска
+        found = _first_match(rows[:-1], match_row)
+        if found is not None:
+            _stats["misses"] += 1
+            _remember(sheet_key, found[0], row_fingerprint(rows[found[0] - 1]), found[1])
+            return found
+        _cache.move_to_end(cache_key)
+        _stats["hits"] += 1
+        return cached
+
+    _stats["misses"] += 1
+    rows = read_rows(ws, max_rows)
+    found = _first_match(rows, match_row)
+    if found is not None:
+        _remember(sheet_key, found[0], row_fingerprint(rows[found[0] - 1]), found[1])
+    return found
+
+
+def _remember(sheet_key: Tuple[str, Hashable], row: int, fingerprint: str, result: Any) -> None:
+    _cache[(sheet_key[0], sheet_key[1], fingerprint)] = (row, result)
+    _cache.move_to_end((sheet_key[0], sheet_key[1], fingerprint))
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    rows = _known_rows.setdefault(sheet_key, [])
+    if row in rows:
+        rows.remove(row)
+    rows.insert(0, row)
+    del rows[4:]
+
+
+def cache_info() -> Dict[str, int]:
+    return {"hits": _stats["hits"], "misses": _stats["misses"], "size": len(_cache)}
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _known_rows.clear()
+    _stats["hits"] = _stats["misses"] = 0
+
+
+def compile_candidates(cands: Sequence[str]) -> Optional[re.Pattern]:
+    """Одна регулярка «содержит любой из кандидатов» вместо цикла по подстрокам."""
+    cands = [norm_header(c) for c in cands if c]
+    if not cands:
+        return None
+    return re.compile("|".join(re.escape(c) for c in cands))
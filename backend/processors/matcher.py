@@ -1,13 +1,75 @@
-from typing import Dict, Tuple, List, Iterable, Set
+from typing import Dict, Tuple, List, Iterable, Set, NamedTuple, Optional
 from datetime import datetime
 from rapidfuzz import fuzz
 import logging
+import re
 
-from .normalize_titles import split_base_episodes, norm_base_only
+from .episodes import Intervals, iter_episodes, overlaps
+from .normalize_titles import norm_base_only
+from .title_normalizer import NormalizedTitle, normalize_title
 from .settings_match import BASE_RATIO, PARTIAL_RATIO, TOKEN_SET, JACCARD_MIN, ALLOW_EPISODE_PARTIAL, MAX_CANDIDATES, ALLOW_CONTAINS, ALLOW_PARTIAL_WORDS
 
 logger = logging.getLogger(__name__)
 
+# Названия стратегий, которыми сопоставляется строка отчёта (см. pick_showtimes_for_report_title)
+STRATEGY_EXACT_EPISODE = "exact_episode"
+STRATEGY_EPISODE_OVERLAP = "episode_overlap"
+STRATEGY_NO_EPISODES = "no_episodes"
+STRATEGY_FALLBACK = "fallback"
+
+
+class MatchResult(NamedTuple):
+    """Результат сопоставления одной строки отчёта."""
+    times: List[datetime]
+    strategy: Optional[str]      # какая стратегия сработала (None – совпадений нет)
+    score: Optional[float]       # оценка выбранного кандидата
+    base: Optional[str]          # база найденного ключа сетки
+
+
+class MatchCounters:
+    """Счётчики работы matcher за обработку отчёта (stats['matcher'] процессора).
+
+    Считаются локально в цикле по ключам и прибавляются один раз за вызов –
+    на время сопоставления это не влияет. Для каждого оценённого ключа
+    считаются все четыре метрики rapidfuzz, поэтому вызовов rapidfuzz
+    ровно 4 * keys_scored и отдельно они не считаются.
+
+    keys_pruned – только ключи с пустой базой после norm_base_only; индекс
+    сетки таких ключей обычно не содержит, так что счётчик почти всегда 0.
+    Отсева ключей по оценке сверху в _score_candidates нет.
+    """
+    __slots__ = ("calls", "reused", "keys_scored", "keys_pruned", "candidates",
+                 "no_candidates", "empty", "strategies")
+
+    def __init__(self) -> None:
+        self.calls = 0             # вызовов match_report_title
+        self.reused = 0            # строк, взявших результат уже сопоставленного названия (см. processor_rus)
+        self.keys_scored = 0       # ключей сетки, для которых считались метрики
+        self.keys_pruned = 0       # ключей с пустой базой, пропущенных без расчёта метрик
+        self.candidates = 0        # ключей, прошедших критерии отбора
+        self.no_candidates = 0     # вызовов без единого кандидата
+        self.empty = 0             # вызовов с пустым результатом (с кандидатами или без)
+        self.strategies: Dict[str, int] = {}  # сработавшая стратегия -> вызовов
+
+    def record(self, strategy: Optional[str]) -> None:
+        self.calls += 1
+        if strategy is None:
+            self.empty += 1
+        else:
+            self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+
+    def as_dict(self) -> Dict:
+        return {name: (dict(self.strategies) if name == "strategies" else getattr(self, name))
+                for name in self.__slots__}
+
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def _numbers_agree(numbers: Set[str], base: str) -> bool:
+    """Все числа из базы названия отчёта («проект 2090», «а-4») есть и в базе ключа сетки."""
+    return not numbers or numbers <= set(_NUMBER_RE.findall(norm_base_only(base)))
+
 
 def _tokens(s: str) -> Set[str]:
     """Разбивает строку на множество токенов."""
@@ -53,22 +115,32 @@ def _partial_word_match(a: str, b: str) -> float:
     return matches / max(1, total) if total > 0 else 0.0
 
 
-def best_candidates(report_title: str, schedule_keys: Iterable[Tuple[str, frozenset]]) -> Tuple[List[Tuple[str,frozenset]], List[int]]:
-    """Находит лучшие кандидаты для сопоставления с использованием множества метрик."""
-    base_r, eps_r = split_base_episodes(report_title)
-    base_r0 = norm_base_only(base_r)
+def _score_candidates(report_title: str, schedule_keys: Iterable[Tuple[str, frozenset]],
+                      normalized: Optional[NormalizedTitle] = None,
+                      counters: Optional[MatchCounters] = None) -> Tuple[List[Tuple[float, str, frozenset]], Intervals]:
+    """Оценивает ключи сетки и возвращает топ кандидатов [(score, base, eps)] и эпизоды отчёта (интервалы).
+
+    normalized – готовый разбор названия (normalize_title / normalize_many).
+    counters – счётчики MatchCounters (оценённые ключи, ключи с пустой базой, кандидаты).
+    """
+    title = normalized or normalize_title(report_title)
+    eps_r = title.episodes
+    base_r0 = " ".join(title.tokens)
 
     if not base_r0:
         logger.warning(f"Пустая база после нормализации: '{report_title}'")
-        return [], list(eps_r)
+        return [], eps_r
 
     scored = []
+    keys_scored = keys_pruned = 0
 
     for base_s, eps_s in schedule_keys:
         base_s0 = norm_base_only(base_s)
 
         if not base_s0:
+            keys_pruned += 1
             continue
+        keys_scored += 1
 
         # Множество метрик для сопоставления
         r1 = fuzz.ratio(base_r0, base_s0)              # Общее сходство
@@ -129,6 +201,11 @@ def best_candidates(report_title: str, schedule_keys: Iterable[Tuple[str, frozen
                 'partial_word': partial
             }))
 
+    if counters is not None:
+        counters.keys_scored += keys_scored
+        counters.keys_pruned += keys_pruned
+        counters.candidates += len(scored)
+
     scored.sort(key=lambda x: x[0], reverse=True)
 
     # Логируем топ-3 кандидата для отладки
@@ -139,10 +216,21 @@ def best_candidates(report_title: str, schedule_keys: Iterable[Tuple[str, frozen
             logger.debug(f"     Метрики: ratio={metrics['ratio']:.0f}, partial={metrics['partial']:.0f}, "
                         f"jac={metrics['jaccard']:.2f}, overlap={metrics['overlap']:.2f}")
 
-    return [(b, e) for score, b, e, _ in scored[:MAX_CANDIDATES]], list(eps_r)
+    return [(score, b, e) for score, b, e, _ in scored[:MAX_CANDIDATES]], eps_r
 
 
-def pick_showtimes_for_report_title(title: str, index: Dict[Tuple[str, frozenset], List[datetime]]) -> List[datetime]:
+def best_candidates(report_title: str, schedule_keys: Iterable[Tuple[str, frozenset]]) -> Tuple[List[Tuple[str,frozenset]], Intervals]:
+    """Находит лучшие кандидаты для сопоставления с использованием множества метрик.
+
+    Эпизоды отчёта возвращаются интервалами (см. episodes).
+    """
+    scored, eps_r = _score_candidates(report_title, schedule_keys)
+    return [(b, e) for _, b, e in scored], eps_r
+
+
+def match_report_title(title: str, index: Dict[Tuple[str, frozenset], List[datetime]],
+                       normalized: Optional[NormalizedTitle] = None,
+                       counters: Optional[MatchCounters] = None) -> MatchResult:
     """
     Подбирает время показа для названия передачи с использованием каскадных стратегий:
     1. Точное совпадение по базе и конкретному эпизоду
@@ -150,74 +238,105 @@ def pick_showtimes_for_report_title(title: str, index: Dict[Tuple[str, frozenset
     3. Совпадение по базе без эпизодов (-1)
     4. Топ-кандидат независимо от эпизодов (fallback)
 
+    Стратегии 3 и 4 сопоставляют только базу, поэтому берут лишь кандидатов, в базе
+    которых есть все числа из базы названия («Старый проект 2090» не сводится к «Старому городу»).
+
+    Возвращает MatchResult: найденные показы, сработавшую стратегию и оценку кандидата.
+
     ВАЖНО: -1 в frozenset означает программу без серий (новости, заставки и т.п.)
+
+    normalized – готовый разбор title, если он уже есть (см. normalize_many).
+    counters – счётчики MatchCounters: работа по ключам сетки и сработавшая стратегия.
     """
-    cands, eps_r = best_candidates(title, index.keys())
+    result = _match_report_title(title, index, normalized, counters)
+    if counters is not None:
+        counters.record(result.strategy)
+    return result
+
+
+def _match_report_title(title: str, index: Dict[Tuple[str, frozenset], List[datetime]],
+                        normalized: Optional[NormalizedTitle], counters: Optional[MatchCounters]) -> MatchResult:
+    normalized = normalized or normalize_title(title)
+    cands, eps_r = _score_candidates(title, index.keys(), normalized, counters)
 
     if not cands:
+        if counters is not None:
+            counters.no_candidates += 1
         logger.debug(f"❌ Нет кандидатов для '{title}'")
-        return []
+        return MatchResult([], None, None, None)
 
-    eps_r_set = set(eps_r) if eps_r else set()
-    has_episodes = bool(eps_r_set and eps_r_set != {-1})
+    # Эпизоды отчёта – интервалы: сборник «1-120» не разворачивается в множество
+    has_episodes = bool(eps_r)
 
-    logger.debug(f"🔍 Ищу показы для '{title}': episodes={eps_r_set}, кандидатов={len(cands)}")
+    logger.debug(f"🔍 Ищу показы для '{title}': episodes={eps_r}, кандидатов={len(cands)}")
 
     # Стратегия 1: Точное совпадение базы и КОНКРЕТНОГО эпизода
     if has_episodes:
-        for ep in eps_r_set:
-            # Ищем ключ с одним конкретным эпизодом
-            target_key_single = frozenset([ep])
-
-            for b, e in cands:
-                if e == target_key_single:
-                    logger.debug(f"✅ Точное совпадение эпизода {ep}: '{title}' → '{b}' eps={e}")
-                    return index[(b, e)]
-
-            logger.debug(f"   Не найдено точное совпадение для эпизода {ep}")
+        # первый (лучший) кандидат для каждого ключа с одним эпизодом
+        single = {}
+        for score, b, e in cands:
+            if len(e) == 1:
+                single.setdefault(next(iter(e)), (score, b, e))
+        for ep in iter_episodes(eps_r):
+            if ep not in single:
+                continue
+            score, b, e = single[ep]
+            logger.debug(f"✅ Точное совпадение эпизода {ep}: '{title}' → '{b}' eps={e}")
+            return MatchResult(index[(b, e)], STRATEGY_EXACT_EPISODE, score, b)
+        logger.debug(f"   Не найдено точное совпадение для эпизодов {eps_r}")
 
     # Стратегия 2: Частичное пересечение эпизодов
     # Ищем среди топовых кандидатов те, у которых есть нужные эпизоды
     if ALLOW_EPISODE_PARTIAL and has_episodes:
         out = []
         matched_keys = []
+        best = None
 
-        for b, e in cands:
+        for score, b, e in cands:
             # Пропускаем программы без серий
             if -1 in e:
                 continue
 
             # Проверяем пересечение эпизодов
-            intersection = set(e) & eps_r_set
-            if intersection:
+            if overlaps(eps_r, e):
                 out.extend(index[(b, e)])
                 matched_keys.append((b, e))
-                logger.debug(f"   Совпадение эпизодов: база='{b}', эпизоды в сетке={e}, искомые={eps_r_set}, пересечение={intersection}")
+                if best is None:
+                    best = (score, b)
+                logger.debug(f"   Совпадение эпизодов: база='{b}', эпизоды в сетке={e}, искомые={eps_r}")
 
         if out:
             logger.debug(f"✅ Найдено по эпизодам: '{title}' → {matched_keys}")
-            return sorted(set(out))
+            return MatchResult(sorted(set(out)), STRATEGY_EPISODE_OVERLAP, best[0], best[1])
+
+    # Числа в базе («проект 2090», «ракета 2») – часть названия: без них в базе кандидата
+    # совпадение только по базе было бы другой программой
+    numbers = set(_NUMBER_RE.findall(" ".join(normalized.tokens)))
+    base_cands = [c for c in cands if _numbers_agree(numbers, c[1])]
 
     # Стратегия 3: Совпадение по базе без учета эпизодов (для передач без серий)
-    if not has_episodes or eps_r_set == {-1}:
-        for b, e in cands:
+    if not has_episodes:
+        for score, b, e in base_cands:
             if e == frozenset([-1]):
                 logger.debug(f"✅ Совпадение без эпизодов: '{title}' → '{b}'")
-                return index[(b, e)]
+                return MatchResult(index[(b, e)], STRATEGY_NO_EPISODES, score, b)
 
     # Стратегия 4: НЕ используем fallback для многосерийных программ!
     # Это предотвращает неправильное сопоставление разных серий
     if has_episodes:
-        logger.debug(f"❌ Не найдено точных совпадений для '{title}' с эпизодами {eps_r_set}")
-        return []
+        logger.debug(f"❌ Не найдено точных совпадений для '{title}' с эпизодами {eps_r}")
+        return MatchResult([], None, None, None)
 
     # Fallback только для программ без серий
-    if cands:
-        b, e = cands[0]
+    if base_cands:
+        score, b, e = base_cands[0]
         logger.debug(f"⚠️ Fallback (без серий): '{title}' → '{b}' eps={e}")
-        return index[(b, e)]
+        return MatchResult(index[(b, e)], STRATEGY_FALLBACK, score, b)
 
     logger.debug(f"❌ Не найдено совпадений для '{title}'")
-    return []
+    return MatchResult([], None, None, None)
 
 
+def pick_showtimes_for_report_title(title: str, index: Dict[Tuple[str, frozenset], List[datetime]]) -> List[datetime]:
+    """Подбирает время показа для названия передачи (см. match_report_title)."""
+    return match_report_title(title, index).times
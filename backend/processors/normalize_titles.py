@@ -1,42 +1,27 @@
-import re
-import unicodedata
-from typing import Tuple, Set
-
-_SYNONYMS = {
-    "серия": "серия",
-    "эпизод": "серия",
-    "выпуск": "серия",
-    "часть": "серия",
-}
-_EXT = re.compile(r'\.(mp4|mkv|avi|mov)$', re.I)
-_BR = re.compile(r'\s*\([^)]*\)')
-SEP = re.compile(r'[\s,]+')
-RANGE = re.compile(r'(\d{1,3})\s*[–\-]\s*(\d{1,3})')
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .episodes import Intervals, iter_episodes
+from .title_normalizer import (NormalizedTitle, STOP_WORDS, base_tokens, norm_column, normalize_text,
+                               normalize_title, series_from_text, series_norm_column, title_from_text)
+
+# Разбор выполняет title_normalizer (скомпилированные шаблоны + кэш);
+# функции модуля сохраняют прежний интерфейс.
 
 MONTH = {
     "января":1,"февраля":2,"марта":3,"апреля":4,"мая":5,"июня":6,
     "июля":7,"августа":8,"сентября":9,"октября":10,"ноября":11,"декабря":12
 }
 
-_STOP = {"фильм","кино","передача","серия","выпуск","эпизод","часть","ред","copy"}
+_STOP = STOP_WORDS
 
 def norm(s: str) -> str:
-    s = unicodedata.normalize("NFKC", str(s)).lower()
-    s = _EXT.sub("", s)
-    s = _BR.sub("", s)
-    s = s.replace("ё", "е")
-    for k,v in _SYNONYMS.items():
-        s = re.sub(fr'\b{k}\b', v, s)
-    s = re.sub(r'\s+', ' ', s).strip().strip('.')
-    return s
-
-def _strip_stop(tokens):
-    return [t for t in tokens if t not in _STOP]
+    return normalize_text(s)
 
 def norm_base_only(s: str) -> str:
-    s2 = norm(s)
-    toks = _strip_stop(s2.split())
-    return " ".join(toks)
+    return " ".join(base_tokens(s))
 
 def split_base_episodes(raw: str) -> Tuple[str, Set[int]]:
     """
@@ -48,47 +33,63 @@ def split_base_episodes(raw: str) -> Tuple[str, Set[int]]:
     - "Название 63-64" → ("название", {63, 64})
     - "Название. 2 выпуск" → ("название", {2})
     - "Название" → ("название", set())
+
+    Номера разворачиваются в множество; без разворачивания (интервалами) –
+    title_normalizer.normalize_title(raw).episodes.
+    """
+    title = normalize_title(raw)
+    return title.base, set(iter_episodes(title.episodes))
+
+
+class NormalizedTitles(NamedTuple):
+    """Результат normalize_many: разбор уникальных названий и позиции входа."""
+    codes: np.ndarray               # номер уникального названия для каждой позиции (-1 – пусто)
+    unique: List[NormalizedTitle]   # разбор каждого уникального названия
+    vocabulary: Dict[str, int]      # токен -> id
+
+    def title(self, i: int) -> Optional[NormalizedTitle]:
+        code = self.codes[i]
+        return self.unique[code] if code >= 0 else None
+
+    @property
+    def bases(self) -> List[Optional[str]]:
+        return [self.unique[c].base if c >= 0 else None for c in self.codes]
+
+    @property
+    def episodes(self) -> List[Intervals]:
+        return [self.unique[c].episodes if c >= 0 else () for c in self.codes]
+
+    @property
+    def token_ids(self) -> List[Tuple[int, ...]]:
+        ids = [tuple(self.vocabulary[t] for t in u.tokens) for u in self.unique]
+        return [ids[c] if c >= 0 else () for c in self.codes]
+
+
+def normalize_many(titles: Iterable, schedule: bool = False) -> NormalizedTitles:
+    """Нормализует колонку названий (список или Series).
+
+    Повторы убираются до разбора (pd.factorize), нормализация строк идёт
+    строковыми операциями pandas по уникальным значениям, поэтому работа
+    растёт с числом разных названий, а не строк. Пустые значения (None/NaN)
+    получают код -1.
+
+    schedule=False – разбор названий отчёта (как normalize_title);
+    schedule=True – разбор названий сетки (как shared.normalize_base /
+    extract_series_set), tokens – слова базы без служебных.
     """
-    s = norm(raw)
-
-    # Убираем служебные слова, но сохраняем числа рядом с ними
-    # "гора самоцветов. 63 серия" → "гора самоцветов 63"
-    s = re.sub(r'\b(серия|выпуск|эпизод|часть)\b', '', s)
-    s = re.sub(r'\s+', ' ', s).strip()
-
-    base, eps = s, set()
-
-    # Паттерн 1: Числа с явным указанием "серия/выпуск" (до удаления этих слов)
-    # Этот паттерн уже обработан выше через norm() и замену слов
-
-    # Паттерн 2: Диапазоны и списки чисел в конце
-    # "гора самоцветов 63 64" или "гора самоцветов 63,64" или "гора самоцветов 63-64"
-    m = re.search(r'[.\s]+(\d[\d\s,\-]*)$', s)
-    if m:
-        base = s[:m.start()].strip()
-        tail = m.group(1).strip()
-
-        # Обрабатываем диапазоны (63-64)
-        for tok in SEP.split(tail):
-            tok = tok.strip()
-            if not tok:
-                continue
-            m2 = RANGE.fullmatch(tok)
-            if m2:
-                a, b = int(m2.group(1)), int(m2.group(2))
-                for k in range(min(a, b), max(a, b) + 1):
-                    eps.add(k)
-            elif tok.isdigit():
-                eps.add(int(tok))
-
-    # Паттерн 3: Одиночное число в конце (если предыдущий паттерн не сработал)
-    if not eps:
-        m = re.search(r'\b(\d{1,3})\s*$', s)
-        if m:
-            eps.add(int(m.group(1)))
-            base = s[:m.start()].strip()
-
-    # Финальная очистка базы
-    base = base.strip(' .-–—')
-
-    return base, eps if eps else set()
+    values = titles if isinstance(titles, pd.Series) else pd.Series(list(titles), dtype=object)
+    codes, uniques = pd.factorize(values.reset_index(drop=True))
+    uniques = pd.Series(uniques, dtype=object)
+    if schedule:
+        unique = []
+        for text in series_norm_column(uniques):
+            base, episodes = series_from_text(text)
+            unique.append(NormalizedTitle(text, base, episodes, base_tokens(base)))
+    else:
+        unique = [title_from_text(text) for text in norm_column(uniques)]
+
+    vocabulary: Dict[str, int] = {}
+    for u in unique:
+        for token in u.tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    return NormalizedTitles(codes, unique, vocabulary)
@@ -7,8 +7,15 @@ except ImportError:
     import processor_rus  # type: ignore
     from shared import *  # type: ignore
 
+FOREIGN_SHEET_NAME = processor_rus.FOREIGN_SHEET_NAME
+
 
 def process(schedule_bytes: bytes, report_bytes: bytes, params: Dict) -> bytes:
+    """Обработка иностранного отчёта, результат – xlsx (см. run)."""
+    return run(schedule_bytes, report_bytes, params).xlsx
+
+
+def run(schedule_bytes: bytes, report_bytes: bytes, params: Dict, progress=None, matcher_index=None, cancel=None):
     """
     Обработка иностранного отчета.
     По умолчанию работает с листом "иностранные произведения" в отчётном файле, но
@@ -18,6 +25,6 @@ def process(schedule_bytes: bytes, report_bytes: bytes, params: Dict) -> bytes:
     # Если пользователь не передал sheet_name – подставляем лист иностранных произведений
     if 'sheet_name' not in params or not params.get('sheet_name'):
         params = dict(params)  # копия чтобы не мутировать исходный
-        params['sheet_name'] = 'иностранные произведения'
-    return processor_rus.process(schedule_bytes, report_bytes, params)
+        params['sheet_name'] = FOREIGN_SHEET_NAME
+    return processor_rus.run(schedule_bytes, report_bytes, params, progress, matcher_index, cancel)
 
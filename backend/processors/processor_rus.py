@@ -1,8 +1,9 @@
 # processor_rus.py – обработка российского отчёта (openpyxl-only)
-from io import BytesIO
-from typing import Dict
+from datetime import datetime as dt
+from typing import Callable, Dict, List, Optional, Tuple
 from openpyxl import load_workbook
 import logging
+import time
 import traceback
 
 from .shared import (
@@ -11,175 +12,360 @@ from .shared import (
     find_headers_any,
     limit_and_format,
 )
-from .matcher import pick_showtimes_for_report_title
+from .matcher import MatchCounters, match_report_title
+from . import title_normalizer
+from .episodes import iter_episodes
+from .normalize_titles import normalize_many
+from .results import ProcessResult, ProcessingCancelled, make_record, needs_xlsx
+from .xlsx_io import Source, open_source, workbook_to_bytes
+from .cell_writes import CellWriteBuffer
+from .stage_timer import StageTimer
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Листы типового отчёта (название российского листа – как в шаблоне, с опечаткой)
+RUS_SHEET_NAME = 'росийские произведения'
+FOREIGN_SHEET_NAME = 'иностранные произведения'
+COMBINED_SHEET_NAMES = [RUS_SHEET_NAME, FOREIGN_SHEET_NAME]
+
+# Как часто (в строках отчёта) сообщать о ходе сопоставления и проверять отмену
+PROGRESS_EVERY = 50
+
+# progress(stage, done, total): этапы 'index', 'load', 'match', 'save'
+ProgressCallback = Callable[[str, Optional[int], Optional[int]], None]
+
+
+def _no_progress(stage: str, done: Optional[int] = None, total: Optional[int] = None) -> None:
+    pass
+
+
+def _check_cancel(cancel) -> None:
+    """cancel – объект с is_set() (threading.Event или Event менеджера multiprocessing)."""
+    if cancel is not None and cancel.is_set():
+        raise ProcessingCancelled("Обработка отменена")
+
 
 def process(schedule_bytes: bytes, report_bytes: bytes, params: Dict) -> bytes:
-    """Основная функция обработки одного отчёта.
-    1. Строим индекс сетки (date -> (base,series)->times)
-    2. Находим в отчёте строку заголовков и нужные колонки
-    3. Для каждой строки отчёта ищем показы (точные + нечёткие)
-    4. Заполняем колонку дат/времён, удаляем строки без совпадений если включено
+    """Обработка одного отчёта, результат – xlsx (см. run)."""
+    return run(schedule_bytes, report_bytes, params).xlsx
+
+
+def build_matcher_index(schedule: Dict) -> Dict:
+    """Преобразует индекс сетки в формат для matcher.
+
+    schedule имеет формат: {date: {(base, series_int): [times]}}
+    результат: {(base, frozenset[episodes]): [datetime, ...]}
     """
-    try:
-        p = {**DEFAULTS, **(params or {})}
+    # Сначала собираем все показы по (base, episode)
+    temp_index = {}  # {(base, episode): [(date, time), ...]}
 
-        logger.info(f"🚀 Начинаю обработку с параметрами: max_shows={p['max_shows']}, "
-                    f"fuzzy_cutoff={p['fuzzy_cutoff']}, min_token_overlap={p['min_token_overlap']}")
+    for date_str, day_schedule in schedule.items():
+        # Парсим дату из строки "DD.MM.YYYY"
+        try:
+            day, month, year = date_str.split('.')
+            date_parts = (int(year), int(month), int(day))
+        except Exception as e:
+            logger.error(f"Ошибка парсинга даты '{date_str}': {e}")
+            continue
 
-        # Индекс сетки
-        logger.info("📖 Строю индекс сетки...")
-        schedule = build_schedule_index(schedule_bytes, p.get("schedule_sheet"))
+        for (base, series), times in day_schedule.items():
+            key = (base, series)
+            if key not in temp_index:
+                temp_index[key] = []
 
-        # Преобразуем индекс в формат для matcher: {(base, frozenset[episodes]): [datetime, ...]}
-        # schedule имеет формат: {date: {(base, series_int): [times]}}
-        # Нужно преобразовать в: {(base, frozenset[episodes]): [datetime]}
-        from datetime import datetime as dt
-
-        # Сначала собираем все показы по (base, episode)
-        temp_index = {}  # {(base, episode): [(date, time), ...]}
-
-        for date_str, day_schedule in schedule.items():
-            # Парсим дату из строки "DD.MM.YYYY"
-            try:
-                day, month, year = date_str.split('.')
-                date_parts = (int(year), int(month), int(day))
-            except Exception as e:
-                logger.error(f"Ошибка парсинга даты '{date_str}': {e}")
-                continue
+            for time_str in times:
+                try:
+                    # Парсим время из строки "HH:MM"
+                    hour, minute = time_str.split(':')
+                    show_datetime = dt(date_parts[0], date_parts[1], date_parts[2],
+                                       int(hour), int(minute))
+                    temp_index[key].append(show_datetime)
+                except Exception as e:
+                    logger.error(f"Ошибка парсинга времени '{time_str}': {e}")
+                    continue
 
-            for (base, series), times in day_schedule.items():
-                key = (base, series)
-                if key not in temp_index:
-                    temp_index[key] = []
-
-                for time_str in times:
-                    try:
-                        # Парсим время из строки "HH:MM"
-                        hour, minute = time_str.split(':')
-                        show_datetime = dt(date_parts[0], date_parts[1], date_parts[2],
-                                         int(hour), int(minute))
-                        temp_index[key].append(show_datetime)
-                    except Exception as e:
-                        logger.error(f"Ошибка парсинга времени '{time_str}': {e}")
-                        continue
-
-        # Теперь группируем по (base, frozenset[episodes])
-        matcher_index = {}
-
-        # Собираем все эпизоды для каждой базы
-        base_episodes = {}  # {base: set[episodes]}
-        for (base, episode), datetimes in temp_index.items():
-            if base not in base_episodes:
-                base_episodes[base] = set()
-            base_episodes[base].add(episode)
-
-        # Создаем ключи для matcher
-        series_count = {}  # Для статистики
-        for (base, episode), datetimes in temp_index.items():
-            # Для программ без серий (episode == -1) используем frozenset с -1
-            if episode == -1:
-                key = (base, frozenset([-1]))
-            else:
-                # Для программ с сериями создаем ключ только с этой серией
-                key = (base, frozenset([episode]))
+    # Теперь группируем по (base, frozenset[episodes])
+    matcher_index = {}
 
-            if key not in matcher_index:
-                matcher_index[key] = []
-            matcher_index[key].extend(datetimes)
+    # Создаем ключи для matcher
+    series_count = {}  # Для статистики
+    for (base, episode), datetimes in temp_index.items():
+        # Для программ без серий (episode == -1) используем frozenset с -1,
+        # для программ с сериями создаем ключ только с этой серией
+        key = (base, frozenset([episode]))
 
-            # Статистика
-            if base not in series_count:
-                series_count[base] = []
-            series_count[base].append(episode)
+        if key not in matcher_index:
+            matcher_index[key] = []
+        matcher_index[key].extend(datetimes)
 
-        logger.info(f"✅ Индекс построен: {len(matcher_index)} уникальных ключей")
+        # Статистика
+        if base not in series_count:
+            series_count[base] = []
+        series_count[base].append(episode)
 
-        # Выводим детальную информацию о многосерийных программах
-        multi_series = {b: eps for b, eps in series_count.items() if len(eps) > 1 and -1 not in eps}
-        if multi_series:
-            logger.info(f"📺 Многосерийные программы:")
-            for base, episodes in sorted(multi_series.items())[:10]:  # Показываем первые 10
-                episodes_sorted = sorted([e for e in episodes if e != -1])
-                logger.info(f"   '{base}': серии {episodes_sorted}")
+    logger.info(f"✅ Индекс построен: {len(matcher_index)} уникальных ключей")
 
-        logger.debug(f"   Примеры ключей: {list(matcher_index.keys())[:5]}")
+    # Выводим детальную информацию о многосерийных программах
+    multi_series = {b: eps for b, eps in series_count.items() if len(eps) > 1 and -1 not in eps}
+    if multi_series:
+        logger.info(f"📺 Многосерийные программы:")
+        for base, episodes in sorted(multi_series.items())[:10]:  # Показываем первые 10
+            episodes_sorted = sorted([e for e in episodes if e != -1])
+            logger.info(f"   '{base}': серии {episodes_sorted}")
 
-        # Загружаем отчёт
-        logger.info("📄 Загружаю отчёт...")
-        wb = load_workbook(BytesIO(report_bytes))
+    logger.debug(f"   Примеры ключей: {list(matcher_index.keys())[:5]}")
+    return matcher_index
 
-        # Выбираем лист (по умолчанию первый, либо по имени из параметров)
-        sheet_name = p.get('sheet_name')
-        if sheet_name and sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            logger.info(f"📄 Используется лист: '{sheet_name}'")
-        else:
-            ws = wb.worksheets[0]
-            logger.info(f"📄 Используется первый лист: '{ws.title}'")
+
+def index_stats(matcher_index: Dict) -> Dict:
+    """Краткая статистика индекса: ключи, программы, показы и период сетки."""
+    airtimes = [show_dt for times in matcher_index.values() for show_dt in times]
+    return {
+        'keys': len(matcher_index),
+        'bases': len({base for base, _ in matcher_index}),
+        'airtimes': len(airtimes),
+        'first_airtime': min(airtimes).strftime('%Y-%m-%dT%H:%M') if airtimes else None,
+        'last_airtime': max(airtimes).strftime('%Y-%m-%dT%H:%M') if airtimes else None,
+    }
+
+
+def _select_sheets(wb, p: Dict) -> List:
+    """Листы для обработки: params['sheet_names'] (список), params['sheet_name'] или первый лист."""
+    sheet_names = p.get('sheet_names')
+    if sheet_names:
+        sheets = [wb[name] for name in sheet_names if name in wb.sheetnames]
+        missing = [name for name in sheet_names if name not in wb.sheetnames]
+        if missing:
+            logger.warning(f"⚠️ Листы не найдены и пропущены: {missing}")
+        if not sheets:
+            raise ValueError(f"В отчёте нет ни одного из листов: {list(sheet_names)}")
+        logger.info(f"📄 Используются листы: {[ws.title for ws in sheets]}")
+        return sheets
+
+    # Выбираем лист (по умолчанию первый, либо по имени из параметров)
+    sheet_name = p.get('sheet_name')
+    if sheet_name and sheet_name in wb.sheetnames:
+        logger.info(f"📄 Используется лист: '{sheet_name}'")
+        return [wb[sheet_name]]
+    ws = wb.worksheets[0]
+    logger.info(f"📄 Используется первый лист: '{ws.title}'")
+    return [ws]
+
+
+def _process_sheet(ws, matcher_index: Dict, p: Dict, write_xlsx: bool,
+                   progress: ProgressCallback = _no_progress,
+                   timer: Optional[StageTimer] = None, cancel=None,
+                   counters: Optional[MatchCounters] = None) -> Tuple[List[Dict], Dict]:
+    """Заполняет один лист отчёта. Возвращает записи по строкам и статистику листа."""
+    timer = timer or StageTimer()
+    counters = counters or MatchCounters()
+    with timer.stage("header_detect"):
         hr, tc, dc = find_headers_any(ws, p.get("mapping"))
 
-        logger.info(f"📍 Заголовки: строка {hr}, название в колонке {tc}, даты в колонке {dc}")
+    logger.info(f"📍 '{ws.title}': заголовки в строке {hr}, название в колонке {tc}, даты в колонке {dc}")
 
-        rows_to_delete = []
-        matched_count = 0
-        unmatched_count = 0
-        total_rows = ws.max_row - hr
+    records = []
+    writes = CellWriteBuffer()  # значения пишутся в лист одним пакетом после сопоставления
+    rows_to_delete = []
+    matched_count = 0
+    unmatched_count = 0
+    total_rows = ws.max_row - hr
+    # Построчные сообщения – только на DEBUG, и без форматирования строк, если он выключен
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-        for r in range(hr + 1, ws.max_row + 1):
-            try:
-                title_val = ws.cell(row=r, column=tc).value
-                if not title_val:
-                    continue
+    # Колонка названий нормализуется целиком: каждое уникальное название – один раз
+    with timer.stage("normalize"):
+        titles = [str(v) if v else None
+                  for (v,) in ws.iter_rows(min_row=hr + 1, max_row=ws.max_row, min_col=tc, max_col=tc,
+                                           values_only=True)]
+        normalized = normalize_many(titles)
+    matches = {}  # номер уникального названия -> MatchResult
 
-                # Показываем, что ищем
-                from .normalize_titles import split_base_episodes
-                search_base, search_eps = split_base_episodes(str(title_val))
-                logger.info(f"🔍 Строка {r}: '{title_val}' → база='{search_base}', серии={search_eps}")
-
-                # Используем улучшенный matcher
-                found_datetimes = pick_showtimes_for_report_title(str(title_val), matcher_index)
-
-                # Форматируем найденные времена
-                if found_datetimes:
-                    # Форматируем в строки "DD.MM.YYYY в HH:MM"
-                    formatted_times = [
-                        f"{show_dt.day:02d}.{show_dt.month:02d}.{show_dt.year} в {show_dt.hour}:{show_dt.minute:02d}"
-                        for show_dt in found_datetimes
-                    ]
-                    formatted_value = limit_and_format(formatted_times, p["max_shows"])
-                    ws.cell(row=r, column=dc).value = formatted_value
-                    matched_count += 1
-                    logger.info(f"✅ Строка {r}: найдено {len(found_datetimes)} показов → {formatted_value}")
-                else:
-                    unmatched_count += 1
-                    logger.warning(f"❌ Строка {r}: '{title_val}' → не найдено совпадений")
-                    if p["delete_unmatched"]:
-                        rows_to_delete.append(r)
-            except Exception as row_error:
-                logger.error(f"❌ Ошибка обработки строки {r}: {row_error}")
-                logger.error(f"   Traceback: {traceback.format_exc()}")
-                # Продолжаем обработку остальных строк
+    match_started = time.perf_counter()
+    progress("match", 0, total_rows)
+    for r in range(hr + 1, ws.max_row + 1):
+        if (r - hr) % PROGRESS_EVERY == 0:
+            progress("match", r - hr, total_rows)
+            _check_cancel(cancel)
+        try:
+            title_val = titles[r - hr - 1]
+            if not title_val:
                 continue
 
-        # Удаляем строки снизу вверх
-        if rows_to_delete:
-            logger.info(f"🗑️  Удаляю {len(rows_to_delete)} строк без совпадений...")
+            # Показываем, что ищем
+            code = normalized.codes[r - hr - 1]
+            search = normalized.unique[code]
+            if debug:
+                logger.debug(f"🔍 Строка {r}: '{title_val}' → база='{search.base}', серии={search.episodes}")
+
+            # Используем улучшенный matcher; повторы названия сопоставляются один раз
+            match = matches.get(code)
+            if match is None:
+                match = matches[code] = match_report_title(title_val, matcher_index, search, counters)
+            else:
+                counters.reused += 1
+            found_datetimes = match.times
+            records.append(make_record(ws.title, r, title_val, match.base, iter_episodes(search.episodes),
+                                       found_datetimes, match.strategy, match.score))
+
+            # Форматируем найденные времена
+            if found_datetimes:
+                # Форматируем в строки "DD.MM.YYYY в HH:MM"
+                formatted_times = [
+                    f"{show_dt.day:02d}.{show_dt.month:02d}.{show_dt.year} в {show_dt.hour}:{show_dt.minute:02d}"
+                    for show_dt in found_datetimes
+                ]
+                formatted_value = limit_and_format(formatted_times, p["max_shows"])
+                if write_xlsx:
+                    writes.add(r, dc, formatted_value)
+                matched_count += 1
+                if debug:
+                    logger.debug(f"✅ Строка {r}: найдено {len(found_datetimes)} показов → {formatted_value}")
+            else:
+                unmatched_count += 1
+                if debug:
+                    logger.debug(f"❌ Строка {r}: '{title_val}' → не найдено совпадений")
+                if p["delete_unmatched"]:
+                    rows_to_delete.append(r)
+        except Exception as row_error:
+            logger.error(f"❌ Ошибка обработки строки {r}: {row_error}")
+            logger.error(f"   Traceback: {traceback.format_exc()}")
+            # Продолжаем обработку остальных строк
+            continue
+
+    progress("match", total_rows, total_rows)
+    timer.add("match", time.perf_counter() - match_started)
+    with timer.stage("write"):
+        writes.apply(ws)
+
+    # Удаляем строки снизу вверх
+    if rows_to_delete and write_xlsx:
+        logger.info(f"🗑️  Удаляю {len(rows_to_delete)} строк без совпадений...")
+        with timer.stage("delete_rows"):
             for i, rr in enumerate(rows_to_delete):
                 ws.delete_rows(rr - i, 1)
 
-        logger.info(f"✅ Обработка завершена: {matched_count} совпадений, "
-                    f"{unmatched_count} не найдено из {total_rows} строк")
+    logger.info(f"✅ Лист '{ws.title}': {matched_count} совпадений, "
+                f"{unmatched_count} не найдено из {total_rows} строк")
+
+    return records, {'matched': matched_count, 'unmatched': unmatched_count, 'total_rows': total_rows}
+
+
+def build_index(schedule_bytes: Source, params: Optional[Dict] = None,
+                timer: Optional[StageTimer] = None) -> Dict:
+    """Индекс сетки в формате matcher – его можно построить один раз для нескольких отчётов."""
+    p = {**DEFAULTS, **(params or {})}
+    timer = timer or StageTimer()
+    with timer.stage("schedule_parse"):
+        schedule = build_schedule_index(schedule_bytes, p.get("schedule_sheet"))
+    with timer.stage("index_build"):
+        return build_matcher_index(schedule)
+
+
+def run(schedule_bytes: Optional[Source], report_bytes: Source, params: Dict,
+        progress: Optional[ProgressCallback] = None, matcher_index: Optional[Dict] = None,
+        cancel=None) -> ProcessResult:
+    """Основная функция обработки одного отчёта.
+    1. Строим индекс сетки (date -> (base,series)->times)
+    2. Находим в отчёте строку заголовков и нужные колонки
+    3. Для каждой строки отчёта ищем показы (точные + нечёткие)
+    4. Заполняем колонку дат/времён, удаляем строки без совпадений если включено
+
+    params['output'] ('xlsx' | 'json' | 'csv' | 'both') определяет, нужна ли книга:
+    при 'json'/'csv' сохранение xlsx (и удаление строк) пропускается, возвращаются только записи.
+
+    params['compression'] – уровень сжатия сохраняемой книги (см. xlsx_io).
+
+    params['sheet_names'] – список листов, обрабатываемых за один проход: индекс сетки
+    строится один раз, книга загружается и сохраняется один раз.
+
+    progress(stage, done, total) – необязательный обработчик хода работы.
+    cancel – токен отмены (is_set()); проверяется между этапами и каждые
+    PROGRESS_EVERY строк, при отмене – ProcessingCancelled.
+    stats['timings'] – секунды по этапам (schedule_parse, index_build, load,
+    header_detect, normalize, match, write, delete_rows, save).
+    stats['matcher'] – счётчики сопоставления (matcher.MatchCounters) и
+    обращения к кэшу нормализации названий за эту обработку ('norm_cache').
+    matcher_index – готовый индекс (см. build_index); тогда schedule_bytes не читается.
+    schedule_bytes и report_bytes – содержимое файлов или пути к ним.
+    """
+    try:
+        p = {**DEFAULTS, **(params or {})}
+        progress = progress or _no_progress
+        timer = StageTimer()
+        counters = MatchCounters()
+        norm_cache_before = title_normalizer.cache_info()
+
+        logger.info(f"🚀 Начинаю обработку с параметрами: max_shows={p['max_shows']}, "
+                    f"fuzzy_cutoff={p['fuzzy_cutoff']}, min_token_overlap={p['min_token_overlap']}")
+
+        # Индекс сетки
+        if matcher_index is None:
+            logger.info("📖 Строю индекс сетки...")
+            progress("index")
+            matcher_index = build_index(schedule_bytes, p, timer)
+        else:
+            logger.info(f"📖 Используется готовый индекс сетки: {len(matcher_index)} ключей")
 
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
-        return out.getvalue()
+        # Загружаем отчёт
+        logger.info("📄 Загружаю отчёт...")
+        _check_cancel(cancel)
+        progress("load")
+        with timer.stage("load"):
+            wb = load_workbook(open_source(report_bytes))
+        write_xlsx = needs_xlsx(p.get("output"))
+
+        records = []
+        stats = {'matched': 0, 'unmatched': 0, 'total_rows': 0, 'sheets': {}, 'strategies': {}, 'timings': {}}
+        for ws in _select_sheets(wb, p):
+            sheet_records, sheet_stats = _process_sheet(ws, matcher_index, p, write_xlsx, progress, timer, cancel,
+                                                        counters)
+            records.extend(sheet_records)
+            stats['sheets'][ws.title] = sheet_stats
+            for k in ('matched', 'unmatched', 'total_rows'):
+                stats[k] += sheet_stats[k]
+
+        # Строки по стратегии сопоставления (None – совпадений нет)
+        for rec in records:
+            strategy = rec['strategy'] or 'unmatched'
+            stats['strategies'][strategy] = stats['strategies'].get(strategy, 0) + 1
+
+        logger.info(f"✅ Обработка завершена: {stats['matched']} совпадений, "
+                    f"{stats['unmatched']} не найдено из {stats['total_rows']} строк")
 
+        # Счётчики matcher; кэш нормализации общий для процесса – берём прирост за обработку
+        norm_cache = title_normalizer.cache_info()
+        stats['matcher'] = {**counters.as_dict(), 'norm_cache': {
+            'hits': norm_cache['hits'] - norm_cache_before['hits'],
+            'misses': norm_cache['misses'] - norm_cache_before['misses'],
+        }}
+        m = stats['matcher']
+        logger.info(f"🔢 Matcher: {m['calls']} названий (+{m['reused']} повторов), "
+                    f"ключей оценено {m['keys_scored']}, с пустой базой {m['keys_pruned']}, "
+                    f"кандидатов {m['candidates']}, "
+                    f"пустых результатов {m['empty']}, стратегии {m['strategies']}, "
+                    f"кэш нормализации {m['norm_cache']['hits']}/{m['norm_cache']['misses']} (попадания/промахи)")
+
+        if not write_xlsx:
+            # Книга не нужна – пропускаем дорогое сохранение
+            stats['timings'] = timer.as_dict()
+            return ProcessResult(None, records, stats)
+
+        # Сохраняем с выбранным уровнем сжатия (params['compression'])
+        _check_cancel(cancel)
+        progress("save")
+        with timer.stage("save"):
+            xlsx_bytes, stats['save'] = workbook_to_bytes(wb, p.get('compression'))
+        stats['timings'] = timer.as_dict()
+        logger.info(f"💾 Сохранено: {stats['save']['bytes']} байт, сжатие '{stats['save']['compression']}', "
+                    f"{stats['save']['seconds']:.2f} с")
+        return ProcessResult(xlsx_bytes, records, stats)
+
+    except ProcessingCancelled:
+        logger.info("⏹️ Обработка отменена")
+        raise
     except Exception as e:
         logger.error(f"💥 Критическая ошибка в process(): {e}")
         logger.error(f"   Full traceback:\n{traceback.format_exc()}")
@@ -8,6 +8,13 @@
 from io import BytesIO
 from typing import Dict
 
+try:
+    from .results import ProcessResult
+    from .xlsx_io import read_source
+except ImportError:
+    from results import ProcessResult  # type: ignore
+    from xlsx_io import read_source  # type: ignore
+
 
 def process(schedule_bytes: bytes, report_bytes: bytes, params: Dict) -> bytes:
     """Возвращает исходный отчёт как есть (пока что заглушка).
@@ -26,3 +33,9 @@ def process(schedule_bytes: bytes, report_bytes: bytes, params: Dict) -> bytes:
         return mem.getvalue()
     return report_bytes
 
+
+
+def run(schedule_bytes, report_bytes, params: Dict, progress=None, matcher_index=None, cancel=None) -> ProcessResult:
+    """То же, что process, но в виде ProcessResult (построчных записей у заглушки нет).
+    report_bytes – содержимое отчёта или путь к нему."""
+    return ProcessResult(process(schedule_bytes, read_source(report_bytes), params), [], {})
@@ -0,0 +1,90 @@
+# results.py – результат обработки отчёта и машиночитаемые выгрузки (JSON/CSV)
+"""Результат работы процессоров.
+
+ProcessResult содержит сохранённую книгу (если она запрошена) и построчные
+записи сопоставления. Записи можно отдать потоком в виде JSON Lines или CSV,
+не перечитывая xlsx.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Допустимые значения параметра output
+OUTPUT_XLSX = "xlsx"
+OUTPUT_JSON = "json"
+OUTPUT_CSV = "csv"
+OUTPUT_BOTH = "both"
+OUTPUT_FORMATS = (OUTPUT_XLSX, OUTPUT_JSON, OUTPUT_CSV, OUTPUT_BOTH)
+
+# Порядок полей одной записи (он же порядок колонок CSV)
+RECORD_FIELDS = ["sheet", "row", "title", "resolved_base", "episodes", "airtimes", "strategy", "score"]
+
+
+@dataclass
+class ProcessResult:
+    """Итог обработки: xlsx (None, если книга не сохранялась), записи и статистика."""
+    xlsx: Optional[bytes] = None
+    records: List[Dict] = field(default_factory=list)
+    stats: Dict = field(default_factory=dict)
+
+
+class ProcessingCancelled(Exception):
+    """Обработка остановлена по токену отмены (клиент отключился или задание отменено)."""
+
+
+def needs_xlsx(output: Optional[str]) -> bool:
+    """Нужно ли сохранять книгу для данного формата выдачи."""
+    return (output or OUTPUT_XLSX) in (OUTPUT_XLSX, OUTPUT_BOTH)
+
+
+def make_record(sheet: str, row: int, title: str, resolved_base: Optional[str],
+                episodes: Iterable[int], airtimes: Iterable, strategy: Optional[str],
+                score: Optional[float]) -> Dict:
+    """Собирает запись одной строки отчёта. Времена показа – ISO-строки 'YYYY-MM-DDTHH:MM'."""
+    return {
+        "sheet": sheet,
+        "row": row,
+        "title": title,
+        "resolved_base": resolved_base,
+        "episodes": sorted(e for e in episodes if e != -1),
+        "airtimes": [dt.strftime("%Y-%m-%dT%H:%M") for dt in sorted(set(airtimes))],
+        "strategy": strategy,
+        "score": round(score, 2) if score is not None else None,
+    }
+
+
+def iter_ndjson(records: Iterable[Dict]) -> Iterator[bytes]:
+    """Одна запись – одна строка JSON (JSON Lines)."""
+    for rec in records:
+        yield (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_csv(records: Iterable[Dict]) -> Iterator[bytes]:
+    """CSV с заголовком; списки склеиваются: эпизоды через ',', времена через ';'."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def flush() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+        return data
+
+    # BOM, чтобы Excel корректно открывал кириллицу
+    writer.writerow(RECORD_FIELDS)
+    yield b"\xef\xbb\xbf" + flush()
+    for rec in records:
+        writer.writerow([
+            rec["sheet"],
+            rec["row"],
+            rec["title"],
+            rec["resolved_base"] or "",
+            ",".join(str(e) for e in rec["episodes"]),
+            ";".join(rec["airtimes"]),
+            rec["strategy"] or "",
+            "" if rec["score"] is None else rec["score"],
+        ])
+        yield flush()
@@ -1,11 +1,17 @@
-import re, os, tempfile
-from io import BytesIO
+import re
 from difflib import SequenceMatcher
 from typing import Dict, Tuple, Set, List, Optional
 from datetime import datetime
 import pandas as pd
 from openpyxl.worksheet.worksheet import Worksheet
 
+from .header_locator import compile_candidates, locate_header, norm_header
+from .cell_parsers import MONTHS_RU, date_label, time_label  # noqa: F401
+from .episodes import iter_episodes
+from .normalize_titles import normalize_many
+from .title_normalizer import NOISE_TOKENS, denoise_title, series_title, simple_norm  # noqa: F401
+from .xlsx_io import open_source
+
 # -------- ПАРАМЕТРЫ ПО УМОЛЧАНИЮ --------
 DEFAULTS = dict(
     max_shows=3,
@@ -24,56 +30,18 @@ DATE_HEADER_CANDS = [
     "дата и время выхода в эфир", "дата выхода в эфир","время выхода в эфир",
 ]
 
-NOISE_TOKENS = {
-    "ред","ред.","редакция","final","master","v2","v3","copy","копия","коп","сору",
-    "hdrip","webrip","web","rip","bdrip","1080p","720p","uhd","4k","fullhd","hd","sd","h264","x264","x265","hevc","avc",
-}
-
-MONTHS_RU = {"января":"01","февраля":"02","марта":"03","апреля":"04","мая":"05","июня":"06",
-             "июля":"07","августа":"08","сентября":"09","октября":"10","ноября":"11","декабря":"12"}
-
 def _norm(s:str)->str:
-    return re.sub(r"\s+"," ",str(s).strip().lower().replace("ё","е"))
+    return simple_norm(s)
 
 def denoise_tokens(s: str) -> str:
-    s = _norm(s)
-    s = re.sub(r"\([^)]*\)", " ", s)
-    s = re.sub(r"\.(mp4|mov|mxf|avi|mkv)\b.*$", " ", s, flags=re.I)
-    s = re.sub(r"^\s*\d{3,}[-_ ]+", " ", s)
-    toks = re.split(r"[^\w]+", s)
-    clean=[]
-    for t in toks:
-        if not t: continue
-        if re.fullmatch(r"\d{3,}", t): continue
-        if t in NOISE_TOKENS: continue
-        clean.append(t)
-    return " ".join(clean).strip(" .-–—")
+    return denoise_title(s)
 
 def normalize_base(title:str)->str:
-    base = denoise_tokens(title or "")
-    base = re.sub(r"\b\d{1,3}\s*(сер(ия|ии|и)|вып(уск|уски|\.?))\b"," ",base)
-    base = re.sub(r"\b(сер(ия|ии|и)|вып(уск|уски|\.?))\s*\d{1,3}\b"," ",base)
-    base = re.sub(r"\b\d{1,3}\s*-\s*\d{1,3}\b"," ",base)
-    return re.sub(r"\s+"," ",base).strip(" .-–—")
+    return series_title(title or "")[0]
 
 def extract_series_set(text:str)->Set[int]:
     """Извлекает номера серий/выпусков из текста. Возвращает Set[int]."""
-    s = _norm(text)
-    nums=set()
-    for m in re.finditer(r"\b(\d{1,3})\s*(?:-?\s*я)?\s*сер(ия|ии|и)\b",s): nums.add(int(m.group(1)))
-    for m in re.finditer(r"\bсер(ия|ии|и)\s*(\d{1,3})\b",s): nums.add(int(m.group(2)))
-    for m in re.finditer(r"\b(\d{1,3})\s*вып(уск|уски|\.?)\b",s): nums.add(int(m.group(1)))
-    for m in re.finditer(r"\bвып(уск|уски|\.?)\s*(\d{1,3})\b",s): nums.add(int(m.group(2)))
-    for m in re.finditer(r"\b(\d{1,3})\s*-\s*(\d{1,3})\s*(?:сер|вып)\b",s):
-        a,b=int(m.group(1)),int(m.group(2))
-        for n in range(min(a,b),max(a,b)+1): nums.add(n)
-    for m in re.finditer(r"\b(\d{1,3})(?:\s*,\s*(\d{1,3}))+?\s*(?:сер|вып)\b",s):
-        for n in re.findall(r"\d{1,3}",m.group(0)): nums.add(int(n))
-    # Если нет явного указания на серию, но есть число в конце - используем его
-    if not nums:
-        m=re.search(r"\.?\s*(\d{1,3})\s*$",s)
-        if m: nums.add(int(m.group(1)))
-    return nums if nums else set()
+    return set(iter_episodes(series_title(text)[1]))
 
 def tokenize(s:str)->List[str]:
     return [t for t in re.split(r"[^\w]+",_norm(s)) if t]
@@ -94,64 +62,10 @@ def parse_time_from_str(x)->Optional[str]:
     - Excel числа: 0.25 (= 06:00)
     - pandas Timestamp
     - datetime objects
-    """
-    if x is None or (isinstance(x, float) and pd.isna(x)):
-        return None
-
-    # pandas Timestamp или datetime
-    if isinstance(x, (pd.Timestamp, datetime)):
-        try:
-            # ИСПРАВЛЕНИЕ: проверяем на NaN и преобразуем атрибуты в int
-            if pd.isna(x.hour) or pd.isna(x.minute):
-                return None
-            hour = int(x.hour)
-            minute = int(x.minute)
-            return f"{hour}:{minute:02d}"
-        except (ValueError, AttributeError):
-            return None
 
-    # Excel время как доля суток (0.0 - 1.0)
-    if isinstance(x, (int, float)):
-        try:
-            f = float(x)
-            # Проверяем, что это похоже на время (0.0-1.0)
-            if 0.0 <= f < 1.0:
-                total_seconds = int(f * 24 * 3600)
-                hours = total_seconds // 3600
-                minutes = (total_seconds % 3600) // 60
-                return f"{hours}:{minutes:02d}"
-            # Если число >= 1, возможно это просто час
-            elif f < 24:
-                return f"{int(f)}:00"
-        except:
-            pass
-
-    # Строковый формат
-    try:
-        s = str(x).strip()
-    except:
-        return None
-
-    # Формат: "HH:MM" или "HH:MM:SS"
-    m = re.match(r"^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*$", s)
-    if m:
-        try:
-            h, mi = int(m.group(1)), int(m.group(2))
-            if 0 <= h < 24 and 0 <= mi < 60:
-                return f"{h}:{mi:02d}"
-        except:
-            pass
-
-    # Одиночное число - трактуем как час
-    if re.fullmatch(r"\d{1,2}", s):
-        try:
-            h = int(float(s))  # На случай если "6.0"
-            if 0 <= h < 24:
-                return f"{h}:00"
-        except:
-            pass
-
-    return None
+    Разбор строк кэшируется (см. cell_parsers).
+    """
+    return time_label(x)
 
 def parse_date_label_ru(text:str)->Optional[str]:
     """Извлекает дату из текста в разных форматах.
@@ -164,43 +78,7 @@ def parse_date_label_ru(text:str)->Optional[str]:
     """
     if not isinstance(text, str):
         return None
-
-    try:
-        # Формат: "1 сентября 2025" или "Понедельник, 1 сентября 2025"
-        m = re.search(r"(\d{1,2})\s+([А-Яа-яЁё]+)\s+(\d{4})", text)
-        if m:
-            d, mon, y = m.groups()
-            mon_num = MONTHS_RU.get(_norm(mon))
-            if mon_num:
-                # Защита: явное преобразование в int через float
-                day = int(float(d))
-                year = int(float(y))
-                return f"{day:02d}.{mon_num}.{year}"
-
-        # Формат: "01.09.2025"
-        m = re.search(r"(\d{1,2})\.(\d{1,2})\.(\d{4})", text)
-        if m:
-            d, mon, y = m.groups()
-            day = int(float(d))
-            month = int(float(mon))
-            year = int(float(y))
-            return f"{day:02d}.{month:02d}.{year}"
-
-        # Формат: "01.09.25"
-        m = re.search(r"(\d{1,2})\.(\d{1,2})\.(\d{2})$", text)
-        if m:
-            d, mon, y = m.groups()
-            day = int(float(d))
-            month = int(float(mon))
-            year_short = int(float(y))
-            full_year = f"20{year_short}" if year_short < 50 else f"19{year_short}"
-            return f"{day:02d}.{month:02d}.{full_year}"
-    except Exception as e:
-        import logging
-        logging.error(f"Ошибка парсинга даты '{text}': {e}")
-        return None
-
-    return None
+    return date_label(text)
 
 def parse_dt_key(full:str):
     """Парсит строку вида '01.09.2025 в 6:00' в сортируемый ключ."""
@@ -230,41 +108,51 @@ def limit_and_format(full_list:List[str], limit:int)->str:
     uniq.sort(key=parse_dt_key)
     return " и ".join(uniq[:limit])
 
+_TITLE_CANDS_RE = compile_candidates(TITLE_HEADER_CANDS)
+_DATE_CANDS_RE = compile_candidates(DATE_HEADER_CANDS)
+_TITLE_WORD_RE = re.compile(r"название|наименование")
+_TITLE_KIND_RE = re.compile(r"передач|произвед|программ")
+
+
 def find_headers_any(ws: Worksheet, mapping=None):
-    def is_title(text:str)->bool:
-        t=_norm(text)
-        if mapping and "title" in mapping:
-            for cand in mapping["title"]:
-                if _norm(cand) in t: return True
-        return any(c in t for c in TITLE_HEADER_CANDS) or (("название" in t or "наименование" in t) and ("передач" in t or "произвед" in t or "программ" in t))
-    def is_dt(text:str)->bool:
-        t=_norm(text)
-        if mapping and "aircol" in mapping:
-            for cand in mapping["aircol"]:
-                if _norm(cand) in t: return True
-        return any(c in t for c in DATE_HEADER_CANDS) or ("дата" in t and "время" in t and "эфир" in t)
-
-    header_row=title_col=date_col=None
-    for r in range(1, min(200, ws.max_row)+1):
-        for c in range(1, ws.max_column+1):
-            v=ws.cell(row=r,column=c).value
-            if isinstance(v,str) and is_title(v):
-                header_row, title_col = r, c
-                break
-        if header_row: break
-    if not header_row:
+    """Ищет строку заголовков (первые HEADER_SCAN_ROWS строк) и колонки названия и даты/времени.
+
+    Результат кэшируется по шаблону отчёта (см. header_locator). Если колонки даты нет,
+    она добавляется справа с заголовком «Дата и время выхода в эфир».
+    """
+    title_map = tuple(mapping.get("title", ())) if mapping else ()
+    air_map = tuple(mapping.get("aircol", ())) if mapping else ()
+    title_map_re = compile_candidates(title_map)
+    air_map_re = compile_candidates(air_map)
+
+    def is_title(t: str) -> bool:
+        if title_map_re is not None and title_map_re.search(t): return True
+        return bool(_TITLE_CANDS_RE.search(t)) or bool(_TITLE_WORD_RE.search(t) and _TITLE_KIND_RE.search(t))
+
+    def is_dt(t: str) -> bool:
+        if air_map_re is not None and air_map_re.search(t): return True
+        return bool(_DATE_CANDS_RE.search(t)) or ("дата" in t and "время" in t and "эфир" in t)
+
+    def match_row(values):
+        title_col = next((c for c, v in enumerate(values, start=1)
+                          if isinstance(v, str) and is_title(norm_header(v))), None)
+        if title_col is None:
+            return None
+        date_col = next((c for c, v in enumerate(values, start=1)
+                         if isinstance(v, str) and is_dt(norm_header(v))), None)
+        return title_col, date_col
+
+    found = locate_header(ws, ("any", title_map, air_map), match_row)
+    if not found:
         raise SystemExit("Не найден столбец с названием.")
+    header_row, (title_col, date_col) = found
 
-    for c in range(1, ws.max_column+1):
-        v=ws.cell(row=header_row,column=c).value
-        if isinstance(v,str) and is_dt(v):
-            date_col=c; break
     if date_col is None:
         date_col=ws.max_column+1
         ws.cell(row=header_row,column=date_col).value="Дата и время выхода в эфир"
     return header_row, title_col, date_col
 
-def build_schedule_index(schedule_xlsx_bytes: bytes, schedule_sheet: Optional[str]=None):
+def build_schedule_index(schedule_xlsx_bytes, schedule_sheet: Optional[str]=None):
     """Читает книгу Excel из bytes, строит индекс: date -> {(base, series): [HH:MM,...]}.
 
     УЛУЧШЕНИЯ:
@@ -277,8 +165,8 @@ def build_schedule_index(schedule_xlsx_bytes: bytes, schedule_sheet: Optional[st
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    mem = BytesIO(schedule_xlsx_bytes)
-    xls = pd.ExcelFile(mem)
+    # bytes или путь к файлу на диске (загрузки API не читаются в память целиком)
+    xls = pd.ExcelFile(open_source(schedule_xlsx_bytes))
 
     try:
         sheet = schedule_sheet if schedule_sheet and schedule_sheet in xls.sheet_names else xls.sheet_names[0]
@@ -290,7 +178,6 @@ def build_schedule_index(schedule_xlsx_bytes: bytes, schedule_sheet: Optional[st
         rows = []
         current_date = None
         date_found_count = 0
-        program_count = 0
 
         for idx, row in df.iterrows():
             # Ищем дату в ЛЮБОЙ колонке (не только в B)
@@ -337,18 +224,18 @@ def build_schedule_index(schedule_xlsx_bytes: bytes, schedule_sheet: Optional[st
             if len(title_val) < 3 or title_val.lower() in ['nan', 'none', '']:
                 continue
 
-            base = normalize_base(title_val)
-            if not base or len(base) < 2:
-                continue
-
-            series_set = extract_series_set(title_val)
-
-            # Для программ без серий используем специальный маркер
-            if not series_set:
-                series_set = {-1}  # Специальное значение для программ без серий
+            rows.append((current_date, title_val, time_val))
 
-            rows.append((current_date, base, series_set, time_val))
-            program_count += 1
+        # Названия разбираются пачкой: каждое уникальное – один раз
+        normalized = normalize_many([title for _, title, _ in rows], schedule=True)
+        programs = []
+        for i, (d, _, t) in enumerate(rows):
+            title = normalized.title(i)
+            if not title.base or len(title.base) < 2:
+                continue
+            programs.append((d, title.base, title.episodes, t))
+        rows = programs
+        program_count = len(rows)
 
         logger.info(f"✅ Найдено дат: {date_found_count}, программ: {program_count}")
 
@@ -357,9 +244,10 @@ def build_schedule_index(schedule_xlsx_bytes: bytes, schedule_sheet: Optional[st
 
     # Строим индекс
     schedule = {}
-    for d, base, sset, t in rows:
+    for d, base, episodes, t in rows:
         mp = schedule.setdefault(d, {})
-        for sn in sset:
+        # -1 – специальное значение для программ без серий
+        for sn in (iter_episodes(episodes) if episodes else (-1,)):
             mp.setdefault((base, sn), []).append(t)
 
     # Сортируем времена
@@ -0,0 +1,41 @@
+# stage_timer.py – замер времени этапов обработки
+"""Замер этапов обработки.
+
+Этапы с одинаковым именем суммируются (например, сопоставление на каждом
+листе отчёта). Итог отдаётся словарём {этап: секунды} – он попадает в
+stats['timings'] результата – или строкой заголовка Server-Timing.
+"""
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        self._totals: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        self._totals[name] = self._totals.get(name, 0.0) + seconds
+
+    def merge(self, timings: Dict[str, float]) -> None:
+        for name, seconds in timings.items():
+            self.add(name, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self._totals)
+
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self._totals.items()}
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing: 'match;dur=12.3, save;dur=4.5'."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_ms().items())
@@ -3,36 +3,19 @@
 from openpyxl import load_workbook
 from datetime import datetime, date, timedelta, time
 import io
-import re
 from typing import Dict, Tuple, Optional, Union, List
 
-# Дополнительные регулярки для улучшенного парсинга эпизода
-_EP_ANY_RE = re.compile(r'(\d{1,3})\s*(?:серия|выпуск|эпизод|часть)\b', re.I)
-_LEADING_CODE_RE = re.compile(r'^\d{4,}[ _-]+')
-_EP_SINGLE_RE = re.compile(r'(?:^|[\s.])(\d{1,3})\s*(?:серия|выпуск|эпизод|часть)?$', re.I)
+from .cell_parsers import strict_date, strict_time
+from .cell_writes import CellWriteBuffer
+from .title_normalizer import strict_episodes, strict_norm, strict_title_episode
 
 # Нормализация строки: удаление лишних пробелов, перевод в нижний регистр
 def norm(s: str) -> str:
-    return ' '.join(s.strip().lower().split())
+    return strict_norm(s)
 
-# Парсинг времени в формате ЧЧ:ММ или ЧЧ:ММ:СС
+# Парсинг времени в формате ЧЧ:ММ или ЧЧ:ММ:СС (Excel-доли суток – арифметикой, строки – с кэшем)
 def _parse_time(time_val: Union[str, float]) -> Optional[time]:
-    if isinstance(time_val, float):
-        # Excel хранит долю суток как число; преобразуем в секунды
-        if -1.0 < time_val < 3.0:
-            total_sec = int(round(time_val * 24 * 3600)) % (24*3600)
-            h = total_sec // 3600; m = (total_sec % 3600)//60; s = total_sec % 60
-            return time(h, m, s)
-        return None
-    if isinstance(time_val, str):
-        s = norm(time_val)
-        for fmt in ('%H:%M:%S', '%H:%M'):
-            try:
-                tm = datetime.strptime(s, fmt).time()
-                return tm
-            except Exception:
-                continue
-    return None
+    return strict_time(time_val)
 
 # Парсинг продолжительности в формате ЧЧ:ММ или ММ:СС
 def _parse_duration(duration_str: Union[str, float]) -> Optional[timedelta]:
@@ -52,75 +35,50 @@ def _parse_duration(duration_str: Union[str, float]) -> Optional[timedelta]:
 # Парсинг даты из заголовка отчета
 def _parse_report_date(date_val) -> Optional[date]:
     if isinstance(date_val, str):
-        date_val = norm(date_val)
-        for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-            try:
-                return datetime.strptime(date_val, fmt).date()
-            except Exception:
-                continue
+        return strict_date(date_val)
     return None
 
 # Парсинг даты из заголовка таблицы
 def _parse_header_date(title_cell) -> Optional[date]:
     if isinstance(title_cell, str):
-        title_cell = norm(title_cell)
-        for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-            try:
-                return datetime.strptime(title_cell, fmt).date()
-            except Exception:
-                continue
+        return strict_date(title_cell)
     return None
 
 # Разделение базового названия и множества эпизодов
 def split_base_episodes(title: str) -> Tuple[str, List[Optional[int]]]:
-    title = norm(title)
-    # Поиск всех эпизодов в названии
-    eps = _EP_ANY_RE.findall(title)
-    eps_set = set()
-    for ep in eps:
-        try:
-            eps_set.add(int(ep))
-        except Exception:
-            continue
-    # Удаление эпизодов из названия для получения базового имени
-    base = _EP_ANY_RE.sub('', title).strip()
-    return base, list(eps_set)
+    base, eps = strict_episodes(title)
+    return base, list(eps)
 
 KeyType = Tuple[str, Optional[int], date]
 ValueType = Tuple[datetime, Optional[timedelta]]
 # Теперь индекс будет хранить список показов
 IndexType = Dict[KeyType, List[ValueType]]
+TitleKeyType = Tuple[str, Optional[int]]
+
+
+class StrictIndex(dict):
+    """Индекс {(base, episode, date): [(air_dt, duration), ...]}, показы в корзине – по времени.
+
+    by_title – вторичный индекс {(base, episode): показы всех дат по времени}: строки
+    отчёта без даты (или с датой, которой нет в сетке) ищутся по нему, а не перебором
+    всех ключей.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.by_title: Dict[TitleKeyType, List[ValueType]] = {}
 
-# Разделение названия и эпизода
+# Разделение названия и эпизода (ведущий числовой код/id отбрасывается)
 def split_title_episode(title: str) -> Tuple[str, Optional[int]]:
-    # удаляем ведущий числовой код/id если есть
-    cleaned = _LEADING_CODE_RE.sub('', title)
-    base, eps_set = split_base_episodes(cleaned)
-    # Если ровно один эпизод через стандартный парсер
-    if len(eps_set) == 1:
-        return base, next(iter(eps_set))
-    # Попытка найти одиночный эпизод по явному шаблону число+слово
-    matches = _EP_ANY_RE.findall(norm(cleaned))
-    if len(matches) == 1:
-        try:
-            return base, int(matches[0])
-        except Exception:
-            pass
-    # Попытка fallback: одиночное число в конце
-    m = _EP_SINGLE_RE.search(norm(cleaned))
-    if m and not eps_set:
-        try:
-            return base, int(m.group(1))
-        except Exception:
-            return base, None
-    return base, None
+    return strict_title_episode(title)
 
 # Построение индекса расписания
-def build_schedule_index(xls_bytes: bytes) -> Tuple[IndexType, int]:
+def build_schedule_index(xls_bytes: bytes) -> Tuple[StrictIndex, int]:
     # Возвращает индекс {(base, episode, date): [ (air_dt, duration), ... ]} и число коллизий.
     bio = io.BytesIO(xls_bytes)
     wb = load_workbook(bio, data_only=True)
-    index: IndexType = {}
+    index = StrictIndex()
+    seen: Dict[KeyType, set] = {}  # времена показов корзины – проверка дубликатов за O(1)
     collisions = 0
     try:
         for sheet in wb.sheetnames:
@@ -149,14 +107,21 @@ def build_schedule_index(xls_bytes: bytes) -> Tuple[IndexType, int]:
                 air_dt = datetime.combine(cur_date, air_t)
                 duration = _parse_duration(dur_cell)
                 key = (base, episode, cur_date)
-                bucket = index.setdefault(key, [])
+                times = seen.setdefault(key, set())
                 # проверка дубликатов точного времени
-                if any(existing[0] == air_dt for existing in bucket):
+                if air_dt in times:
                     collisions += 1
                 else:
-                    bucket.append((air_dt, duration))
+                    times.add(air_dt)
+                    show = (air_dt, duration)
+                    index.setdefault(key, []).append(show)
+                    index.by_title.setdefault((base, episode), []).append(show)
     finally:
         wb.close()
+    for shows in index.values():
+        shows.sort(key=lambda x: x[0])
+    for shows in index.by_title.values():
+        shows.sort(key=lambda x: x[0])
     return index, collisions
 
 def fill_report_date_time_strict(schedule_bytes: bytes, report_path: str,
@@ -198,6 +163,7 @@ def fill_report_date_time_strict(schedule_bytes: bytes, report_path: str,
                 break
         if not header_row or not title_col or not date_col or not time_col:
             raise RuntimeError('Не найдены шапка или необходимые колонки (Название/Дата/Время)')
+        writes = CellWriteBuffer()
         for r in range(header_row+1, ws.max_row+1):
             title_val = ws.cell(r, title_col).value
             if not title_val:
@@ -207,19 +173,14 @@ def fill_report_date_time_strict(schedule_bytes: bytes, report_path: str,
             date_candidate = _parse_report_date(date_val)
             candidates: List[ValueType] = []
             if date_candidate:
-                key = (base, episode, date_candidate)
-                if key in index:
-                    candidates = index[key]
+                candidates = index.get((base, episode, date_candidate), [])
             if not candidates:
-                # без даты
-                for (b, ep, d0), times_list in index.items():
-                    if b == base and ep == episode:
-                        candidates.extend(times_list)
+                # без даты – все показы названия из вторичного индекса
+                candidates = index.by_title.get((base, episode), [])
             if not candidates:
                 stats['missed'] += 1
                 continue
-            # сортируем по времени
-            candidates.sort(key=lambda x: x[0])
+            # показы в индексе уже отсортированы по времени
             chosen_times: List[datetime] = []
             if len(candidates) > 1:
                 stats['multi_matches'] += 1
@@ -237,16 +198,15 @@ def fill_report_date_time_strict(schedule_bytes: bytes, report_path: str,
                 chosen_times = [candidates[0][0]]
             # Заполняем. Если несколько и стратегия all -> первая дата в колонку даты, времена объединяем.
             primary_dt = chosen_times[0]
-            ws.cell(r, date_col).value = primary_dt.strftime('%d.%m.%Y')
-            ws.cell(r, date_col).number_format = '@'
+            writes.add(r, date_col, primary_dt.strftime('%d.%m.%Y'), '@')
             if pick_strategy == 'all' and len(chosen_times) > 1:
-                ws.cell(r, time_col).value = '; '.join(dt.strftime('%H:%M:%S') for dt in chosen_times)
+                writes.add(r, time_col, '; '.join(dt.strftime('%H:%M:%S') for dt in chosen_times), '@')
             else:
-                ws.cell(r, time_col).value = primary_dt.strftime('%H:%M:%S')
-            ws.cell(r, time_col).number_format = '@'
+                writes.add(r, time_col, primary_dt.strftime('%H:%M:%S'), '@')
             stats['matched'] += 1
             stats['date_filled'] += 1
             stats['time_filled'] += 1
+        writes.apply(ws)
         wb.save(report_path)
     finally:
         wb.close()
@@ -4,12 +4,13 @@
 """
 from __future__ import annotations
 import re
-from datetime import datetime, time
+from datetime import time
 from typing import Optional, Tuple, Dict
 from openpyxl import load_workbook
-from openpyxl.utils.datetime import from_excel as excel_from_serial
 import os
 
+from .cell_parsers import excel_time
+
 # Паттерны заголовков
 TIME_HDR = r"^время(?:\b|\s*\()"             # Время / Время (часы, мин.)
 DATE_TIME_HDR = r"дата\s*и\s*время"          # Дата и время ...
@@ -32,35 +33,13 @@ def find_col(ws, header_row: int, pattern: str) -> Tuple[Optional[int], Optional
 
 # ------------------- Приведение времени -------------------
 
-_TIME_TOKEN = re.compile(r"^(\d{1,2})[:.](\d{1,2})(?::(\d{1,2}))?$")
-
 def coerce_time(value) -> Optional[time]:
-    """Поддержка: time, datetime, excel serial (float/int), строки HH:MM[:SS]."""
-    if value is None or value == "":
-        return None
-    if isinstance(value, time):
-        return value
-    if isinstance(value, datetime):
-        return time(value.hour, value.minute, value.second)
-    if isinstance(value, (int, float)):
-        try:
-            dt = excel_from_serial(value)  # дата+время
-            return dt.time()
-        except Exception:
-            pass
-    s = str(value).strip()
-    m = _TIME_TOKEN.match(s)
-    if m:
-        h = int(m.group(1)); mi = int(m.group(2)); se = int(m.group(3) or 0)
-        if 0 <= h < 24 and 0 <= mi < 60 and 0 <= se < 60:
-            return time(h, mi, se)
-    # Попытка через strptime (избыточная, но на случай других форм)
-    for fmt in ("%H:%M:%S", "%H:%M"):
-        try:
-            return datetime.strptime(s, fmt).time()
-        except ValueError:
-            continue
-    return None
+    """Поддержка: time, datetime, excel serial (float/int), строки HH:MM[:SS].
+
+    Числа переводятся арифметикой (дробная часть суток), строки разбираются
+    с кэшем – см. cell_parsers.excel_time.
+    """
+    return excel_time(value)
 
 # ------------------- Запись ячейки -------------------
 
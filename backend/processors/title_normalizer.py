@@ -0,0 +1,203 @@
+# title_normalizer.py – нормализация названий передач с кэшем
+"""Нормализация названий передач.
+
+Все регулярки скомпилированы один раз при импорте; строка нормализуется
+один раз за вызов, и из неё сразу получаются база, эпизоды и токены.
+Номера серий разбирает episodes.split_episodes (интервалы, один проход).
+Результаты кэшируются (LRU по исходному названию): одни и те же названия
+повторяются в сетке и в отчётах, и повторный разбор стоит одного обращения
+к словарю. Результаты неизменяемые (frozenset, tuple) – кэш нельзя испортить
+снаружи.
+
+Здесь три вида разбора – для каждого модуля свой:
+  normalize_title  – normalize_titles.norm / split_base_episodes / norm_base_only
+  series_title     – shared.normalize_base / extract_series_set
+  strict_episodes, strict_title_episode – strict_match.split_base_episodes / split_title_episode
+"""
+from __future__ import annotations
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from .episodes import Intervals, split_episodes
+
+CACHE_SIZE = 65536   # сколько названий помнит каждый кэш
+
+# -------- normalize_titles --------
+_EXT_RE = re.compile(r'\.(mp4|mkv|avi|mov)$', re.I)
+_BR_RE = re.compile(r'\s*\([^)]*\)')
+# синонимы «серии» (эпизод/выпуск/часть → серия) одной заменой вместо цикла
+_SYNONYM_RE = re.compile(r'\b(?:эпизод|выпуск|часть)\b')
+_WS_RE = re.compile(r'\s+')
+
+STOP_WORDS = frozenset({"фильм", "кино", "передача", "серия", "выпуск", "эпизод", "часть", "ред", "copy"})
+
+# -------- shared --------
+NOISE_TOKENS = frozenset({
+    "ред", "ред.", "редакция", "final", "master", "v2", "v3", "copy", "копия", "коп", "сору",
+    "hdrip", "webrip", "web", "rip", "bdrip", "1080p", "720p", "uhd", "4k", "fullhd", "hd", "sd",
+    "h264", "x264", "x265", "hevc", "avc",
+})
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_FILE_EXT_RE = re.compile(r"\.(mp4|mov|mxf|avi|mkv)\b.*$", re.I)
+_LEAD_ID_RE = re.compile(r"^\s*\d{3,}[-_ ]+")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_LONG_NUM_RE = re.compile(r"\d{3,}")
+
+# -------- strict_match --------
+_EP_ANY_RE = re.compile(r'(\d{1,3})\s*(?:серия|выпуск|эпизод|часть)\b', re.I)
+_LEADING_CODE_RE = re.compile(r'^\d{4,}[ _-]+')
+_EP_SINGLE_RE = re.compile(r'(?:^|[\s.])(\d{1,3})\s*(?:серия|выпуск|эпизод|часть)?$', re.I)
+
+
+class NormalizedTitle(NamedTuple):
+    """Разбор названия для сопоставления с сеткой."""
+    text: str                   # нормализованная строка (norm)
+    base: str                   # база без номеров серий
+    episodes: Intervals         # номера серий – интервалы ((63, 64),)
+    tokens: Tuple[str, ...]     # слова базы без служебных (norm_base_only)
+
+
+# ------------------- normalize_titles -------------------
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFKC", str(s)).lower()
+    s = _EXT_RE.sub("", s)
+    s = _BR_RE.sub("", s)
+    s = s.replace("ё", "е")
+    s = _SYNONYM_RE.sub("серия", s)
+    return _WS_RE.sub(" ", s).strip().strip(".")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_text(s: str) -> str:
+    return _norm(s)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def base_tokens(s: str) -> Tuple[str, ...]:
+    """Слова нормализованной строки без служебных."""
+    return tuple(t for t in _norm(s).split() if t not in STOP_WORDS)
+
+
+def norm_column(values: pd.Series) -> pd.Series:
+    """_norm для колонки названий строковыми операциями pandas."""
+    s = values.astype(str).str.normalize("NFKC").str.lower()
+    s = s.str.replace(_EXT_RE, "", regex=True).str.replace(_BR_RE, "", regex=True)
+    s = s.str.replace("ё", "е", regex=False).str.replace(_SYNONYM_RE, "серия", regex=True)
+    return s.str.replace(_WS_RE, " ", regex=True).str.strip().str.strip(".")
+
+
+def title_from_text(text: str) -> NormalizedTitle:
+    """Разбор уже нормализованной (_norm / norm_column) строки."""
+    rest, episodes = split_episodes(text)
+    base = rest.strip(' .,-–—')
+    return NormalizedTitle(text, base, episodes, base_tokens(base))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_title(raw: str) -> NormalizedTitle:
+    return title_from_text(_norm(raw))
+
+
+# ------------------- shared -------------------
+
+def _strip_noise(s: str) -> str:
+    """Скобки, расширение файла и ведущий числовой id."""
+    s = _PAREN_RE.sub(" ", s)
+    s = _FILE_EXT_RE.sub(" ", s)
+    return _LEAD_ID_RE.sub(" ", s)
+
+
+def _clean_tokens(s: str) -> str:
+    clean = [t for t in _NON_WORD_RE.split(s)
+             if t and t not in NOISE_TOKENS and not _LONG_NUM_RE.fullmatch(t)]
+    return " ".join(clean).strip(" .-–—")
+
+
+def simple_norm(s: str) -> str:
+    """Нижний регистр, ё→е, схлопнутые пробелы (shared._norm)."""
+    return _WS_RE.sub(" ", str(s).strip().lower().replace("ё", "е"))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def denoise_title(title: str) -> str:
+    return _clean_tokens(_strip_noise(simple_norm(title)))
+
+
+def series_norm_column(values: pd.Series) -> pd.Series:
+    """simple_norm + очистка от скобок, расширений и id для колонки названий."""
+    s = values.astype(str).str.strip().str.lower().str.replace("ё", "е", regex=False)
+    s = s.str.replace(_WS_RE, " ", regex=True)
+    s = s.str.replace(_PAREN_RE, " ", regex=True).str.replace(_FILE_EXT_RE, " ", regex=True)
+    return s.str.replace(_LEAD_ID_RE, " ", regex=True)
+
+
+def series_from_text(text: str) -> Tuple[str, Intervals]:
+    """Разбор строки, уже прошедшей simple_norm и очистку (series_norm_column)."""
+    rest, episodes = split_episodes(text)
+    return _clean_tokens(rest), episodes
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def series_title(title: str) -> Tuple[str, Intervals]:
+    """(normalize_base, номера серий интервалами) за одну нормализацию строки."""
+    return series_from_text(_strip_noise(simple_norm(title)))
+
+
+# ------------------- strict_match -------------------
+
+def strict_norm(s: str) -> str:
+    return ' '.join(s.strip().lower().split())
+
+
+def _strict_episodes(text: str) -> Tuple[str, FrozenSet[int]]:
+    eps = frozenset(int(ep) for ep in _EP_ANY_RE.findall(text))
+    return _EP_ANY_RE.sub('', text).strip(), eps
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def strict_episodes(title: str) -> Tuple[str, FrozenSet[int]]:
+    return _strict_episodes(strict_norm(title))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def strict_title_episode(title: str) -> Tuple[str, Optional[int]]:
+    # удаляем ведущий числовой код/id если есть
+    text = strict_norm(_LEADING_CODE_RE.sub('', title))
+    base, eps = _strict_episodes(text)
+    if len(eps) == 1:
+        return base, next(iter(eps))
+    # одиночный эпизод по явному шаблону число+слово
+    matches = _EP_ANY_RE.findall(text)
+    if len(matches) == 1:
+        return base, int(matches[0])
+    # одиночное число в конце
+    m = _EP_SINGLE_RE.search(text)
+    if m and not eps:
+        return base, int(m.group(1))
+    return base, None
+
+
+# ------------------- Кэш -------------------
+
+_CACHED = (normalize_text, base_tokens, normalize_title, denoise_title, series_title,
+           strict_episodes, strict_title_episode)
+
+
+def cache_info() -> Dict[str, int]:
+    hits = misses = size = 0
+    for fn in _CACHED:
+        info = fn.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    return {"hits": hits, "misses": misses, "size": size}
+
+
+def clear_cache() -> None:
+    for fn in _CACHED:
+        fn.cache_clear()
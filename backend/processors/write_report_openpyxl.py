@@ -8,6 +8,9 @@ from openpyxl import load_workbook
 from .schedule_index import build_index_from_workbook
 from .matcher import pick_showtimes_for_report_title, best_candidates
 from .normalize_titles import split_base_episodes
+from .xlsx_io import save_workbook
+from .cell_writes import CellWriteBuffer
+from .header_locator import locate_header
 
 
 logger = logging.getLogger(__name__)
@@ -41,13 +44,14 @@ def format_dt_list(dts: List[datetime]) -> str:
 
 
 def _find_header_row(ws, target_substr: str) -> int | None:
+    # Ищем только в первых HEADER_SCAN_ROWS строках; результат кэшируется по шаблону
     target_low = target_substr.lower()
-    for r in range(1, ws.max_row+1):
-        for c in range(1, ws.max_column+1):
-            val = ws.cell(r,c).value
-            if val and target_low in str(val).lower():
-                return r
-    return None
+
+    def match_row(values):
+        return True if any(val and target_low in str(val).lower() for val in values) else None
+
+    found = locate_header(ws, ("substr", target_low), match_row)
+    return found[0] if found else None
 
 
 def _find_col_by_substr(ws, header_row: int, substr: str) -> int | None:
@@ -62,7 +66,9 @@ def _find_col_by_substr(ws, header_row: int, substr: str) -> int | None:
 def fill_report_column(schedule_xls_bytes: bytes, report_path: str,
                         sheet_name: str = "росийские произведения",
                         title_substr: str = "Наименование аудиовизуального произведения",
-                        target_substr: str = "Дата и время выхода в эфир (число, часы, мин.)") -> None:
+                        target_substr: str = "Дата и время выхода в эфир (число, часы, мин.)",
+                        compression: str | int | None = None) -> Dict:
+    # compression: уровень сжатия сохраняемой книги (см. xlsx_io); возвращает статистику сохранения
     index = build_index_from_workbook(schedule_xls_bytes)
     wb = load_workbook(report_path)
     try:
@@ -76,6 +82,7 @@ def fill_report_column(schedule_xls_bytes: bytes, report_path: str,
         target_col = _find_col_by_substr(ws, header_row, target_substr)
         if not title_col or not target_col:
             raise ValueError("Не найдены нужные колонки")
+        writes = CellWriteBuffer()
         for r in range(header_row+1, ws.max_row+1):
             cell_title = ws.cell(r, title_col).value
             if not cell_title:
@@ -85,18 +92,20 @@ def fill_report_column(schedule_xls_bytes: bytes, report_path: str,
                 cands, _ = best_candidates(str(cell_title), index.keys())
                 logger.info(f"NO MATCH: '{cell_title}' -> candidates: {cands[:3]}")
                 continue
-            cell = ws.cell(r, target_col)
-            cell.value = format_dt_list(dts)
-            cell.number_format = '@'
-        wb.save(report_path)
+            writes.add(r, target_col, format_dt_list(dts), '@')
+        writes.apply(ws)
+        save_stats = save_workbook(wb, report_path, compression)
     finally:
         wb.close()
+    return save_stats
 
 
 def fill_report_column_and_prune(schedule_xls_bytes: bytes, report_path: str,
                         sheet_name: str = "росийские произведения",
                         title_substr: str = "Наименование аудиовизуального произведения",
-                        target_substr: str = "Дата и время выхода в эфир (число, часы, мин.)") -> None:
+                        target_substr: str = "Дата и время выхода в эфир (число, часы, мин.)",
+                        compression: str | int | None = None) -> Dict:
+    # compression: уровень сжатия сохраняемой книги (см. xlsx_io); возвращает статистику сохранения
     index = build_index_from_workbook(schedule_xls_bytes)
     wb = load_workbook(report_path)
     try:
@@ -116,6 +125,7 @@ def fill_report_column_and_prune(schedule_xls_bytes: bytes, report_path: str,
         if not header_row or not title_col or not target_col:
             raise RuntimeError("Не удалось найти шапку и нужные колонки")
         rows_to_delete = []
+        writes = CellWriteBuffer()
         for r in range(header_row+1, ws.max_row+1):
             title = ws.cell(r, title_col).value
             if not title:
@@ -124,11 +134,11 @@ def fill_report_column_and_prune(schedule_xls_bytes: bytes, report_path: str,
             if not dts:
                 rows_to_delete.append(r)
                 continue
-            cell = ws.cell(r, target_col)
-            cell.value = "; ".join(sorted({dt.strftime("%d.%m.%Y %H:%M") for dt in dts}))
-            cell.number_format = "@"
+            writes.add(r, target_col, "; ".join(sorted({dt.strftime("%d.%m.%Y %H:%M") for dt in dts})), "@")
+        writes.apply(ws)
         for r in sorted(rows_to_delete, reverse=True):
             ws.delete_rows(r, 1)
-        wb.save(report_path)
+        save_stats = save_workbook(wb, report_path, compression)
     finally:
         wb.close()
+    return save_stats
@@ -0,0 +1,105 @@
+# xlsx_io.py – сохранение книг openpyxl с управляемым уровнем сжатия
+"""Сохранение xlsx с выбором уровня zip-сжатия.
+
+wb.save всегда пишет deflate с уровнем по умолчанию; для больших отчётов
+сжатие занимает заметную часть времени. Здесь тот же ExcelWriter openpyxl
+пишет в ZipFile с нужным методом/уровнем:
+  'store'   – без сжатия (промежуточные файлы, которые сразу загружаются обратно)
+  'fast'    – deflate, уровень 1
+  'default' – deflate, уровень 6 (как у zlib по умолчанию)
+  'best'    – deflate, уровень 9
+а также число 0-9 (0 – то же, что 'store').
+"""
+from __future__ import annotations
+import datetime
+import os
+import time
+from io import BytesIO
+from typing import Dict, Tuple, Union
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+from openpyxl.writer.excel import ExcelWriter
+
+COMPRESSION_LEVELS = {
+    "store": 0,
+    "fast": 1,
+    "default": 6,
+    "best": 9,
+}
+DEFAULT_COMPRESSION = "default"
+
+
+# Источник книги: содержимое файла или путь к нему (загрузки API лежат на диске)
+Source = Union[bytes, str, os.PathLike]
+
+
+def open_source(source: Source):
+    """То, что принимают load_workbook и pd.ExcelFile: путь как есть, bytes – через BytesIO."""
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    return BytesIO(source)
+
+
+def read_source(source: Source) -> bytes:
+    """Содержимое источника целиком."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    return source
+
+
+def resolve_compression(value: Union[str, int, None]) -> Tuple[str, int]:
+    """Приводит 'store'/'fast'/'default'/'best' или 0-9 к (имя, уровень). ValueError при ошибке."""
+    if value is None or value == "":
+        value = DEFAULT_COMPRESSION
+    if isinstance(value, str):
+        key = value.strip().lower()
+        if key in COMPRESSION_LEVELS:
+            return key, COMPRESSION_LEVELS[key]
+        if not key.isdigit():
+            raise ValueError(f"compression должен быть одним из: {', '.join(COMPRESSION_LEVELS)} или числом 0-9")
+        value = int(key)
+    level = int(value)
+    if not 0 <= level <= 9:
+        raise ValueError("Уровень сжатия должен быть от 0 до 9")
+    return str(level), level
+
+
+def save_workbook(wb, target, compression: Union[str, int, None] = None) -> Dict:
+    """Сохраняет книгу в путь или файловый объект с выбранным сжатием.
+
+    Возвращает статистику: compression, level, bytes (размер архива),
+    raw_bytes (сумма несжатых частей), saved_bytes и seconds.
+    """
+    if wb.read_only:
+        raise TypeError("Книга открыта только для чтения и не может быть сохранена")
+    name, level = resolve_compression(compression)
+    method = ZIP_STORED if level == 0 else ZIP_DEFLATED
+
+    t0 = time.perf_counter()
+    archive = ZipFile(target, "w", method, allowZip64=True,
+                      compresslevel=None if method == ZIP_STORED else level)
+    wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    ExcelWriter(wb, archive).save()
+    seconds = time.perf_counter() - t0
+
+    infos = archive.infolist()
+    raw_bytes = sum(i.file_size for i in infos)
+    packed_bytes = sum(i.compress_size for i in infos)
+    return {
+        "compression": name,
+        "level": level,
+        "bytes": packed_bytes,
+        "raw_bytes": raw_bytes,
+        "saved_bytes": raw_bytes - packed_bytes,
+        "seconds": seconds,
+    }
+
+
+def workbook_to_bytes(wb, compression: Union[str, int, None] = None) -> Tuple[bytes, Dict]:
+    """Сохраняет книгу в память. Возвращает (xlsx, статистика сохранения)."""
+    out = BytesIO()
+    stats = save_workbook(wb, out, compression)
+    data = out.getvalue()
+    stats["bytes"] = len(data)
+    return data, stats
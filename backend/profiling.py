@@ -0,0 +1,156 @@
+"""
+Профилирование отдельных запросов обработки (только для администратора).
+
+Запрос /api/process/* с profile=1 и заголовком X-Admin-Token выполняется под
+cProfile, а с profile_memory=1 – ещё и под tracemalloc. Воркер пишет в
+каталог профилей два файла:
+  <id>.prof – статистика cProfile (pstats.Stats, snakeviz и т.п.)
+  <id>.txt  – таблица: топ функций по суммарному и собственному времени и,
+              если снималась память, топ строк по выделенной памяти
+Каталог ограничен числом и объёмом профилей, старые удаляются первыми.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Что вернуть на запрос с profile=1
+PROFILE_RETURN_REPORT = "report"  # отчёт как обычно, id профиля – в заголовке X-Profile-Id
+PROFILE_RETURN_TABLE = "table"    # таблица топ-N вместо отчёта
+PROFILE_RETURN_STATS = "stats"    # файл .prof вместо отчёта
+PROFILE_RETURNS = (PROFILE_RETURN_REPORT, PROFILE_RETURN_TABLE, PROFILE_RETURN_STATS)
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def check_admin(token: Optional[str], admin_token: Optional[str]) -> bool:
+    """Токен запроса совпадает с токеном администратора (без токена в настройках – никогда)."""
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), admin_token.encode("utf-8"))
+
+
+def _format_table(profiler: cProfile.Profile, top_n: int, memory: Optional[Dict]) -> str:
+    out = io.StringIO()
+    for sort in ("cumulative", "tottime"):
+        out.write(f"==== Топ-{top_n} функций: {sort} ====\n")
+        pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(top_n)
+    if memory is not None:
+        out.write(f"==== Память: пик {memory['peak_bytes'] / 2 ** 20:.1f} МБ, "
+                  f"в конце {memory['current_bytes'] / 2 ** 20:.1f} МБ ====\n")
+        for stat in memory["top"]:
+            out.write(f"{stat.size / 1024:10.1f} КБ {stat.count:8d} блоков  {stat.traceback}\n")
+    return out.getvalue()
+
+
+def profile_call(profile_dir: str, profile_id: str, fn: Callable, *args, memory: bool = False,
+                 top_n: int = 40):
+    """fn(*args) под cProfile (и tracemalloc при memory); пишет <id>.prof и <id>.txt.
+
+    Возвращает (результат fn, сведения о профиле). Профиль пишется и тогда,
+    когда fn завершилась ошибкой – медленные падения тоже нужно разбирать.
+    """
+    profiler = cProfile.Profile()
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+    mem_info = None
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - started
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:top_n]
+            mem_info = {"current_bytes": current, "peak_bytes": peak, "top": top}
+            if started_tracing:
+                tracemalloc.stop()
+        os.makedirs(profile_dir, exist_ok=True)
+        prof_path, txt_path = profile_paths(profile_dir, profile_id)
+        profiler.dump_stats(prof_path)
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(f"Профиль {profile_id}: {seconds:.3f} с\n")
+            f.write(_format_table(profiler, top_n, mem_info))
+    info = {"id": profile_id, "seconds": round(seconds, 3), "prof_bytes": os.path.getsize(prof_path)}
+    if mem_info is not None:
+        info["peak_bytes"] = mem_info["peak_bytes"]
+    return result, info
+
+
+def profile_paths(profile_dir: str, profile_id: str) -> Tuple[str, str]:
+    """(путь к .prof, путь к .txt)."""
+    base = os.path.join(profile_dir, profile_id)
+    return base + ".prof", base + ".txt"
+
+
+class ProfileStore:
+    """Каталог профилей: не больше max_count профилей и max_total_bytes на диске."""
+
+    def __init__(self, profile_dir: str, max_count: int, max_total_bytes: int):
+        self.profile_dir = profile_dir
+        self.max_count = max_count
+        self.max_total_bytes = max_total_bytes
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def paths(self, profile_id: str) -> Optional[Tuple[str, str]]:
+        """Пути файлов профиля или None, если профиля нет (или id некорректен)."""
+        if not _ID_RE.match(profile_id):
+            return None
+        prof_path, txt_path = profile_paths(self.profile_dir, profile_id)
+        if not os.path.exists(prof_path):
+            return None
+        return prof_path, txt_path
+
+    def list(self) -> List[dict]:
+        """Профили от новых к старым: id, время создания, размер."""
+        items = []
+        for name in os.listdir(self.profile_dir):
+            profile_id, ext = os.path.splitext(name)
+            if ext != ".prof" or not _ID_RE.match(profile_id):
+                continue
+            size = 0
+            created_at = None
+            for path in profile_paths(self.profile_dir, profile_id):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                size += st.st_size
+                created_at = st.st_mtime if created_at is None else min(created_at, st.st_mtime)
+            if created_at is not None:
+                items.append({"profile_id": profile_id, "created_at": created_at, "size": size})
+        items.sort(key=lambda item: item["created_at"], reverse=True)
+        return items
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Удаляет самые старые профили сверх лимитов числа и объёма.
+
+        keep – id только что записанного профиля: он не удаляется, даже если
+        сам не укладывается в лимиты (его ещё отдают в ответе).
+        """
+        items = [item for item in self.list() if item["profile_id"] != keep]
+        total = sum(item["size"] for item in items)
+        removed = 0
+        while items and (len(items) > self.max_count or total > self.max_total_bytes):
+            item = items.pop()
+            total -= item["size"]
+            for path in profile_paths(self.profile_dir, item["profile_id"]):
+                if os.path.exists(path):
+                    os.remove(path)
+            removed += 1
+        return removed
@@ -0,0 +1,159 @@
+"""
+Кэш результатов обработки на локальном диске.
+
+Повторный запрос с теми же файлами и параметрами (двойное нажатие кнопки,
+перезапуск той же пары файлов) отдаёт сохранённый результат без обработки.
+Ключ – sha256 от типа отчёта, хэшей сетки и отчёта, нормализованных
+параметров и версии процессоров. Записи удаляются по истечении TTL и при
+превышении общего объёма (сначала давно не использовавшиеся).
+
+Запись, взятая через get(key, pin=True), закреплена, пока её файл отдаётся
+клиенту или копируется: очистка её пропускает до release(key), иначе put()
+другого результата мог бы удалить файл посреди ответа.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+
+
+def make_key(kind: str, schedule_hash: str, report_hash: str, params: Dict, version: str) -> str:
+    """Ключ кэша; params нормализуются (порядок ключей, None не учитывается)."""
+    payload = {
+        "kind": kind,
+        "schedule": schedule_hash,
+        "report": report_hash,
+        "params": {k: v for k, v in params.items() if v is not None},
+        "version": version,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Результаты в cache_dir: <key> – содержимое, <key>.json – описание."""
+
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_total_bytes: int):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self._entries: Dict[str, dict] = {}
+        self._pins: Dict[str, int] = {}  # ключ -> сколько ответов сейчас читают файл записи
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Подхватывает записи, оставшиеся от прошлого запуска."""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            try:
+                with open(os.path.join(self.cache_dir, name), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.exists(self._path(key)):
+                entry["path"] = self._path(key)
+                self._entries[key] = entry
+        self.evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str, pin: bool = False) -> Optional[dict]:
+        """Запись кэша (path, media_type, filename, headers) или None.
+
+        pin=True закрепляет запись: её файл не удаляется, пока не вызван release(key).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not os.path.exists(entry["path"]):
+                # файл удалили мимо кэша – запись недействительна
+                del self._entries[key]
+                entry = None
+            if entry is None or now - entry["created_at"] > self.ttl_seconds:
+                self._stats["misses"] += 1
+                return None
+            entry["used_at"] = now
+            self._stats["hits"] += 1
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            return dict(entry)
+
+    def release(self, key: str):
+        """Снимает закрепление get(key, pin=True); отложенная очистка выполняется сразу."""
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+        self.evict()
+
+    def put(self, key: str, chunks: Iterable[bytes], media_type: str, filename: str,
+            headers: Optional[Dict[str, str]] = None) -> dict:
+        """Сохраняет результат; запись появляется в кэше только после полной записи файла."""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+        now = time.time()
+        entry = {
+            "media_type": media_type,
+            "filename": filename,
+            "headers": headers or {},
+            "size": size,
+            "created_at": now,
+            "used_at": now,
+        }
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = {**entry, "path": path}
+        self.evict()
+        return dict(self._entries.get(key) or entry)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Удаляет просроченные записи и давно не использовавшиеся сверх лимита объёма.
+
+        Закреплённые записи (см. get) пропускаются до release.
+        """
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if now - entry["created_at"] > self.ttl_seconds and key not in self._pins:
+                    removed.append(key)
+                    del self._entries[key]
+            total = sum(e["size"] for e in self._entries.values())
+            for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["used_at"]):
+                if total <= self.max_total_bytes:
+                    break
+                if key in self._pins:
+                    continue
+                total -= entry["size"]
+                removed.append(key)
+                del self._entries[key]
+        for key in removed:
+            for path in (self._path(key), f"{self._path(key)}.json"):
+                if os.path.exists(path):
+                    os.remove(path)
+        return len(removed)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries),
+                    "bytes": sum(e["size"] for e in self._entries.values())}
@@ -0,0 +1,49 @@
+"""
+Загруженные сетки для повторного использования.
+
+POST /api/schedules разбирает сетку один раз и кладёт индекс сюда; запросы
+обработки передают schedule_id вместо файла сетки. Хранится ограниченное
+число индексов, вытесняется давно не использовавшийся (LRU).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ScheduleStore:
+    """LRU-хранилище индексов сеток в памяти процесса."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, index: Dict, stats: Dict, filename: Optional[str] = None, sha256: Optional[str] = None) -> str:
+        schedule_id = uuid.uuid4().hex
+        with self._lock:
+            self._items[schedule_id] = {
+                "index": index,
+                "stats": stats,
+                "filename": filename,
+                "sha256": sha256,
+                "created_at": time.time(),
+            }
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return schedule_id
+
+    def get(self, schedule_id: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(schedule_id)
+            if item is not None:
+                self._items.move_to_end(schedule_id)
+            return item
+
+    def remove(self, schedule_id: str) -> bool:
+        with self._lock:
+            return self._items.pop(schedule_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,86 @@
+"""
+Приём загруженных файлов.
+
+Загрузка копируется во временный файл кусками по UPLOAD_CHUNK_SIZE, не
+читаясь в память целиком (запись на диск – в потоке, event loop не
+блокируется); по ходу считается sha256 (пригоден как ключ кэша).
+Файл больше max_size отклоняется с 413 сразу, как только лимит превышен;
+расширение не из списка или сигнатура, не совпадающая с расширением, – 415.
+Процессоры получают путь к файлу и открывают его сами.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Сигнатуры форматов: xlsx – zip-архив, xls – составной документ OLE2
+SIGNATURES = {
+    ".xlsx": b"PK\x03\x04",
+    ".xls": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+}
+
+
+@dataclass
+class SpooledUpload:
+    """Загрузка, сохранённая на диск."""
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+    def cleanup(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def check_extension(filename: Optional[str], allowed_extensions: Iterable[str]) -> str:
+    """Расширение файла в нижнем регистре; HTTP 415, если оно не разрешено."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    allowed = [e.lower() for e in allowed_extensions]
+    if ext not in allowed:
+        raise HTTPException(status_code=415,
+                            detail=f"Файл {filename or ''}: допустимы только {', '.join(allowed)}")
+    return ext
+
+
+async def spool_upload(upload: UploadFile, upload_dir: str, max_size: int,
+                       allowed_extensions: Iterable[str]) -> SpooledUpload:
+    """Копирует загрузку в upload_dir с проверкой размера, расширения и сигнатуры."""
+    filename = upload.filename or ""
+    ext = check_extension(filename, allowed_extensions)
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=ext, dir=upload_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and ext in SIGNATURES and not chunk.startswith(SIGNATURES[ext]):
+                    raise HTTPException(status_code=415,
+                                        detail=f"Файл {filename}: содержимое не похоже на {ext}")
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413,
+                                        detail=f"Файл {filename} больше {max_size // (1024 * 1024)} МБ")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, filename, size, digest.hexdigest())
+
+
+def cleanup_uploads(uploads: Iterable[SpooledUpload]):
+    for upload in uploads:
+        upload.cleanup()
@@ -0,0 +1,167 @@
+"""
+Пул процессов для обработки отчётов.
+
+Сопоставление и сохранение книг занимают CPU на секунды и минуты; если вызывать
+процессоры прямо из async-обработчиков, цикл событий uvicorn блокируется
+(/health перестаёт отвечать, остальные загрузки ждут). Обработка выполняется в
+ProcessPoolExecutor, созданном при старте приложения; воркеры заранее
+импортируют процессоры, rapidfuzz и openpyxl.
+
+Ход обработки фоновых заданий воркеры отправляют в общую очередь
+multiprocessing; поток в основном процессе передаёт события в on_progress.
+Для отмены обработки служат токены cancel_token(): Event менеджера
+multiprocessing, который процессор проверяет по ходу сопоставления.
+run_profiled – та же обработка под cProfile/tracemalloc (profile=1 в API).
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+# Очередь событий прогресса (job_id, stage, done, total); задаётся в _warmup / WorkerPool.start
+_progress_queue = None
+
+
+def _warmup(progress_queue=None):
+    """Инициализатор воркера: загружаем тяжёлые модули до первой задачи."""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+    from rapidfuzz import fuzz
+    from processors import processor_rus, processor_foreign, processor_third  # noqa: F401
+
+    fuzz.token_set_ratio("гора самоцветов", "гора самоцветов 63")
+
+
+def _ping() -> int:
+    # Короткая пауза, чтобы задачи прогрева разошлись по разным процессам
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def _file_error(e: SystemExit) -> ValueError:
+    # Процессоры сообщают о неподходящем файле через SystemExit (например, find_headers_any);
+    # из задачи пула он ушёл бы мимо обработчиков ошибок и остановил бы цикл событий
+    return ValueError(str(e))
+
+
+def build_index(schedule_bytes: bytes, params: Optional[dict] = None):
+    """Задача воркера: индекс сетки для повторного использования несколькими отчётами."""
+    from processors import processor_rus
+
+    try:
+        return processor_rus.build_index(schedule_bytes, params)
+    except SystemExit as e:
+        raise _file_error(e) from None
+
+
+def run_processor(kind: str, schedule_bytes: bytes, report_bytes: bytes, params: dict,
+                  job_id: Optional[str] = None, matcher_index: Optional[dict] = None, cancel=None):
+    """Задача воркера: обработка отчёта процессором kind ('rus' | 'foreign' | 'combined' | 'third').
+
+    Если задан job_id, этапы и прогресс отправляются в очередь прогресса.
+    matcher_index – готовый индекс сетки (см. build_index).
+    cancel – токен отмены (см. WorkerPool.cancel_token).
+    """
+    from processors import processor_rus, processor_foreign, processor_third
+
+    processors = {
+        "rus": processor_rus,
+        "foreign": processor_foreign,
+        "combined": processor_rus,  # листы – params['sheet_names']
+        "third": processor_third,
+    }
+    progress = None
+    if job_id is not None and _progress_queue is not None:
+        def progress(stage, done=None, total=None):
+            _progress_queue.put((job_id, stage, done, total))
+    try:
+        return processors[kind].run(schedule_bytes, report_bytes, params, progress, matcher_index, cancel)
+    except SystemExit as e:
+        raise _file_error(e) from None
+
+
+def run_profiled(profile: dict, kind: str, schedule_bytes: bytes, report_bytes: bytes, params: dict,
+                 job_id: Optional[str] = None, matcher_index: Optional[dict] = None, cancel=None):
+    """Задача воркера: run_processor под профилировщиком (см. profiling.profile_call).
+
+    profile – {'dir', 'id', 'memory', 'top_n'}; сведения о профиле – в stats['profile'] результата.
+    """
+    from profiling import profile_call
+
+    result, info = profile_call(profile["dir"], profile["id"], run_processor,
+                                kind, schedule_bytes, report_bytes, params, job_id, matcher_index, cancel,
+                                memory=profile["memory"], top_n=profile["top_n"])
+    result.stats["profile"] = info
+    return result
+
+
+class WorkerPool:
+    """ProcessPoolExecutor с прогревом; workers=0 – выполнение в потоке (для отладки)."""
+
+    def __init__(self, workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[str, str, Optional[int], Optional[int]], None]] = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.on_progress = on_progress
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._progress_thread: Optional[threading.Thread] = None
+        self._manager = None
+
+    def start(self):
+        global _progress_queue
+        if self._progress_queue is None:
+            self._progress_queue = multiprocessing.Queue()
+            self._progress_thread = threading.Thread(target=self._drain_progress, name="progress-drain", daemon=True)
+            self._progress_thread.start()
+        if self.workers <= 0:
+            _progress_queue = self._progress_queue
+            return
+        if self._executor is not None:
+            return
+        self._manager = multiprocessing.Manager()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warmup,
+                                             initargs=(self._progress_queue,))
+        # Процессы создаются лениво – запускаем их все сразу, чтобы первый запрос не ждал прогрева
+        pids = {f.result() for f in [self._executor.submit(_ping) for _ in range(self.workers)]}
+        print(f"Пул обработки запущен: {self.workers} процессов (pid: {sorted(pids)})")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join(timeout=5)
+            self._progress_queue = None
+
+    def _drain_progress(self):
+        queue = self._progress_queue
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            if self.on_progress is not None:
+                try:
+                    self.on_progress(*item)
+                except Exception as e:
+                    print(f"Ошибка обработки события прогресса {item}: {e}")
+
+    def cancel_token(self):
+        """Токен отмены для run_processor: Event, видимый из процессов пула."""
+        if self._manager is None:
+            return threading.Event()
+        return self._manager.Event()
+
+    async def run(self, fn: Callable, *args):
+        """Выполняет fn(*args) в пуле, не блокируя цикл событий."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
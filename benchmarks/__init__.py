@@ -0,0 +1,13 @@
+"""
+Замеры производительности обработки отчётов.
+
+Всё работает офлайн, на синтетических файлах:
+  generator – сетка и отчёт заданного размера (1k … 1M строк) по зерну
+  run       – время и пиковая память этапов ingest / index / match / write,
+              результат каждого прогона – JSON в benchmarks/results
+  compare   – сравнение прогона с сохранённой базой, список регрессий
+
+Запуск из корня репозитория:
+  python -m benchmarks run --rows 1000 100000 --report-rows 1000
+  python -m benchmarks compare benchmarks/baseline.json benchmarks/results/<прогон>.json
+"""
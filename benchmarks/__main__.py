@@ -0,0 +1,178 @@
+"""
+python -m benchmarks generate | run | compare | evaluate
+
+  generate --rows 1000 100000 [--seed 0] [--out DIR]
+  run --rows 1000 100000 [--report-rows 1000] [--repeat 3] [--no-memory] [--label NAME] [--baseline PATH] [--save-baseline]
+  compare BASELINE CURRENT [--threshold 0.2] [--memory-threshold 0.2]
+  evaluate (--schedule PATH --labels PATH | --synthetic ROWS) [--variants default strict ...]
+           [--set NAME:KEY=VALUE,...] [--max-shows N] [--out evaluation.md] [--json PATH]
+
+run и compare завершаются с кодом 1, если найдены регрессии относительно базы.
+evaluate печатает таблицу точности и скорости по вариантам настроек matcher.
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import datetime
+from typing import Dict
+
+from backend.processors.processor_rus import build_index
+
+from .compare import MEMORY_THRESHOLD, THRESHOLD, compare_results, format_changes, load_result
+from .evaluate import VARIANTS, evaluate, format_table, load_labels
+from .generator import write_files
+from .run import BENCH_DIR, DATA_DIR, _git_commit, run_suite, save_result
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def _report(baseline_path: str, current: dict, args) -> int:
+    changes = compare_results(load_result(baseline_path), current, args.threshold, args.memory_threshold)
+    print(format_changes(changes))
+    regressions = [c for c in changes if c.regression]
+    if regressions:
+        print(f"Регрессий: {len(regressions)} (порог времени {args.threshold:.0%}, памяти {args.memory_threshold:.0%})")
+        return 1
+    print("Регрессий нет")
+    return 0
+
+
+def cmd_generate(args) -> int:
+    for rows in args.rows:
+        grid_path, report_path = write_files(args.out, rows, args.seed, args.report_rows)
+        print(f"{rows}: {grid_path}, {report_path}")
+    return 0
+
+
+def cmd_run(args) -> int:
+    result = run_suite(args.rows, args.seed, args.repeat, not args.no_memory, args.report_rows,
+                       label=args.label, data_dir=args.data)
+    path = save_result(result)
+    print(f"Результат: {path}")
+    if args.save_baseline:
+        shutil.copyfile(path, args.baseline)
+        print(f"Сохранён как база: {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        print(f"Сравнение с базой {args.baseline}:")
+        return _report(args.baseline, result, args)
+    return 0
+
+
+def cmd_compare(args) -> int:
+    return _report(args.baseline, load_result(args.current), args)
+
+
+def _parse_variants(names, extra) -> Dict[str, Dict]:
+    """Варианты из VARIANTS по именам плюс свои: "имя:КЛЮЧ=значение,КЛЮЧ=значение"."""
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown:
+        raise SystemExit(f"Неизвестные варианты: {', '.join(unknown)} (есть: {', '.join(VARIANTS)})")
+    variants = {name: VARIANTS[name] for name in names}
+    for spec in extra:
+        name, _, body = spec.partition(":")
+        overrides = {}
+        for item in filter(None, body.split(",")):
+            key, _, value = item.partition("=")
+            try:
+                overrides[key.strip()] = ast.literal_eval(value.strip())
+            except (ValueError, SyntaxError):
+                raise SystemExit(f"Некорректное значение в --set {spec!r}: {item!r}")
+        variants[name] = overrides
+    return variants
+
+
+def cmd_evaluate(args) -> int:
+    variants = _parse_variants(args.variants, args.set)
+    logging.getLogger("backend.processors").setLevel(logging.WARNING)
+    if args.synthetic:
+        schedule, labels_path = write_files(args.data, args.synthetic, args.seed, args.report_rows, labeled=True)
+    elif args.schedule and args.labels:
+        schedule, labels_path = args.schedule, args.labels
+    else:
+        raise SystemExit("Нужны --schedule и --labels или --synthetic ROWS")
+    index = build_index(schedule, {"schedule_sheet": args.schedule_sheet})
+    labels = load_labels(labels_path, args.sheet)
+    print(f"Сетка {schedule}: {len(index)} ключей; разметка {labels_path}: {len(labels)} строк")
+    results = evaluate(index, labels, variants, args.max_shows)
+
+    table = format_table(results)
+    print(table)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(f"# Оценка сопоставления\n\n"
+                    f"- сетка: `{os.path.basename(schedule)}`, разметка: `{os.path.basename(labels_path)}`, "
+                    f"строк: {len(labels)}\n"
+                    f"- коммит: {_git_commit() or '—'}, {datetime.now().isoformat(timespec='seconds')}\n\n"
+                    f"{table}\n")
+        print(f"Таблица: {args.out}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Замеры обработки отчётов")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_thresholds(p):
+        p.add_argument("--threshold", type=float, default=THRESHOLD, help="допустимый рост времени этапа")
+        p.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                       help="допустимый рост пиковой памяти этапа")
+
+    gen = sub.add_parser("generate", help="создать синтетические сетку и отчёт")
+    gen.add_argument("--rows", type=int, nargs="+", default=[1000])
+    gen.add_argument("--report-rows", type=int, default=0, help="строк отчёта (по умолчанию как в сетке)")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--out", default=DATA_DIR)
+    gen.set_defaults(func=cmd_generate)
+
+    run = sub.add_parser("run", help="замерить этапы обработки")
+    run.add_argument("--rows", type=int, nargs="+", default=[1000])
+    run.add_argument("--report-rows", type=int, default=0)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--no-memory", action="store_true", help="без прохода с замером памяти")
+    run.add_argument("--label", default="")
+    run.add_argument("--data", default=DATA_DIR, help="каталог сгенерированных файлов")
+    run.add_argument("--baseline", default=BASELINE_PATH)
+    run.add_argument("--save-baseline", action="store_true", help="сохранить прогон как новую базу")
+    add_thresholds(run)
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="сравнить прогон с базой")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    add_thresholds(cmp_)
+    cmp_.set_defaults(func=cmd_compare)
+
+    ev = sub.add_parser("evaluate", help="точность и скорость вариантов настроек matcher на разметке")
+    ev.add_argument("--schedule", help="сетка (xlsx)")
+    ev.add_argument("--schedule-sheet", default=None)
+    ev.add_argument("--labels", help="размеченный отчёт (xlsx)")
+    ev.add_argument("--sheet", default=None, help="лист разметки (по умолчанию все)")
+    ev.add_argument("--synthetic", type=int, default=0, metavar="ROWS",
+                    help="сгенерировать сетку из ROWS строк и разметку к ней")
+    ev.add_argument("--report-rows", type=int, default=0)
+    ev.add_argument("--seed", type=int, default=0)
+    ev.add_argument("--data", default=DATA_DIR, help="каталог сгенерированных файлов")
+    ev.add_argument("--variants", nargs="+", default=list(VARIANTS))
+    ev.add_argument("--set", action="append", default=[], metavar="NAME:KEY=VALUE,...",
+                    help="свой вариант, например loose:BASE_RATIO=50,JACCARD_MIN=0.2")
+    ev.add_argument("--max-shows", type=int, default=None,
+                    help="сравнивать только первые N показов (разметка по отчёту с ограничением)")
+    ev.add_argument("--out", default=None, help="записать таблицу в Markdown-файл")
+    ev.add_argument("--json", default=None, help="записать метрики в JSON")
+    ev.set_defaults(func=cmd_evaluate)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Сравнение прогона замеров с базой.
+
+Регрессия – этап, который на том же размере стал медленнее базы больше чем
+на threshold (по умолчанию 20%) или потребовал больше памяти больше чем на
+memory_threshold. Мелкие абсолютные изменения (меньше min_seconds и
+min_bytes) не считаются: на маленьких файлах это шум.
+"""
+import json
+from typing import Dict, List, NamedTuple, Optional
+
+THRESHOLD = 0.2
+MEMORY_THRESHOLD = 0.2
+MIN_SECONDS = 0.05
+MIN_BYTES = 1024 * 1024
+
+
+class Change(NamedTuple):
+    rows: int
+    stage: str
+    metric: str               # 'seconds' | 'peak_bytes'
+    baseline: float
+    current: float
+    regression: bool
+
+    @property
+    def ratio(self) -> Optional[float]:
+        return self.current / self.baseline if self.baseline else None
+
+
+def load_result(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _by_rows(result: Dict) -> Dict[int, Dict]:
+    return {run["rows"]: run for run in result["runs"]}
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = THRESHOLD,
+                    memory_threshold: float = MEMORY_THRESHOLD, min_seconds: float = MIN_SECONDS,
+                    min_bytes: int = MIN_BYTES) -> List[Change]:
+    """Изменения по всем этапам размеров, которые есть в обоих прогонах."""
+    base_runs = _by_rows(baseline)
+    changes = []
+    for rows, run in sorted(_by_rows(current).items()):
+        base = base_runs.get(rows)
+        if base is None:
+            continue
+        for stage, values in run["stages"].items():
+            base_values = base["stages"].get(stage)
+            if base_values is None:
+                continue
+            for metric, limit, floor in (("seconds", threshold, min_seconds),
+                                         ("peak_bytes", memory_threshold, min_bytes)):
+                old, new = base_values.get(metric), values.get(metric)
+                if old is None or new is None:
+                    continue
+                regression = new > old * (1 + limit) and new - old > floor
+                changes.append(Change(rows, stage, metric, old, new, regression))
+    return changes
+
+
+def _fmt(metric: str, value: float) -> str:
+    if metric == "seconds":
+        return f"{value:.3f} с"
+    return f"{value / 2 ** 20:.1f} МБ"
+
+
+def format_changes(changes: List[Change]) -> str:
+    """Таблица изменений; регрессии помечены '!!'."""
+    lines = [f"{'строк':>8}  {'этап':<7} {'метрика':<10} {'база':>12} {'сейчас':>12} {'изм.':>8}"]
+    for c in changes:
+        ratio = c.ratio
+        delta = f"{(ratio - 1) * 100:+.0f}%" if ratio is not None else "—"
+        mark = "  !!" if c.regression else ""
+        lines.append(f"{c.rows:>8}  {c.stage:<7} {c.metric:<10} {_fmt(c.metric, c.baseline):>12} "
+                     f"{_fmt(c.metric, c.current):>12} {delta:>8}{mark}")
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""
+Точность и скорость сопоставления на размеченном отчёте при разных настройках matcher.
+
+Разметка – отчёт, в котором колонка дат проверена вручную: в ней перечислены
+все правильные показы строки в формате обработки ("01.09.2025 в 8:00 и ...",
+также принимаются "01.09.2025 08:00" и "2025-09-01T08:00" через ";" или
+перенос строки); пустая ячейка – у строки не должно быть совпадений.
+Колонки находятся так же, как при обработке (find_headers_any). Сетка –
+любая, например tests/Копия Сентябрь в работе.xlsx; без своих файлов пару
+сетка + разметка даёт генератор (generate_report(..., labeled=True)).
+
+Каждый вариант настроек (VARIANTS – значения settings_match) прогоняется по
+всем строкам разметки: match_report_title на каждую строку, без повторного
+использования результатов для одинаковых названий, кэши нормализации
+сброшены. Метрики считаются по показам:
+  precision – доля найденных показов, которые есть в разметке
+  recall    – доля показов разметки, которые найдены
+  exact     – доля строк, где найдено ровно то, что в разметке
+  ложные    – строк без показов в разметке, для которых что-то найдено
+  пропуски  – строк с показами в разметке, для которых не найдено ничего
+"""
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from openpyxl import load_workbook
+
+from backend.processors import cell_parsers, matcher, settings_match, title_normalizer
+from backend.processors.matcher import MatchCounters, match_report_title
+from backend.processors.shared import find_headers_any
+
+# Варианты по умолчанию; strict – пороги до смягчения (см. комментарии в settings_match)
+VARIANTS: Dict[str, Dict] = {
+    "default": {},
+    "strict": {"BASE_RATIO": 70, "PARTIAL_RATIO": 80, "TOKEN_SET": 80, "JACCARD_MIN": 0.35,
+               "MAX_CANDIDATES": 8},
+    "no_partial_words": {"ALLOW_PARTIAL_WORDS": False},
+    "no_contains": {"ALLOW_CONTAINS": False},
+    "no_episode_partial": {"ALLOW_EPISODE_PARTIAL": False},
+}
+
+_LABEL_RES = [
+    re.compile(r"(?P<d>\d{1,2})\.(?P<m>\d{1,2})\.(?P<y>\d{4})\s*(?:в\s*)?(?P<H>\d{1,2}):(?P<M>\d{2})"),
+    re.compile(r"(?P<y>\d{4})-(?P<m>\d{2})-(?P<d>\d{2})[T ](?P<H>\d{1,2}):(?P<M>\d{2})"),
+]
+
+
+class Label(NamedTuple):
+    sheet: str
+    row: int
+    title: str
+    expected: frozenset          # правильные показы (datetime)
+
+
+def parse_airtimes(value) -> frozenset:
+    """Показы из ячейки разметки; пустая ячейка – пустое множество."""
+    if isinstance(value, datetime):
+        return frozenset([value.replace(second=0, microsecond=0)])
+    if not value:
+        return frozenset()
+    text = str(value)
+    found = set()
+    for regex in _LABEL_RES:
+        for m in regex.finditer(text):
+            found.add(datetime(int(m["y"]), int(m["m"]), int(m["d"]), int(m["H"]), int(m["M"])))
+    return frozenset(found)
+
+
+def load_labels(path: str, sheet: Optional[str] = None, mapping: Optional[Dict] = None) -> List[Label]:
+    """Строки разметки со всех листов книги (или с листа sheet)."""
+    wb = load_workbook(path, data_only=True)
+    sheets = [wb[sheet]] if sheet else wb.worksheets
+    labels = []
+    for ws in sheets:
+        hr, tc, dc = find_headers_any(ws, mapping)
+        rows = ws.iter_rows(min_row=hr + 1, max_col=max(tc, dc), values_only=True)
+        for r, values in enumerate(rows, start=hr + 1):
+            title = values[tc - 1] if len(values) >= tc else None
+            if title is None or not str(title).strip():
+                continue
+            value = values[dc - 1] if len(values) >= dc else None
+            labels.append(Label(ws.title, r, str(title), parse_airtimes(value)))
+    return labels
+
+
+@contextmanager
+def match_settings(overrides: Dict) -> Iterator[None]:
+    """Временно подменяет настройки settings_match в matcher."""
+    unknown = [name for name in overrides if not hasattr(settings_match, name)]
+    if unknown:
+        raise ValueError(f"Неизвестные настройки matcher: {', '.join(unknown)}")
+    saved = {name: getattr(matcher, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(matcher, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(matcher, name, value)
+
+
+def _first(times, max_shows: Optional[int]) -> set:
+    times = sorted(times)
+    return set(times[:max_shows] if max_shows else times)
+
+
+def evaluate_variant(index: Dict, labels: List[Label], overrides: Optional[Dict] = None,
+                     max_shows: Optional[int] = None) -> Dict:
+    """Метрики одного варианта настроек.
+
+    max_shows – сравнивать только первые max_shows показов (если разметка
+    сделана по отчёту, заполненному с таким ограничением).
+    """
+    title_normalizer.clear_cache()
+    cell_parsers.clear_cache()
+    counters = MatchCounters()
+    with match_settings(overrides or {}):
+        started = time.perf_counter()
+        predicted = [match_report_title(label.title, index, counters=counters).times for label in labels]
+        seconds = time.perf_counter() - started
+
+    tp = fp = fn = exact = false_matches = misses = 0
+    for label, times in zip(labels, predicted):
+        got, want = _first(times, max_shows), _first(label.expected, max_shows)
+        hit = len(got & want)
+        tp += hit
+        fp += len(got) - hit
+        fn += len(want) - hit
+        exact += got == want
+        false_matches += bool(got) and not want
+        misses += bool(want) and not got
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "rows": len(labels),
+        "tp": tp, "fp": fp, "fn": fn,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "exact": round(exact / len(labels), 4) if labels else 1.0,
+        "false_matches": false_matches,
+        "misses": misses,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(len(labels) / seconds, 1) if seconds else None,
+        "keys_scored": counters.keys_scored,
+        "overrides": dict(overrides or {}),
+    }
+
+
+def evaluate(index: Dict, labels: List[Label], variants: Optional[Dict[str, Dict]] = None,
+             max_shows: Optional[int] = None) -> Dict[str, Dict]:
+    """{вариант: метрики} по всем вариантам (по умолчанию VARIANTS)."""
+    return {name: evaluate_variant(index, labels, overrides, max_shows)
+            for name, overrides in (variants or VARIANTS).items()}
+
+
+def format_table(results: Dict[str, Dict]) -> str:
+    """Таблица Markdown: строка на вариант."""
+    lines = ["| вариант | precision | recall | F1 | exact | ложные | пропуски | строк/с | настройки |",
+             "|---|---:|---:|---:|---:|---:|---:|---:|---|"]
+    for name, r in results.items():
+        overrides = ", ".join(f"{k}={v}" for k, v in r["overrides"].items()) or "—"
+        speed = f"{r['rows_per_sec']:.0f}" if r["rows_per_sec"] is not None else "—"
+        lines.append(f"| {name} | {r['precision']:.3f} | {r['recall']:.3f} | {r['f1']:.3f} | {r['exact']:.1%} "
+                     f"| {r['false_matches']} | {r['misses']} | {speed} | {overrides} |")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Генератор синтетических сеток и отчётов для замеров.
+
+Сетка – как у канала: строка-заголовок дня ("Понедельник, 1 сентября 2025"),
+затем строки "время | название"; время строкой "06:00" или значением времени
+Excel. Среди программ – многосерийные ("Северный берег. 12 серия"), между
+ними служебные строки (реклама, анонсы, пустые строки).
+
+Отчёт – лист 'росийские произведения' с колонками названия и дат показа.
+Названия берутся из сетки в других написаниях (регистр, пробелы, другой вид
+номера серии), часть – с опечатками; есть строки без пары в сетке и
+служебные строки ("Итого", пустые).
+
+Размеченный отчёт (labeled=True) – тот же отчёт, но в колонке дат уже
+перечислены все правильные показы строки ("01.09.2025 в 8:00 и ..."), у
+строк без пары в сетке ячейка пустая; его читает benchmarks.evaluate.
+
+Одно и то же зерно даёт одни и те же файлы.
+"""
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+from openpyxl import Workbook
+
+WEEKDAYS_RU = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+MONTHS_RU = ["января", "февраля", "марта", "апреля", "мая", "июня",
+             "июля", "августа", "сентября", "октября", "ноября", "декабря"]
+
+ADJECTIVES = ["Большой", "Тайный", "Старый", "Новый", "Последний", "Золотой", "Северный", "Дикий",
+              "Московский", "Вечерний", "Быстрый", "Тихий", "Далёкий", "Красный", "Зелёный", "Ночной",
+              "Летний", "Морской", "Горный", "Белый", "Чёрный", "Весёлый", "Секретный", "Южный"]
+NOUNS = ["город", "путь", "дом", "сад", "остров", "берег", "поезд", "мост", "лес", "рынок", "маршрут",
+         "квартал", "двор", "вокзал", "порт", "экипаж", "отдел", "патруль", "участок", "госпиталь"]
+SUFFIXES = ["", "", "", "и море", "на закате", "в огне", "зимой", "навсегда", "с нами"]
+SERVICE_TITLES = ["Реклама", "Анонс", "Погода", "Профилактика", "Перерыв в вещании"]
+REPORT_SERVICE = ["Итого", "ИТОГО по разделу", "Всего произведений"]
+
+REPORT_SHEET = "росийские произведения"
+REPORT_HEADERS = ["Наименование аудиовизуального произведения (номер и название серии)",
+                  "Дата и время выхода в эфир (число, часы, мин.)"]
+
+MAX_PROGRAMS = 400      # программ в сетке канала (с ростом сетки растёт число дней, а не программ)
+SERIES_SHARE = 0.4      # доля многосерийных программ
+SLOTS_PER_DAY = 40      # строк программ в дне сетки
+SERVICE_SHARE = 0.08    # доля служебных строк
+TYPO_SHARE = 0.1        # доля названий отчёта с опечаткой
+MISSING_SHARE = 0.1     # доля названий отчёта, которых нет в сетке
+START_DATE = date(2025, 9, 1)
+
+
+def _programs(rng: random.Random, count: int) -> List[Tuple[str, int]]:
+    """[(название, число серий)]; 0 серий – программа без серий."""
+    names = [f"{a} {n} {s}".strip() for a in ADJECTIVES for n in NOUNS for s in SUFFIXES]
+    rng.shuffle(names)
+    names = names[:count]
+    return [(name, rng.randint(4, 120) if rng.random() < SERIES_SHARE else 0) for name in names]
+
+
+def _grid_title(rng: random.Random, name: str, episode: int) -> str:
+    if not episode:
+        return name
+    return rng.choice([f"{name}. {episode} серия", f"{name} {episode} серия", f"{name}. Серия {episode}"])
+
+
+def _report_title(rng: random.Random, name: str, episode: int) -> str:
+    if episode:
+        title = rng.choice([f"{name}. {episode} серия", f"{name} {episode} серия", f"{name} ({episode} серия)",
+                            f"{name}. Серия {episode}", f"{name}, выпуск {episode}"])
+    else:
+        title = name
+    title = rng.choice([title, title, title.upper(), title.lower(), f"  {title} ", title.replace("ё", "е")])
+    if rng.random() < TYPO_SHARE:
+        title = typo(rng, title)
+    return title
+
+
+def typo(rng: random.Random, text: str) -> str:
+    """Одна опечатка в слове длиннее трёх букв: перестановка, пропуск или замена буквы."""
+    words = text.split(" ")
+    long_words = [i for i, w in enumerate(words) if len(w) > 3 and w.isalpha()]
+    if not long_words:
+        return text
+    i = rng.choice(long_words)
+    w = words[i]
+    pos = rng.randrange(1, len(w) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        w = w[:pos] + w[pos + 1] + w[pos] + w[pos + 2:]
+    elif kind == 1:
+        w = w[:pos] + w[pos + 1:]
+    else:
+        w = w[:pos] + rng.choice("аеиоуыя") + w[pos + 1:]
+    words[i] = w
+    return " ".join(words)
+
+
+def _day_label(d: date) -> str:
+    return f"{WEEKDAYS_RU[d.weekday()]}, {d.day} {MONTHS_RU[d.month - 1]} {d.year}"
+
+
+def generate_grid(rows: int, seed: int = 0) -> Tuple[Workbook, List[Tuple[str, int, datetime]]]:
+    """Сетка примерно из rows строк. Возвращает (книга, [(название, серия, время показа)])."""
+    rng = random.Random(seed)
+    programs = _programs(rng, max(50, min(rows // 20, MAX_PROGRAMS)))
+    next_episode = {name: 1 for name, _ in programs}
+    aired: List[Tuple[str, int, datetime]] = []
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Сетка")
+    written = 0
+    day = START_DATE
+    while written < rows:
+        ws.append([None, _day_label(day)])
+        written += 1
+        minutes = 6 * 60
+        for _ in range(SLOTS_PER_DAY):
+            if written >= rows:
+                break
+            minutes += rng.choice((15, 30, 30, 45, 60, 90))
+            if minutes >= 24 * 60:
+                break
+            t = time(minutes // 60, minutes % 60)
+            value = t if rng.random() < 0.5 else f"{t.hour:02d}:{t.minute:02d}"
+            if rng.random() < SERVICE_SHARE:
+                ws.append([value, rng.choice(SERVICE_TITLES)] if rng.random() < 0.7 else [])
+            else:
+                name, episodes = rng.choice(programs)
+                episode = 0
+                if episodes:
+                    episode = next_episode[name]
+                    next_episode[name] = episode % episodes + 1
+                ws.append([value, _grid_title(rng, name, episode)])
+                aired.append((name, episode, datetime.combine(day, t)))
+            written += 1
+        day += timedelta(days=1)
+    return wb, aired
+
+
+def _label(times: List[datetime]) -> str:
+    return " и ".join(f"{d.day:02d}.{d.month:02d}.{d.year} в {d.hour}:{d.minute:02d}" for d in times)
+
+
+def generate_report(rows: int, aired: List[Tuple[str, int, datetime]], seed: int = 0,
+                    labeled: bool = False) -> Workbook:
+    """Отчёт из rows строк по программам сетки (aired – из generate_grid).
+
+    labeled – заполнить колонку дат правильными показами (разметка для evaluate).
+    """
+    rng = random.Random(seed + 1)
+    airtimes: Dict[Tuple[str, int], List[datetime]] = {}
+    for name, episode, when in aired:
+        airtimes.setdefault((name, episode), []).append(when)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(REPORT_SHEET)
+    ws.append(REPORT_HEADERS)
+    for _ in range(1, rows):
+        roll = rng.random()
+        if roll < SERVICE_SHARE / 2:
+            ws.append([rng.choice(REPORT_SERVICE) if rng.random() < 0.5 else None])
+        elif roll < SERVICE_SHARE / 2 + MISSING_SHARE or not aired:
+            ws.append([f"{rng.choice(ADJECTIVES)} проект {rng.randint(1, 5000)}"])
+        else:
+            name, episode, _ = rng.choice(aired)
+            title = _report_title(rng, name, episode)
+            ws.append([title, _label(sorted(airtimes[(name, episode)]))] if labeled else [title])
+    return wb
+
+
+def write_files(out_dir: str, rows: int, seed: int = 0, report_rows: int = 0,
+                labeled: bool = False) -> Tuple[str, str]:
+    """Пишет сетку и отчёт в out_dir (готовые файлы с теми же параметрами не пересоздаются).
+
+    Возвращает (путь к сетке, путь к отчёту). report_rows=0 – столько же строк, сколько в сетке.
+    """
+    report_rows = report_rows or rows
+    os.makedirs(out_dir, exist_ok=True)
+    grid_path = os.path.join(out_dir, f"grid-{rows}-s{seed}.xlsx")
+    kind = "labeled" if labeled else "report"
+    report_path = os.path.join(out_dir, f"{kind}-{rows}-{report_rows}-s{seed}.xlsx")
+    if os.path.exists(grid_path) and os.path.exists(report_path):
+        return grid_path, report_path
+    grid, aired = generate_grid(rows, seed)
+    report = generate_report(report_rows, aired, seed, labeled)
+    # пишем во временный файл и переименовываем – прерванная генерация не оставит битый файл
+    for wb, path in ((grid, grid_path), (report, report_path)):
+        wb.save(path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return grid_path, report_path
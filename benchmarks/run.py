@@ -0,0 +1,182 @@
+"""
+Прогон замеров: время и пиковая память по этапам обработки российского отчёта.
+
+Этапы:
+  ingest – чтение сетки (build_schedule_index) и загрузка книги отчёта
+  index  – индекс сетки для matcher
+  match  – поиск заголовков, нормализация названий, сопоставление, запись в лист
+  write  – сохранение книги в xlsx
+
+Время – медиана по повторам; кэши нормализации перед каждым повтором
+сбрасываются. Пиковая память (tracemalloc, прирост над началом этапа)
+снимается отдельным проходом: под tracemalloc обработка заметно медленнее,
+и время этого прохода не учитывается.
+"""
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from backend.processors import PROCESSOR_VERSION, cell_parsers, title_normalizer
+from backend.processors.matcher import MatchCounters
+from backend.processors.processor_rus import _process_sheet, build_matcher_index
+from backend.processors.shared import DEFAULTS, build_schedule_index
+from backend.processors.stage_timer import StageTimer
+from backend.processors.xlsx_io import workbook_to_bytes
+
+from .generator import write_files
+
+STAGES = ["ingest", "index", "match", "write"]
+RESULT_FORMAT = 1
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def _stages(grid_path: str, report_path: str, params: Dict) -> Tuple[List[Tuple[str, Callable]], Dict]:
+    """([(этап, функция)], состояние): функции передают друг другу данные через общий словарь."""
+    p = {**DEFAULTS, **params}
+    state: Dict = {"timer": StageTimer()}
+
+    def ingest():
+        state["schedule"] = build_schedule_index(grid_path, p.get("schedule_sheet"))
+        state["wb"] = load_workbook(report_path)
+
+    def index():
+        state["index"] = build_matcher_index(state["schedule"])
+
+    def match():
+        matched = total = 0
+        counters = MatchCounters()
+        for ws in state["wb"].worksheets:
+            _, sheet_stats = _process_sheet(ws, state["index"], p, True, timer=state["timer"], counters=counters)
+            matched += sheet_stats["matched"]
+            total += sheet_stats["total_rows"]
+        state["matched"], state["total_rows"] = matched, total
+        state["matcher"] = counters.as_dict()
+
+    def write():
+        state["xlsx_bytes"] = len(workbook_to_bytes(state["wb"], p.get("compression"))[0])
+
+    return [("ingest", ingest), ("index", index), ("match", match), ("write", write)], state
+
+
+def _run_once(grid_path: str, report_path: str, params: Dict, memory: bool) -> Dict:
+    title_normalizer.clear_cache()
+    cell_parsers.clear_cache()
+    stages, state = _stages(grid_path, report_path, params)
+    seconds: Dict[str, float] = {}
+    peaks: Dict[str, int] = {}
+    if memory:
+        tracemalloc.start()
+    try:
+        for name, fn in stages:
+            if memory:
+                tracemalloc.reset_peak()
+                start_bytes = tracemalloc.get_traced_memory()[0]
+            t0 = time.perf_counter()
+            fn()
+            seconds[name] = time.perf_counter() - t0
+            if memory:
+                peaks[name] = tracemalloc.get_traced_memory()[1] - start_bytes
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return {
+        "seconds": seconds,
+        "peak_bytes": peaks,
+        "matched": state.get("matched"),
+        "total_rows": state.get("total_rows"),
+        "index_keys": len(state.get("index") or ()),
+        "xlsx_bytes": state.get("xlsx_bytes"),
+        "timings": state["timer"].as_dict(),
+        "matcher": state.get("matcher"),
+    }
+
+
+def bench_size(rows: int, seed: int = 0, repeat: int = 3, memory: bool = True, report_rows: int = 0,
+               params: Optional[Dict] = None, data_dir: str = DATA_DIR,
+               log: Callable[[str], None] = print) -> Dict:
+    """Замер одного размера: rows строк сетки, report_rows (по умолчанию rows) строк отчёта."""
+    report_rows = report_rows or rows
+    t0 = time.perf_counter()
+    grid_path, report_path = write_files(data_dir, rows, seed, report_rows)
+    log(f"[{rows}] файлы готовы за {time.perf_counter() - t0:.1f} с: {grid_path}, {report_path}")
+
+    runs = []
+    for i in range(repeat):
+        runs.append(_run_once(grid_path, report_path, params or {}, memory=False))
+        log(f"[{rows}] повтор {i + 1}/{repeat}: "
+            + ", ".join(f"{name} {runs[-1]['seconds'][name]:.3f} с" for name in STAGES))
+    last = runs[-1]
+    stages = {name: {"seconds": round(statistics.median(r["seconds"][name] for r in runs), 4),
+                     "peak_bytes": None} for name in STAGES}
+    if memory:
+        traced = _run_once(grid_path, report_path, params or {}, memory=True)
+        for name in STAGES:
+            stages[name]["peak_bytes"] = traced["peak_bytes"][name]
+        log(f"[{rows}] пиковая память: "
+            + ", ".join(f"{name} {traced['peak_bytes'][name] / 2 ** 20:.1f} МБ" for name in STAGES))
+    return {
+        "rows": rows,
+        "report_rows": report_rows,
+        "seed": seed,
+        "repeat": repeat,
+        "stages": stages,
+        "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+        "matched": last["matched"],
+        "total_rows": last["total_rows"],
+        "index_keys": last["index_keys"],
+        "xlsx_bytes": last["xlsx_bytes"],
+        "timings": {name: round(sec, 4) for name, sec in last["timings"].items()},
+        "matcher": last["matcher"],
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(sizes: List[int], seed: int = 0, repeat: int = 3, memory: bool = True, report_rows: int = 0,
+              params: Optional[Dict] = None, label: str = "", data_dir: str = DATA_DIR,
+              log: Callable[[str], None] = print) -> Dict:
+    """Замер всех размеров; результат – словарь для сохранения в JSON (см. save_result)."""
+    # построчные сообщения процессоров искажают время – оставляем только предупреждения
+    logging.getLogger("backend.processors").setLevel(logging.WARNING)
+    return {
+        "format": RESULT_FORMAT,
+        "label": label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "processor_version": PROCESSOR_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params or {},
+        "runs": [bench_size(rows, seed, repeat, memory, report_rows, params, data_dir, log) for rows in sizes],
+    }
+
+
+def save_result(result: Dict, path: Optional[str] = None) -> str:
+    """Пишет результат прогона в JSON (по умолчанию benchmarks/results/<время>[-метка].json)."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = result["created_at"].replace(":", "").replace("-", "")
+        name = f"{stamp}-{result['label']}" if result["label"] else stamp
+        path = os.path.join(RESULTS_DIR, name + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
@@ -1,14 +1,20 @@
 """
 Конфигурация системы обработки отчётов
 """
+import os
+import tempfile
 
 # Настройки сервера
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = 8000
 DEBUG = True
 
+# Пул процессов обработки (None – по числу ядер, 0 – обработка в потоке без пула)
+PROCESS_WORKERS = None
+
 # Ограничения файлов
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+MAX_REQUEST_SIZE = 512 * 1024 * 1024  # весь запрос (пакет из нескольких отчётов)
 ALLOWED_EXTENSIONS = ['.xls', '.xlsx']
 
 # Настройки обработки по умолчанию
@@ -20,6 +26,44 @@ DEFAULT_DELETE_UNMATCHED = True
 # Временные файлы
 TEMP_DIR_PREFIX = "report_processor_"
 
+# Загрузки пишутся сюда кусками и удаляются после обработки
+UPLOADS_DIR = os.path.join(tempfile.gettempdir(), TEMP_DIR_PREFIX + "uploads")
+
+# Фоновые задания (/api/jobs): каталог результатов, срок хранения, лимиты
+JOBS_DIR = os.path.join(tempfile.gettempdir(), TEMP_DIR_PREFIX + "jobs")
+JOB_RESULT_TTL = 60 * 60  # 1 час
+JOB_RESULTS_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2GB на все результаты
+JOB_QUEUE_LIMIT = 32  # одновременно поставленных в очередь/выполняемых заданий
+JOB_EVICT_INTERVAL = 60  # секунд между очистками
+JOB_EVENTS_INTERVAL = 0.25  # секунд между проверками состояния в потоке событий (SSE)
+JOB_EVENTS_KEEPALIVE = 15  # секунд между комментариями-пингами, чтобы прокси не закрывал поток
+
+# Как часто синхронные запросы обработки проверяют, не отключился ли клиент (секунд)
+DISCONNECT_CHECK_INTERVAL = 1.0
+
+# Допуск к обработке: одновременные обработки, очередь ожидания, бюджет памяти
+ADMISSION_MAX_ACTIVE = None  # None – по числу процессов пула
+ADMISSION_MAX_WAITING = 16  # запросов, ожидающих свободного слота
+ADMISSION_WAIT_TIMEOUT = 60  # секунд ожидания до ответа 429
+ADMISSION_MEMORY_BUDGET = None  # байт; None – 60% физической памяти
+ADMISSION_RETRY_AFTER = 15  # значение заголовка Retry-After, секунд
+
+# Кэш результатов для повторных запросов с теми же файлами и параметрами
+RESULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), TEMP_DIR_PREFIX + "result_cache")
+RESULT_CACHE_TTL = 24 * 60 * 60  # 1 сутки
+RESULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+
+# Загруженные сетки (/api/schedules): сколько индексов держать в памяти (LRU)
+SCHEDULE_CACHE_SIZE = 16
+
+# Профилирование запросов (profile=1 в /api/process/*) – только с заголовком X-Admin-Token.
+# Токен задаётся переменной окружения VYBORG_ADMIN_TOKEN; без неё профилирование выключено.
+ADMIN_TOKEN = os.environ.get("VYBORG_ADMIN_TOKEN") or None
+PROFILES_DIR = os.path.join(tempfile.gettempdir(), TEMP_DIR_PREFIX + "profiles")
+PROFILES_MAX_COUNT = 50  # профилей на диске (сначала удаляются старые)
+PROFILES_MAX_BYTES = 256 * 1024 * 1024
+PROFILE_TOP_N = 40  # строк в таблицах топ-N
+
 # Настройки логирования
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
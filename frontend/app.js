@@ -4,6 +4,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const descriptions = {
         rus: 'Обработка отчёта с колонкой "Наименование аудиовизуального произведения"',
         foreign: 'Обработка отчёта с колонкой "Название передачи"',
+        combined: 'Листы "росийские произведения" и "иностранные произведения" за один проход',
         third: 'Пока заглушка – файл возвращается без изменений'
     };
 
@@ -29,34 +30,45 @@ document.addEventListener('DOMContentLoaded', function() {
     updateSliderValue('fuzzy_cutoff', 'fuzzy_value');
     updateSliderValue('token_overlap', 'token_value');
 
+    // Этапы обработки: подпись и доля общей полосы прогресса [начало, конец] в процентах
+    const stages = {
+        queued: { label: 'В очереди...', range: [0, 2] },
+        started: { label: 'Запуск обработки...', range: [2, 5] },
+        index: { label: 'Разбор сетки...', range: [5, 20] },
+        load: { label: 'Загрузка отчёта...', range: [20, 30] },
+        match: { label: 'Сопоставление', range: [30, 90] },
+        save: { label: 'Сохранение файла...', range: [90, 99] },
+        done: { label: 'Готово', range: [100, 100] }
+    };
+
     // Функция для показа прогресса
     function showProgress() {
         const progressEl = document.getElementById('progress');
         progressEl.style.display = 'block';
+        updateProgress({ stage: 'queued', progress: {} });
+    }
 
+    // Обновление прогресса по событию задания (ответ /api/jobs/{id} или событие SSE)
+    function updateProgress(job) {
+        const progressEl = document.getElementById('progress');
         const progressBar = progressEl.querySelector('.progress-bar');
-        progressBar.style.width = '0%';
-
-        // Анимация прогресс-бара
-        let width = 0;
-        const interval = setInterval(() => {
-            width += 1;
-            progressBar.style.width = width + '%';
+        const progressText = document.getElementById('progress_text');
 
-            if (width >= 90) {
-                clearInterval(interval);
-            }
-        }, 50);
+        const stage = stages[job.stage] || stages.started;
+        const [from, to] = stage.range;
+        const progress = job.progress || {};
+        const fraction = progress.total ? progress.done / progress.total : 0;
+        progressBar.style.width = Math.round(from + (to - from) * fraction) + '%';
 
-        return interval;
+        let label = stage.label;
+        if (job.stage === 'match' && progress.total) {
+            label = `${stage.label}: ${progress.done} из ${progress.total} строк`;
+        }
+        progressText.textContent = label;
     }
 
     // Функция для скрытия прогресса
-    function hideProgress(interval) {
-        if (interval) {
-            clearInterval(interval);
-        }
-
+    function hideProgress() {
         const progressEl = document.getElementById('progress');
         const progressBar = progressEl.querySelector('.progress-bar');
         progressBar.style.width = '100%';
@@ -64,9 +76,78 @@ document.addEventListener('DOMContentLoaded', function() {
         setTimeout(() => {
             progressEl.style.display = 'none';
             progressBar.style.width = '0%';
+            document.getElementById('progress_text').textContent = 'Обработка...';
         }, 500);
     }
 
+    const FINAL_STATES = ['done', 'failed', 'cancelled'];
+
+    // Задание, которое сейчас обрабатывается: при закрытии страницы его отменяем
+    let activeJob = null;
+    window.addEventListener('pagehide', function() {
+        if (activeJob) {
+            fetch(activeJob.status_url, { method: 'DELETE', keepalive: true });
+        }
+    });
+
+    // Ожидание завершения задания: события SSE, а без EventSource – опрос статуса
+    function waitForJob(job) {
+        return new Promise((resolve, reject) => {
+            const finish = (data) => {
+                if (data.state === 'done') {
+                    resolve(data);
+                } else if (data.state === 'cancelled') {
+                    reject(new Error('Задание отменено'));
+                } else {
+                    reject(new Error(data.error || 'Обработка завершилась с ошибкой'));
+                }
+            };
+
+            if (!window.EventSource) {
+                const poll = async () => {
+                    try {
+                        const response = await fetch(job.status_url);
+                        const data = await response.json();
+                        if (!response.ok) {
+                            throw new Error(data.detail || `HTTP error! status: ${response.status}`);
+                        }
+                        updateProgress(data);
+                        if (FINAL_STATES.includes(data.state)) {
+                            finish(data);
+                        } else {
+                            setTimeout(poll, 1000);
+                        }
+                    } catch (error) {
+                        reject(error);
+                    }
+                };
+                poll();
+                return;
+            }
+
+            const events = new EventSource(job.events_url);
+            events.addEventListener('progress', (e) => updateProgress(JSON.parse(e.data)));
+            FINAL_STATES.forEach(name => {
+                events.addEventListener(name, (e) => {
+                    events.close();
+                    const data = JSON.parse(e.data);
+                    updateProgress(data);
+                    finish(data);
+                });
+            });
+            events.onerror = () => {
+                // Соединение оборвалось до итогового события – узнаём состояние запросом
+                events.close();
+                fetch(job.status_url)
+                    .then(response => response.json())
+                    .then(data => FINAL_STATES.includes(data.state)
+                        ? finish(data)
+                        : reject(new Error('Потеряно соединение с сервером. Обновите страницу и проверьте результат позже.')))
+                    .catch(reject);
+            };
+        });
+    }
+
     // Функция для скачивания файла
     function downloadBlob(blob, filename) {
         const url = window.URL.createObjectURL(blob);
@@ -101,11 +182,11 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
-        // Определяем endpoint на основе типа отчёта
-        const endpoint = `/api/process/${reportType}`;
+        // Обработка идёт фоновым заданием: ставим в очередь и следим за прогрессом
+        const endpoint = `/api/jobs/${reportType}`;
 
         const formData = new FormData(this);
-        const progressInterval = showProgress();
+        showProgress();
 
         try {
             const response = await fetch(endpoint, {
@@ -115,13 +196,27 @@ document.addEventListener('DOMContentLoaded', function() {
 
             if (!response.ok) {
                 const errorData = await response.json();
+                if (response.status === 429) {
+                    const retryAfter = response.headers.get('Retry-After');
+                    throw new Error(`${errorData.detail}${retryAfter ? ` (через ${retryAfter} с)` : ''}`);
+                }
                 throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
             }
 
-            const blob = await response.blob();
+            const job = await response.json();
+            activeJob = job;
+            await waitForJob(job);
+            activeJob = null;
+
+            const result = await fetch(job.result_url);
+            if (!result.ok) {
+                const errorData = await result.json();
+                throw new Error(errorData.detail || `HTTP error! status: ${result.status}`);
+            }
+            const blob = await result.blob();
 
             // Определяем имя файла из заголовка или используем дефолтное
-            const contentDisposition = response.headers.get('Content-Disposition');
+            const contentDisposition = result.headers.get('Content-Disposition');
             let filename = `report_${reportType}_ready.xlsx`;
 
             if (contentDisposition) {
@@ -140,7 +235,8 @@ document.addEventListener('DOMContentLoaded', function() {
             console.error('Ошибка:', error);
             alert(`Ошибка обработки: ${error.message}`);
         } finally {
-            hideProgress(progressInterval);
+            activeJob = null;
+            hideProgress();
         }
     });
 
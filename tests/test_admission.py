@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.admission import Admission
+
+MB = 1024 * 1024
+
+
+def make_admission(**kw):
+    opts = dict(max_active=1, max_waiting=1, memory_budget=100 * MB, wait_timeout=0.2, retry_after=7)
+    opts.update(kw)
+    return Admission(**opts)
+
+
+def test_slots_limit_concurrency():
+    async def scenario():
+        adm = make_admission(max_active=2, max_waiting=10)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with adm.slot(MB):
+                peak = max(peak, adm.snapshot()['active'])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[work() for _ in range(6)])
+        return peak, adm.snapshot()
+
+    peak, snap = asyncio.run(scenario())
+    assert peak == 2
+    assert snap['active'] == 0 and snap['reserved_bytes'] == 0
+
+
+def test_rejects_too_large_job():
+    adm = make_admission()
+    with pytest.raises(HTTPException) as exc:
+        adm.check(200 * MB)
+    assert exc.value.status_code == 413
+
+
+def test_queue_full_and_timeout_return_429():
+    async def scenario():
+        adm = make_admission()
+        statuses = []
+
+        async def hold():
+            async with adm.slot(MB):
+                await asyncio.sleep(0.5)
+
+        async def attempt():
+            try:
+                async with adm.slot(MB):
+                    statuses.append(200)
+            except HTTPException as e:
+                statuses.append((e.status_code, e.headers['Retry-After']))
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        await asyncio.gather(attempt(), attempt())
+        await holder
+        return statuses
+
+    # первый ждёт и получает 429 по таймауту, второму места в очереди нет
+    assert sorted(asyncio.run(scenario())) == [(429, '7'), (429, '7')]
+
+
+def test_memory_budget_serializes_heavy_jobs():
+    async def scenario():
+        adm = make_admission(max_active=4, max_waiting=4, wait_timeout=5)
+        order = []
+
+        async def work(name):
+            async with adm.slot(60 * MB):
+                order.append((name, adm.snapshot()['active']))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(work('a'), work('b'))
+        return order
+
+    assert [active for _, active in asyncio.run(scenario())] == [1, 1]
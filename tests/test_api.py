@@ -0,0 +1,241 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def main(tmp_path_factory):
+    """Приложение целиком: каталоги во временной папке, обработка в потоке (workers=0)."""
+    tmp = tmp_path_factory.mktemp('app')
+    for name in ('UPLOADS_DIR', 'JOBS_DIR', 'RESULT_CACHE_DIR', 'PROFILES_DIR'):
+        setattr(config, name, str(tmp / name.lower()))
+    config.PROCESS_WORKERS = 0
+    from backend import main
+    return main
+
+
+@pytest.fixture
+def client(main):
+    with TestClient(main.app) as c:
+        yield c
+
+
+def _bytes(wb):
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+
+def _schedule():
+    wb = Workbook()
+    ws = wb.active
+    ws.append([None, 'Понедельник, 1 сентября 2025'])
+    ws.append(['06:00', 'Новости'])
+    ws.append(['07:00', 'Северный берег. 3 серия'])
+    return _bytes(wb)
+
+
+def _report(*titles):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'росийские произведения'
+    ws.append(['Наименование аудиовизуального произведения', 'Дата и время выхода в эфир'])
+    for title in titles:
+        ws.append([title])
+    return _bytes(wb)
+
+
+def _broken_report():
+    wb = Workbook()
+    wb.active.append(['Без заголовков', 'отчёта'])
+    return _bytes(wb)
+
+
+def test_batch_shares_index_and_reports_errors(main, client, monkeypatch):
+    builds, indexes = [], []
+    build_index, run_processor = main.build_index, main.run_processor
+
+    def counting_build(*args):
+        builds.append(args)
+        return build_index(*args)
+
+    def recording_run(kind, schedule, report, params, job_id, matcher_index, *rest):
+        indexes.append((schedule, id(matcher_index)))
+        return run_processor(kind, schedule, report, params, job_id, matcher_index, *rest)
+
+    monkeypatch.setattr(main, 'build_index', counting_build)
+    monkeypatch.setattr(main, 'run_processor', recording_run)
+    requests_before = main.metrics.REQUESTS.value(endpoint='batch', status=200)
+    resp = client.post('/api/process/batch', data={'output': 'json'}, files=[
+        ('schedule_file', ('grid.xlsx', _schedule())),
+        ('report_files', ('good.xlsx', _report('Новости', 'Северный берег 3 серия', 'Чужая программа'))),
+        ('report_files', ('broken.xlsx', _broken_report())),
+    ])
+    assert resp.status_code == 200
+    assert resp.headers['x-batch-files'] == '2' and resp.headers['x-batch-failed'] == '1'
+
+    zf = zipfile.ZipFile(io.BytesIO(resp.content))
+    summary = json.loads(zf.read('summary.json'))
+    good, broken = summary['files']
+    assert good['status'] == 'ok' and good['output'] == 'good_ready.jsonl'
+    assert (good['matched'], good['unmatched'], good['total_rows']) == (2, 1, 3)
+    records = [json.loads(line) for line in zf.read('good_ready.jsonl').splitlines()]
+    assert [r['airtimes'] for r in records] == [['2025-09-01T06:00'], ['2025-09-01T07:00'], []]
+    assert broken['status'] == 'error' and 'столбец' in broken['error'] and 'output' not in broken
+    assert sorted(zf.namelist()) == ['good_ready.jsonl', 'summary.json']
+
+    # индекс сетки строится один раз и передаётся всем отчётам пакета
+    assert len(builds) == 1 and summary['index_keys'] == 2
+    assert len(indexes) == 2 and len(set(indexes)) == 1 and indexes[0][0] is None
+
+    # запрос пакета учтён в /metrics, как и запросы одного отчёта
+    assert main.metrics.REQUESTS.value(endpoint='batch', status=200) == requests_before + 1
+    assert 'index;dur=' in resp.headers['server-timing']
+    text = client.get('/metrics').text
+    assert 'vyborg_matcher_calls_total{endpoint="batch"} 3' in text
+
+
+def _process_files(report, schedule=_schedule()):
+    # одна и та же сетка: xlsx хранит время создания, и новая книга дала бы другой ключ кэша
+    return {'schedule_file': ('grid.xlsx', schedule), 'report_file': ('report.xlsx', report)}
+
+
+def test_cached_file_survives_eviction_while_served(main, client, monkeypatch):
+    report = _report('Новости', 'Cached')
+    first = client.post('/api/process/rus', files=_process_files(report))
+    assert first.status_code == 200 and first.headers['x-cache'] == 'MISS'
+
+    cache = main.result_cache
+    get = cache.get
+
+    def get_then_store_other(key, pin=False):
+        # пока отдаётся найденная запись, другой запрос кладёт в кэш результат сверх лимита объёма
+        entry = get(key, pin)
+        if entry is not None:
+            monkeypatch.setattr(cache, 'max_total_bytes', entry['size'])
+            cache.put('other', [b'x' * entry['size']], 'text/plain', 'other.txt')
+        return entry
+
+    monkeypatch.setattr(cache, 'get', get_then_store_other)
+    second = client.post('/api/process/rus', files=_process_files(report))
+    assert second.status_code == 200 and second.headers['x-cache'] == 'HIT'
+    assert second.content == first.content
+    assert cache._pins == {}
+
+
+def _wait_job(client, job_id):
+    for _ in range(200):
+        job = client.get(f'/api/jobs/{job_id}').json()
+        if job['state'] in ('done', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'задание {job_id} не завершилось')
+
+
+def test_job_reprocesses_when_cached_file_is_gone(main, client):
+    report = _report('Новости', 'Job cache')
+    created = client.post('/api/jobs/rus', files=_process_files(report)).json()
+    assert _wait_job(client, created['job_id'])['state'] == 'done'
+    first = client.get(created['result_url'])
+
+    again = client.post('/api/jobs/rus', files=_process_files(report)).json()
+    assert _wait_job(client, again['job_id'])['state'] == 'done'
+    assert client.get(again['result_url']).headers['x-cache'] == 'HIT'
+
+    # файл записи кэша пропал (вытеснен или удалён) – задание обрабатывает отчёт заново
+    for name in os.listdir(main.result_cache.cache_dir):
+        if not name.endswith('.json'):
+            os.remove(os.path.join(main.result_cache.cache_dir, name))
+    third = client.post('/api/jobs/rus', files=_process_files(report)).json()
+    assert _wait_job(client, third['job_id'])['state'] == 'done'
+    result = client.get(third['result_url'])
+    assert result.headers['x-cache'] == 'MISS' and result.content == first.content
+
+
+def test_client_disconnect_cancels_processing(main, client, monkeypatch):
+    """Отключение клиента доходит до обработчика через все слои приложения и отменяет обработку."""
+    started, stopped = threading.Event(), threading.Event()
+
+    def slow_run(*args):
+        cancel = args[-1]
+        started.set()
+        for _ in range(500):  # до 10 с, если отмена не дойдёт
+            if cancel.is_set():
+                stopped.set()
+                raise main.ProcessingCancelled("Обработка отменена")
+            time.sleep(0.02)
+        return main.run_processor(*args)
+
+    monkeypatch.setattr(main, 'run_processor', slow_run)
+    monkeypatch.setattr(config, 'DISCONNECT_CHECK_INTERVAL', 0.05)
+    request = httpx.Request('POST', 'http://test/api/process/rus',
+                            files=_process_files(_report('Новости', 'Disconnect')))
+    body = request.read()
+
+    async def call_app():
+        sent = []
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # клиент «уходит», как только обработка началась
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+                 'scheme': 'http', 'path': '/api/process/rus', 'raw_path': b'/api/process/rus',
+                 'query_string': b'', 'root_path': '', 'client': ('test', 1), 'server': ('test', 80),
+                 'headers': [(k.lower().encode(), v.encode()) for k, v in request.headers.items()]}
+        await main.app(scope, receive, send)
+        return sent
+
+    async def bounded():
+        # без доставки отключения обработка шла бы до конца (или ждала клиента бесконечно)
+        return await asyncio.wait_for(call_app(), 15)
+
+    started_at = time.perf_counter()
+    sent = client.portal.call(bounded)
+    assert sent[0]['type'] == 'http.response.start' and sent[0]['status'] == 499
+    assert stopped.wait(1) and time.perf_counter() - started_at < 5
+
+
+@pytest.mark.parametrize('profile_return, media_type', [('table', 'text/plain'), ('stats', 'application/octet-stream')])
+def test_profile_served_when_store_limit_is_zero(main, client, monkeypatch, profile_return, media_type):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(main.profile_store, 'max_count', 0)
+    resp = client.post('/api/process/rus', headers={'X-Admin-Token': 'secret'},
+                       data={'profile': 'true', 'profile_return': profile_return},
+                       files=_process_files(_report('Новости', 'Profiled')))
+    assert resp.status_code == 200 and resp.headers['content-type'].startswith(media_type)
+    assert resp.content
+    # старые профили вытеснены, только что записанный оставлен до следующей вытесняющей записи
+    assert [p['profile_id'] for p in main.profile_store.list()] == [resp.headers['x-profile-id']]
+
+
+def test_profile_gone_before_response(main, client, monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(main.profile_store, 'paths', lambda profile_id: None)
+    resp = client.post('/api/process/rus', headers={'X-Admin-Token': 'secret'},
+                       data={'profile': 'true', 'profile_return': 'table'},
+                       files=_process_files(_report('Новости', 'Profile gone')))
+    assert resp.status_code == 410
@@ -0,0 +1,82 @@
+import io
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from backend.processors import processor_rus
+from benchmarks import evaluate
+from benchmarks.compare import compare_results
+from benchmarks.generator import generate_grid, generate_report
+
+
+def _bytes(wb):
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+
+def _cells(data):
+    return [row for row in load_workbook(io.BytesIO(data)).active.iter_rows(values_only=True)]
+
+
+def test_generator_is_seeded():
+    grid_a, aired_a = generate_grid(300, seed=7)
+    grid_b, aired_b = generate_grid(300, seed=7)
+    assert aired_a == aired_b
+    assert _cells(_bytes(grid_a)) == _cells(_bytes(grid_b))
+    grid_c, aired_c = generate_grid(300, seed=8)
+    _bytes(grid_c)  # write-only книгу нужно сохранить, иначе её открытый поток строк ругается при сборке мусора
+    assert aired_c != aired_a
+
+
+def test_generated_files_are_processed():
+    grid, aired = generate_grid(300, seed=1)
+    report = generate_report(200, aired, seed=1)
+    result = processor_rus.run(_bytes(grid), _bytes(report), {'output': 'json'})
+    assert result.stats['total_rows'] == 199
+    # большая часть названий есть в сетке; опечатки, служебные строки и чужие названия – нет
+    assert 0.5 < result.stats['matched'] / result.stats['total_rows'] < 1.0
+
+
+def _result(match_seconds, match_peak):
+    return {'runs': [{'rows': 1000, 'stages': {
+        'ingest': {'seconds': 1.0, 'peak_bytes': 10 * 2 ** 20},
+        'match': {'seconds': match_seconds, 'peak_bytes': match_peak},
+    }}]}
+
+
+def test_compare_flags_regressions():
+    baseline = _result(2.0, 50 * 2 ** 20)
+    changes = compare_results(baseline, _result(2.2, 80 * 2 ** 20))
+    flagged = {(c.stage, c.metric) for c in changes if c.regression}
+    assert flagged == {('match', 'peak_bytes')}
+    changes = compare_results(baseline, _result(3.0, None))
+    assert {(c.stage, c.metric) for c in changes if c.regression} == {('match', 'seconds')}
+    # мелкие абсолютные изменения – шум
+    assert not any(c.regression for c in compare_results(_result(0.01, 0), _result(0.03, 0)))
+
+
+def test_parse_airtimes():
+    assert evaluate.parse_airtimes("01.09.2025 в 8:05 и 02.09.2025 в 21:30") == {
+        datetime(2025, 9, 1, 8, 5), datetime(2025, 9, 2, 21, 30)}
+    assert evaluate.parse_airtimes("2025-09-01T08:05; 01.09.2025 08:05") == {datetime(2025, 9, 1, 8, 5)}
+    assert evaluate.parse_airtimes(None) == frozenset()
+
+
+def test_evaluate_labeled_report(tmp_path):
+    grid, aired = generate_grid(300, seed=2)
+    report = generate_report(80, aired, seed=2, labeled=True)
+    path = tmp_path / 'labeled.xlsx'
+    report.save(path)
+    labels = evaluate.load_labels(str(path))
+    assert len(labels) >= 70 and any(label.expected for label in labels)
+    index = processor_rus.build_index(_bytes(grid))
+
+    results = evaluate.evaluate(index, labels, {'default': {}, 'strict': evaluate.VARIANTS['strict']})
+    default = results['default']
+    assert default['rows'] == len(labels)
+    assert default['precision'] > 0.5 and default['recall'] > 0.5
+    assert default['tp'] + default['fn'] == sum(len(label.expected) for label in labels)
+    # вариант с более строгими порогами находит не больше
+    assert results['strict']['tp'] + results['strict']['fp'] <= default['tp'] + default['fp']
+    # настройки matcher после прогона восстановлены
+    assert evaluate.matcher.BASE_RATIO == evaluate.settings_match.BASE_RATIO
+    assert '| strict |' in evaluate.format_table(results)
@@ -0,0 +1,43 @@
+from datetime import date, datetime, time
+
+from backend.processors import cell_parsers as cp
+from backend.processors.shared import parse_date_label_ru, parse_time_from_str
+
+
+def test_time_label():
+    assert parse_time_from_str('06:05') == '6:05'
+    assert parse_time_from_str(0.25) == '6:00'
+    assert parse_time_from_str(7) == '7:00'
+    assert parse_time_from_str(datetime(2025, 9, 1, 8, 30)) == '8:30'
+    assert parse_time_from_str(float('nan')) is None
+    assert parse_time_from_str('Новости') is None
+
+
+def test_date_label():
+    assert parse_date_label_ru('Понедельник, 1 сентября 2025') == '01.09.2025'
+    assert parse_date_label_ru('01.09.2025') == '01.09.2025'
+    assert parse_date_label_ru('01.09.05') == '01.09.2005'
+    assert parse_date_label_ru(45000) is None
+
+
+def test_grid_and_strict_parsers():
+    assert cp.grid_time(0.25) == time(6, 0)
+    assert cp.grid_time('6.30') == time(6, 30)
+    assert cp.grid_date('Понедельник, 1 сентября 2025') == date(2025, 9, 1)
+    assert cp.strict_time(0.75) == time(18, 0)
+    assert cp.strict_time('06:00:15') == time(6, 0, 15)
+    assert cp.strict_date('2025-09-01') == date(2025, 9, 1)
+
+
+def test_excel_time_fractions_and_serials():
+    assert cp.excel_time(0.5) == time(12, 0)
+    assert cp.excel_time(45000.25) == time(6, 0)
+    assert cp.excel_time(0) == time(0, 0)
+
+
+def test_string_results_are_cached():
+    cp.clear_cache()
+    for _ in range(100):
+        parse_time_from_str('6:00')
+    info = cp.cache_info()
+    assert info['misses'] == 1 and info['hits'] == 99
@@ -0,0 +1,32 @@
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from backend.processors.cell_writes import CellWriteBuffer
+
+
+def test_sorted_column_major():
+    buf = CellWriteBuffer()
+    buf.add(3, 2, 'c')
+    buf.add(1, 2, 'b')
+    buf.add(5, 1, 'a')
+    assert [(r, c) for r, c, _, _ in buf.sorted_writes()] == [(5, 1), (1, 2), (3, 2)]
+
+
+def test_apply_values_and_formats():
+    wb = Workbook(); ws = wb.active
+    ws.cell(2, 2).font = Font(bold=True)
+    buf = CellWriteBuffer()
+    buf.add(2, 2, '01.09.2025', '@')
+    buf.add(3, 2, '02.09.2025', '@')
+    buf.add(4, 3, 'без формата')
+    buf.add(3, 2, '03.09.2025', '@')  # повторная запись побеждает
+    assert buf.apply(ws) == 4
+    assert len(buf) == 0
+    assert ws.cell(2, 2).value == '01.09.2025' and ws.cell(2, 2).number_format == '@'
+    assert ws.cell(2, 2).font.bold  # остальной стиль сохранён
+    assert ws.cell(3, 2).value == '03.09.2025' and ws.cell(3, 2).number_format == '@'
+    assert not ws.cell(3, 2).font.bold
+    assert ws.cell(4, 3).number_format == 'General'
+    # стили ячеек не разделяются между собой
+    ws.cell(3, 2).number_format = 'hh:mm:ss'
+    assert ws.cell(2, 2).number_format == '@'
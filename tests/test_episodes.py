@@ -0,0 +1,39 @@
+import pytest
+
+from backend.processors.episodes import contains, count, from_numbers, iter_episodes, merge, split_episodes
+from backend.processors.shared import extract_series_set, normalize_base
+
+
+@pytest.mark.parametrize('text, rest, intervals', [
+    ('гора самоцветов. 63 серия', 'гора самоцветов.', ((63, 63),)),
+    ('гора самоцветов 63,64', 'гора самоцветов', ((63, 64),)),
+    ('гора 63, 64 серии', 'гора', ((63, 64),)),
+    ('гора 1-120', 'гора', ((1, 120),)),
+    ('гора 1 – 3 и 7 вып.', 'гора.', ((1, 3), (7, 7))),
+    ('гора 5-я серия', 'гора', ((5, 5),)),
+    ('гора, серия 2. сказка', 'гора. сказка', ((2, 2),)),
+    ('топ 10 фильмов', 'топ 10 фильмов', ()),
+    ('новости 2025', 'новости 2025', ()),
+    ('старый проект 2090', 'старый проект 2090', ()),
+    ('а-4 выпуск 10', 'а-4', ((10, 10),)),
+    ('т-34', 'т-34', ()),
+    ('часть 2. возвращение', '2. возвращение', ()),
+])
+def test_split_episodes(text, rest, intervals):
+    assert split_episodes(text) == (rest, intervals)
+
+
+def test_interval_helpers():
+    intervals = merge([(5, 7), (1, 3), (4, 4), (10, 12)])
+    assert intervals == ((1, 7), (10, 12))
+    assert from_numbers([3, 1, 2, 9]) == ((1, 3), (9, 9))
+    assert contains(intervals, 7) and contains(intervals, 10)
+    assert not contains(intervals, 8) and not contains(intervals, 0)
+    assert count(intervals) == 10
+    assert list(iter_episodes(((1, 2), (5, 5)))) == [1, 2, 5]
+
+
+def test_schedule_list_of_episodes():
+    # раньше сетка видела здесь базу 'гора самоцветов 63 64' и только серию 64
+    assert normalize_base('Гора самоцветов 63,64') == 'гора самоцветов'
+    assert extract_series_set('Гора самоцветов 63,64') == {63, 64}
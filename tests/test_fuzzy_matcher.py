@@ -1,5 +1,6 @@
-from backend.processors.matcher import best_candidates, pick_showtimes_for_report_title
-from backend.processors.normalize_titles import split_base_episodes
+import pytest
+
+from backend.processors.matcher import MatchCounters, best_candidates, match_report_title, pick_showtimes_for_report_title
 from datetime import datetime
 
 index = {
@@ -28,3 +29,38 @@ def test_no_match():
     dts = pick_showtimes_for_report_title("Несуществующая", index)
     assert dts == []
 
+
+numbered = {
+    ("старый город", frozenset({-1})): [datetime(2025,9,1,10,0)],
+    ("шоу", frozenset({-1})): [datetime(2025,9,1,11,0)],
+    ("а 4", frozenset({10})): [datetime(2025,9,1,12,0)],
+    ("а 5", frozenset({10})): [datetime(2025,9,1,13,0)],
+}
+
+
+@pytest.mark.parametrize('title', ["Старый проект 2090", "Шоу 2025"])
+def test_number_in_base_blocks_base_only_match(title):
+    # число в названии – другая программа, а не «ближайшая» по базе
+    result = match_report_title(title, numbered)
+    assert result.times == [] and result.strategy is None
+
+
+def test_code_with_number_matches_its_episode():
+    result = match_report_title("А-4 выпуск 10", numbered)
+    assert result.times == [datetime(2025,9,1,12,0)] and result.base == "а 4"
+
+
+def test_match_counters():
+    counters = MatchCounters()
+    for title in ("Гора самоцветов. 63 серия", "Новости", "Несуществующая"):
+        match_report_title(title, index, counters=counters)
+    c = counters.as_dict()
+    assert c['calls'] == 3 and c['keys_scored'] == 6 and c['keys_pruned'] == 0
+    assert c['strategies'] == {'episode_overlap': 1, 'fallback': 1}
+    assert c['empty'] == 1 and c['no_candidates'] == 1
+
+
+def test_keys_pruned_counts_empty_bases():
+    counters = MatchCounters()
+    match_report_title("Новости", {**index, ("...", frozenset()): [datetime(2025,9,1,7,0)]}, counters=counters)
+    assert counters.keys_scored == 2 and counters.keys_pruned == 1
@@ -0,0 +1,63 @@
+from openpyxl import Workbook
+
+from backend.processors import header_locator
+from backend.processors.shared import find_headers_any
+
+
+def make_sheet(with_date_col=True, header_row=5):
+    wb = Workbook(); ws = wb.active
+    ws.title = 'росийские произведения'
+    ws.cell(1,1).value = 'Отчёт за сентябрь'
+    ws.cell(header_row,1).value = '№'
+    ws.cell(header_row,2).value = 'Наименование аудиовизуального произведения (номер и название серии)'
+    if with_date_col:
+        ws.cell(header_row,3).value = 'Дата и время выхода в эфир (число, часы, мин.)'
+    ws.cell(header_row+1,2).value = 'Новости'
+    return ws
+
+
+def test_find_headers_and_cache_hit():
+    header_locator.clear_cache()
+    assert find_headers_any(make_sheet()) == (5, 2, 3)
+    assert header_locator.cache_info()['misses'] == 1
+    # следующий отчёт по тому же шаблону – без поиска
+    assert find_headers_any(make_sheet()) == (5, 2, 3)
+    assert header_locator.cache_info()['hits'] == 1
+
+
+def test_changed_template_is_detected_again():
+    header_locator.clear_cache()
+    find_headers_any(make_sheet())
+    assert find_headers_any(make_sheet(header_row=7)) == (7, 2, 3)
+    assert header_locator.cache_info()['misses'] == 2
+
+
+def test_missing_date_column_is_added_on_hit_too():
+    header_locator.clear_cache()
+    for _ in range(2):
+        ws = make_sheet(with_date_col=False)
+        assert find_headers_any(ws) == (5, 2, 3)
+        assert ws.cell(5,3).value == 'Дата и время выхода в эфир'
+    assert header_locator.cache_info()['hits'] == 1
+
+
+def test_scan_is_bounded():
+    header_locator.clear_cache()
+    ws = make_sheet(header_row=header_locator.HEADER_SCAN_ROWS + 10)
+    found = header_locator.locate_header(ws, 'any-title', lambda values: True if 'Наименование аудиовизуального произведения (номер и название серии)' in values else None)
+    assert found is None
+
+
+def test_earlier_matching_row_wins_over_cached_header():
+    header_locator.clear_cache()
+    assert find_headers_any(make_sheet()) == (5, 2, 3)
+    # та же строка заголовков на своём месте, но выше теперь подходит другая строка
+    ws = make_sheet()
+    ws.cell(2,1).value = 'Наименование программы'
+    assert find_headers_any(ws) == (2, 1, 4)
+    assert header_locator.cache_info()['hits'] == 0
+    # свежий поиск даёт то же самое
+    header_locator.clear_cache()
+    ws = make_sheet()
+    ws.cell(2,1).value = 'Наименование программы'
+    assert find_headers_any(ws) == (2, 1, 4)
@@ -0,0 +1,84 @@
+import os
+
+from backend.jobs import JobStore, STATE_DONE, STATE_FAILED, STATE_RUNNING
+
+
+def make_store(tmp_path, **kw):
+    opts = dict(ttl_seconds=60, max_total_bytes=1000, max_active=2)
+    opts.update(kw)
+    return JobStore(str(tmp_path), **opts)
+
+
+def test_job_lifecycle(tmp_path):
+    store = make_store(tmp_path)
+    job = store.create('rus')
+    store.start(job['id'])
+    store.update_progress(job['id'], 'match', 5, 10)
+    view = store.public_view(store.get(job['id']))
+    assert view['state'] == STATE_RUNNING and view['progress']['percent'] == 50.0
+    store.finish(job['id'], [b'abc', b'def'], 'text/csv', 'r.csv')
+    job = store.get(job['id'])
+    assert job['state'] == STATE_DONE and job['result_size'] == 6
+    with open(job['result_path'], 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_active_limit(tmp_path):
+    store = make_store(tmp_path)
+    first = store.create('rus')
+    assert store.create('rus') is not None
+    assert store.create('rus') is None
+    store.fail(first['id'], 'boom')
+    assert store.get(first['id'])['state'] == STATE_FAILED
+    assert store.create('rus') is not None
+
+
+def test_evict_by_ttl_and_size(tmp_path):
+    store = make_store(tmp_path, max_total_bytes=10, max_active=10)
+    ids = []
+    for _ in range(3):
+        job = store.create('rus')
+        store.start(job['id'])
+        store.finish(job['id'], [b'x' * 4], 'text/plain', 'r.txt')
+        ids.append(job['id'])
+    # 12 байт > 10 – самый старый результат удалён
+    assert store.get(ids[0]) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), ids[0]))
+    assert store.get(ids[2]) is not None
+    finished_at = store.get(ids[2])['finished_at']
+    assert store.evict(now=finished_at + 61) == 2
+    assert store.get(ids[2]) is None
+
+
+def test_job_version_tracks_changes(tmp_path):
+    store = make_store(tmp_path)
+    job = store.create('rus')
+    versions = [store.get(job['id'])['version']]
+    store.start(job['id'])
+    versions.append(store.get(job['id'])['version'])
+    store.update_progress(job['id'], 'match', 50, 100)
+    versions.append(store.get(job['id'])['version'])
+    store.finish(job['id'], [b'x'], 'text/csv', 'r.csv')
+    versions.append(store.get(job['id'])['version'])
+    assert versions == sorted(set(versions))
+
+
+def test_cancel_and_remove(tmp_path):
+    store = make_store(tmp_path)
+    job = store.create('rus')
+    store.start(job['id'])
+    assert store.cancel(job['id'])
+    assert store.get(job['id'])['state'] == 'cancelled'
+    # результат, досчитанный после отмены, не сохраняется
+    store.finish(job['id'], [b'x'], 'text/csv', 'r.csv')
+    assert store.get(job['id'])['state'] == 'cancelled'
+    assert not os.path.exists(os.path.join(str(tmp_path), job['id']))
+    assert not store.cancel(job['id'])
+    # отменённые задания учитываются в метриках отдельно
+    assert store.counts()['cancelled'] == 1
+
+    done = store.create('rus')
+    store.finish(done['id'], [b'x'], 'text/csv', 'r.csv')
+    assert store.remove(done['id'])
+    assert store.get(done['id']) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), done['id']))
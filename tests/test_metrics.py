@@ -0,0 +1,43 @@
+from backend.metrics import Registry
+
+
+def test_counter_and_histogram_exposition():
+    reg = Registry()
+    requests = reg.counter('app_requests_total', 'Requests', ('endpoint', 'status'))
+    latency = reg.histogram('app_seconds', 'Latency', ('endpoint',), buckets=(0.1, 1))
+    requests.inc(endpoint='rus', status=200)
+    requests.inc(2, endpoint='rus', status=200)
+    latency.observe(0.05, endpoint='rus')
+    latency.observe(0.5, endpoint='rus')
+    latency.observe(5, endpoint='rus')
+
+    lines = reg.render().splitlines()
+    assert '# TYPE app_requests_total counter' in lines
+    assert 'app_requests_total{endpoint="rus",status="200"} 3' in lines
+    assert 'app_seconds_bucket{endpoint="rus",le="0.1"} 1' in lines
+    assert 'app_seconds_bucket{endpoint="rus",le="1"} 2' in lines
+    assert 'app_seconds_bucket{endpoint="rus",le="+Inf"} 3' in lines
+    assert 'app_seconds_count{endpoint="rus"} 3' in lines
+    assert 'app_seconds_sum{endpoint="rus"} 5.55' in lines
+
+
+def test_callback_metric_and_label_escaping():
+    reg = Registry()
+    reg.callback('app_jobs', 'Jobs', lambda: {'queued': 2, 'done': 1}, ('state',))
+    reg.callback('app_workers', 'Workers', lambda: 4)
+    reg.counter('app_errors_total', 'Errors', ('file',)).inc(file='a"b\\c')
+    text = reg.render()
+    assert 'app_jobs{state="done"} 1' in text
+    assert 'app_workers 4' in text
+    assert 'app_errors_total{file="a\\"b\\\\c"} 1' in text
+
+
+def test_observe_matcher():
+    from backend import metrics
+    matcher = {'calls': 3, 'reused': 2, 'keys_scored': 6, 'keys_pruned': 1, 'candidates': 2,
+               'no_candidates': 1, 'empty': 1, 'strategies': {'fallback': 2}, 'norm_cache': {'hits': 5, 'misses': 1}}
+    metrics.observe_matcher('test', matcher)
+    assert metrics.MATCHER_KEYS.value(endpoint='test', result='scored') == 6
+    assert metrics.MATCHER_RESULTS.value(endpoint='test', strategy='empty') == 1
+    assert metrics.MATCHER_NORM_CACHE.value(endpoint='test', result='hit') == 5
+    assert 'vyborg_matcher_keys_total{endpoint="test",result="pruned"} 1' in metrics.REGISTRY.render()
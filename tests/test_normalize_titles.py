@@ -1,4 +1,3 @@
-import pytest
 from backend.processors.normalize_titles import split_base_episodes, norm
 
 def test_split_single_episode():
@@ -20,3 +19,23 @@ def test_split_none():
     assert base == 'новости'
     assert eps == set()
 
+
+def test_normalize_many_aligned_with_single_titles():
+    from backend.processors.normalize_titles import normalize_many
+    from backend.processors.title_normalizer import normalize_title
+    titles = ['Гора самоцветов. 63 серия', None, 'Новости', 'Гора самоцветов. 63 серия', 'Гора 1-120']
+    batch = normalize_many(titles)
+    assert len(batch.unique) == 3
+    assert batch.bases == ['гора самоцветов', None, 'новости', 'гора самоцветов', 'гора']
+    assert batch.episodes[4] == ((1, 120),)
+    assert batch.token_ids[0] == batch.token_ids[3] and batch.token_ids[1] == ()
+    for i, title in enumerate(titles):
+        if title is not None:
+            assert batch.title(i) == normalize_title(title)
+
+def test_normalize_many_schedule():
+    import pandas as pd
+    from backend.processors.normalize_titles import normalize_many
+    batch = normalize_many(pd.Series(['Гора самоцветов 63,64', 'Новости']), schedule=True)
+    assert batch.bases == ['гора самоцветов', 'новости']
+    assert batch.episodes == [((63, 64),), ()]
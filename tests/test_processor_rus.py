@@ -0,0 +1,100 @@
+import io
+import threading
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from backend.processors import processor_rus
+from backend.processors.results import ProcessingCancelled, iter_csv, iter_ndjson
+
+
+def make_schedule_bytes():
+    wb = Workbook(); ws = wb.active
+    ws.cell(1,2).value = 'Понедельник, 1 сентября 2025'
+    ws.cell(2,1).value = '06:00'; ws.cell(2,2).value = 'Новости'
+    ws.cell(3,1).value = '08:00'; ws.cell(3,2).value = 'Гора самоцветов. 63 серия'
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+
+def fill_report_sheet(ws, titles):
+    ws.cell(1,1).value = 'Наименование аудиовизуального произведения (номер и название серии)'
+    ws.cell(1,2).value = 'Дата и время выхода в эфир (число, часы, мин.)'
+    for r, title in enumerate(titles, start=2):
+        ws.cell(r,1).value = title
+
+
+def make_report_bytes():
+    wb = Workbook(); ws = wb.active
+    ws.title = 'росийские произведения'
+    fill_report_sheet(ws, ['Гора самоцветов. 63 серия', 'Новости', 'Несуществующая'])
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+
+def make_combined_report_bytes():
+    wb = Workbook(); ws = wb.active
+    ws.title = 'росийские произведения'
+    fill_report_sheet(ws, ['Гора самоцветов. 63 серия'])
+    fill_report_sheet(wb.create_sheet('иностранные произведения'), ['Новости', 'Несуществующая'])
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+
+def test_run_xlsx():
+    result = processor_rus.run(make_schedule_bytes(), make_report_bytes(), {'delete_unmatched': False})
+    assert result.xlsx is not None
+    ws = load_workbook(io.BytesIO(result.xlsx)).active
+    assert ws.cell(2,2).value == '01.09.2025 в 8:00'
+    assert ws.cell(3,2).value == '01.09.2025 в 6:00'
+    assert ws.cell(4,2).value is None
+    assert result.stats['matched'] == 2 and result.stats['unmatched'] == 1
+    assert {'schedule_parse', 'index_build', 'load', 'header_detect', 'match', 'save'} <= set(result.stats['timings'])
+
+
+def test_run_json_skips_workbook():
+    result = processor_rus.run(make_schedule_bytes(), make_report_bytes(), {'output': 'json'})
+    assert result.xlsx is None
+    by_row = {rec['row']: rec for rec in result.records}
+    assert by_row[2]['episodes'] == [63]
+    assert by_row[2]['airtimes'] == ['2025-09-01T08:00']
+    assert by_row[2]['resolved_base'] == 'гора самоцветов'
+    assert by_row[2]['strategy'] == 'exact_episode'
+    assert by_row[4]['airtimes'] == [] and by_row[4]['strategy'] is None
+    lines = b''.join(iter_ndjson(result.records)).decode('utf-8').splitlines()
+    assert len(lines) == 3
+
+
+def test_matcher_stats():
+    result = processor_rus.run(make_schedule_bytes(), make_report_bytes(), {'output': 'json'})
+    m = result.stats['matcher']
+    assert m['calls'] == 3 and m['reused'] == 0
+    # в индексе два ключа: «новости» и 63-я серия «горы самоцветов»
+    assert m['keys_scored'] == 6 and 'rapidfuzz_calls' not in m
+    assert sum(m['strategies'].values()) + m['empty'] == m['calls']
+    assert set(m['norm_cache']) == {'hits', 'misses'}
+
+
+def test_records_csv():
+    result = processor_rus.run(make_schedule_bytes(), make_report_bytes(), {'output': 'csv'})
+    text = b''.join(iter_csv(result.records)).decode('utf-8-sig')
+    header, first = text.splitlines()[:2]
+    assert header.startswith('sheet,row,title')
+    assert '2025-09-01T08:00' in first
+
+
+def test_run_multiple_sheets():
+    params = {'sheet_names': ['росийские произведения', 'иностранные произведения'], 'delete_unmatched': True}
+    result = processor_rus.run(make_schedule_bytes(), make_combined_report_bytes(), params)
+    assert result.stats['matched'] == 2 and result.stats['unmatched'] == 1
+    assert set(result.stats['sheets']) == {'росийские произведения', 'иностранные произведения'}
+    wb = load_workbook(io.BytesIO(result.xlsx))
+    assert wb['росийские произведения'].cell(2,2).value == '01.09.2025 в 8:00'
+    foreign = wb['иностранные произведения']
+    assert foreign.cell(2,2).value == '01.09.2025 в 6:00'
+    # строка без совпадений удалена
+    assert foreign.cell(3,1).value is None
+
+
+def test_run_cancelled():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ProcessingCancelled):
+        processor_rus.run(make_schedule_bytes(), make_report_bytes(), {}, cancel=cancel)
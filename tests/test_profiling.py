@@ -0,0 +1,61 @@
+import os
+import pstats
+
+import pytest
+
+from backend.profiling import ProfileStore, check_admin, profile_call, profile_paths
+
+
+def _work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_check_admin():
+    assert check_admin('secret', 'secret')
+    assert not check_admin('wrong', 'secret')
+    assert not check_admin(None, 'secret')
+    # без токена в настройках профилирование выключено
+    assert not check_admin('', None)
+
+
+def test_profile_call_writes_stats_and_table(tmp_path):
+    store = ProfileStore(str(tmp_path), 10, 10 ** 9)
+    profile_id = store.new_id()
+    result, info = profile_call(str(tmp_path), profile_id, _work, 1000, memory=True, top_n=5)
+    assert result == _work(1000)
+    assert info['id'] == profile_id and info['peak_bytes'] > 0
+    prof_path, txt_path = store.paths(profile_id)
+    assert pstats.Stats(prof_path).total_calls > 0
+    table = open(txt_path, encoding='utf-8').read()
+    assert '_work' in table and 'Память' in table
+
+
+def test_profile_written_on_error(tmp_path):
+    with pytest.raises(ZeroDivisionError):
+        profile_call(str(tmp_path), 'a' * 32, lambda: 1 / 0)
+    assert all(os.path.exists(p) for p in profile_paths(str(tmp_path), 'a' * 32))
+
+
+def test_store_evicts_oldest(tmp_path):
+    store = ProfileStore(str(tmp_path), 2, 10 ** 9)
+    ids = []
+    for i in range(3):
+        profile_id = store.new_id()
+        profile_call(str(tmp_path), profile_id, _work, 10)
+        for path in profile_paths(str(tmp_path), profile_id):
+            os.utime(path, (1000 + i, 1000 + i))
+        ids.append(profile_id)
+    assert store.evict() == 1
+    assert [item['profile_id'] for item in store.list()] == [ids[2], ids[1]]
+    assert store.paths(ids[0]) is None
+    assert store.paths('../etc/passwd') is None
+
+
+def test_evict_keeps_requested_profile(tmp_path):
+    store = ProfileStore(str(tmp_path), 0, 10 ** 9)
+    old, new = store.new_id(), store.new_id()
+    for profile_id in (old, new):
+        profile_call(str(tmp_path), profile_id, _work, 10)
+    assert store.evict(keep=new) == 1
+    assert [item['profile_id'] for item in store.list()] == [new]
+    assert store.evict() == 1 and store.list() == []
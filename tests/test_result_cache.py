@@ -0,0 +1,62 @@
+import os
+
+from backend.result_cache import ResultCache, make_key
+
+
+def test_make_key_normalizes_params():
+    a = make_key('rus', 's', 'r', {'max_shows': 3, 'output': 'xlsx', 'sheet_name': None}, '1')
+    b = make_key('rus', 's', 'r', {'output': 'xlsx', 'max_shows': 3}, '1')
+    assert a == b
+    assert a != make_key('rus', 's', 'r', {'output': 'xlsx', 'max_shows': 3}, '2')
+    assert a != make_key('foreign', 's', 'r', {'output': 'xlsx', 'max_shows': 3}, '1')
+
+
+def test_put_get_and_reload(tmp_path):
+    cache = ResultCache(str(tmp_path), ttl_seconds=60, max_total_bytes=1000)
+    assert cache.get('k') is None
+    cache.put('k', [b'abc', b'def'], 'text/csv', 'r.csv', {'X-Test': '1'})
+    entry = cache.get('k')
+    with open(entry['path'], 'rb') as f:
+        assert f.read() == b'abcdef'
+    assert entry['filename'] == 'r.csv' and entry['headers'] == {'X-Test': '1'}
+    assert cache.info()['hits'] == 1 and cache.info()['misses'] == 1
+
+    # после перезапуска записи подхватываются с диска
+    assert ResultCache(str(tmp_path), ttl_seconds=60, max_total_bytes=1000).get('k') is not None
+
+
+def test_evicts_by_ttl_and_size(tmp_path):
+    cache = ResultCache(str(tmp_path), ttl_seconds=60, max_total_bytes=10)
+    cache.put('old', [b'x' * 6], 'text/csv', 'a.csv')
+    cache.put('new', [b'y' * 6], 'text/csv', 'b.csv')
+    assert cache.get('old') is None and cache.get('new') is not None
+    assert not os.path.exists(tmp_path / 'old')
+
+    entry = cache.get('new')
+    assert cache.evict(now=entry['created_at'] + 61) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_pinned_entry_survives_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), ttl_seconds=60, max_total_bytes=10)
+    cache.put('a', [b'x' * 6], 'text/csv', 'a.csv')
+    entry = cache.get('a', pin=True)
+    # новый результат сверх лимита объёма не удаляет файл, который сейчас отдаётся
+    cache.put('b', [b'y' * 6], 'text/csv', 'b.csv')
+    with open(entry['path'], 'rb') as f:
+        assert f.read() == b'x' * 6
+    assert cache.evict(now=entry['created_at'] + 61) == 0
+    assert os.path.exists(entry['path'])
+
+    # после release запись снова обычная: вытесняется следующим результатом
+    cache.release('a')
+    cache.put('c', [b'z' * 6], 'text/csv', 'c.csv')
+    assert cache.get('a') is None and not os.path.exists(entry['path'])
+    assert cache.get('c') is not None
+
+
+def test_missing_file_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path), ttl_seconds=60, max_total_bytes=1000)
+    entry = cache.put('k', [b'abc'], 'text/csv', 'r.csv')
+    os.remove(entry['path'])
+    assert cache.get('k') is None and cache.info()['entries'] == 0
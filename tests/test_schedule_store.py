@@ -0,0 +1,20 @@
+from backend.schedule_store import ScheduleStore
+
+
+def test_schedule_store_lru():
+    store = ScheduleStore(max_items=2)
+    a = store.add({'a': 1}, {'keys': 1}, 'a.xlsx')
+    b = store.add({'b': 1}, {'keys': 1}, 'b.xlsx')
+    assert store.get(a)['filename'] == 'a.xlsx'  # a становится самым свежим
+    c = store.add({'c': 1}, {'keys': 1})
+    assert store.get(b) is None
+    assert store.get(a) is not None and store.get(c) is not None
+    assert len(store) == 2
+
+
+def test_schedule_store_remove():
+    store = ScheduleStore(max_items=4)
+    sid = store.add({}, {})
+    assert store.remove(sid)
+    assert not store.remove(sid)
+    assert store.get(sid) is None
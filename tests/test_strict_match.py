@@ -0,0 +1,54 @@
+import io
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+
+from backend.processors.strict_match import build_schedule_index, fill_report_date_time_strict
+
+
+def _schedule_bytes():
+    wb = Workbook()
+    ws = wb.active
+    for row in [
+        [None, '02.09.2025'],
+        ['21:00', 'Северный берег. 3 серия'],
+        ['08:00', 'Новости'],
+        ['08:00', 'Новости'],            # дубликат точного времени
+        [None, '01.09.2025'],
+        ['09:30', 'Новости'],
+        ['20:00', 'Северный берег. 3 серия'],
+    ]:
+        ws.append(row)
+    bio = io.BytesIO(); wb.save(bio)
+    return bio.getvalue()
+
+
+def test_index_sorted_with_title_map():
+    index, collisions = build_schedule_index(_schedule_bytes())
+    assert collisions == 1
+    news = index.by_title[('новости', None)]
+    assert [dt for dt, _ in news] == [datetime(2025, 9, 1, 9, 30), datetime(2025, 9, 2, 8, 0)]
+    series = index.by_title[('северный берег.', 3)]
+    assert [dt for dt, _ in series] == [datetime(2025, 9, 1, 20, 0), datetime(2025, 9, 2, 21, 0)]
+    assert sum(len(shows) for shows in index.values()) == sum(len(shows) for shows in index.by_title.values())
+
+
+def test_fill_with_and_without_date(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'росийские произведения'
+    ws.append(['Наименование аудиовизуального произведения', 'Дата', 'Время'])
+    ws.append(['Новости', '02.09.2025', None])             # дата есть в сетке
+    ws.append(['Северный берег. 3 серия', None, None])     # без даты – самый ранний показ
+    ws.append(['Новости', '05.09.2025', None])             # даты нет в сетке – ищем по всем датам
+    ws.append(['Другое', None, None])
+    path = tmp_path / 'report.xlsx'
+    wb.save(path)
+
+    stats = fill_report_date_time_strict(_schedule_bytes(), str(path))
+    assert stats['matched'] == 3 and stats['missed'] == 1 and stats['multi_matches'] == 2
+    rows = list(load_workbook(path).active.iter_rows(min_row=2, values_only=True))
+    assert rows[0][1:] == ('02.09.2025', '08:00:00')
+    assert rows[1][1:] == ('01.09.2025', '20:00:00')
+    assert rows[2][1:] == ('01.09.2025', '09:30:00')
+    assert rows[3][1:] == (None, None)
@@ -0,0 +1,31 @@
+from backend.processors import title_normalizer as tn
+from backend.processors.shared import extract_series_set, normalize_base
+from backend.processors.strict_match import split_title_episode
+
+
+def test_normalize_title_parts():
+    title = tn.normalize_title('Фильм Гора самоцветов (ред). 63 эпизод.mp4')
+    assert title.text == 'фильм гора самоцветов. 63 серия'
+    assert title.base == 'фильм гора самоцветов'
+    assert title.episodes == ((63, 63),)
+    assert title.tokens == ('гора', 'самоцветов')
+
+
+def test_series_title_matches_shared():
+    raw = '12345_Гора самоцветов 1-3 сер HD'
+    assert tn.series_title(raw) == (normalize_base(raw), ((1, 3),))
+    assert extract_series_set(raw) == {1, 2, 3}
+    assert extract_series_set('Новости') == set()
+
+
+def test_strict_title_episode():
+    assert split_title_episode('123456 Гора самоцветов 5 серия') == ('гора самоцветов', 5)
+    assert split_title_episode('Гора самоцветов 5') == ('гора самоцветов 5', 5)
+
+
+def test_cache_reuses_results():
+    tn.clear_cache()
+    first = tn.normalize_title('Гора самоцветов 63-64')
+    assert tn.normalize_title('Гора самоцветов 63-64') is first
+    info = tn.cache_info()
+    assert info['hits'] >= 1 and info['size'] >= 1
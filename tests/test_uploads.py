@@ -0,0 +1,38 @@
+import asyncio
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from backend.uploads import spool_upload
+
+XLSX_LIKE = b"PK\x03\x04" + b"x" * 5000
+
+
+def spool(tmp_path, data, filename='r.xlsx', max_size=10_000):
+    upload = UploadFile(file=BytesIO(data), filename=filename)
+    return asyncio.run(spool_upload(upload, str(tmp_path), max_size, ['.xls', '.xlsx']))
+
+
+def test_spool_upload_writes_file_and_hash(tmp_path):
+    spooled = spool(tmp_path, XLSX_LIKE)
+    assert spooled.size == len(XLSX_LIKE)
+    assert spooled.sha256 == hashlib.sha256(XLSX_LIKE).hexdigest()
+    with open(spooled.path, 'rb') as f:
+        assert f.read() == XLSX_LIKE
+    spooled.cleanup()
+    assert not os.path.exists(spooled.path)
+
+
+@pytest.mark.parametrize('data,filename,max_size,status', [
+    (XLSX_LIKE, 'r.csv', 10_000, 415),
+    (b'not a zip', 'r.xlsx', 10_000, 415),
+    (XLSX_LIKE, 'r.xlsx', 1000, 413),
+])
+def test_spool_upload_rejects(tmp_path, data, filename, max_size, status):
+    with pytest.raises(HTTPException) as exc:
+        spool(tmp_path, data, filename, max_size)
+    assert exc.value.status_code == status
+    assert os.listdir(tmp_path) == []
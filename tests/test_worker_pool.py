@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from openpyxl import Workbook
+
+# воркеры импортируют процессоры так же, как main: каталог backend в sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend'))
+
+from processors.results import ProcessingCancelled  # noqa: E402
+from worker_pool import WorkerPool, build_index, run_processor  # noqa: E402
+
+
+def _files(tmp_path):
+    grid = Workbook()
+    ws = grid.active
+    ws.append([None, 'Понедельник, 1 сентября 2025'])
+    ws.append(['06:00', 'Новости'])
+    ws.append(['07:00', 'Северный берег. 3 серия'])
+    report = Workbook()
+    ws = report.active
+    ws.title = 'росийские произведения'
+    ws.append(['Наименование аудиовизуального произведения', 'Дата и время выхода в эфир'])
+    ws.append(['Новости'])
+    ws.append(['Северный берег 3 серия'])
+    paths = []
+    for name, wb in (('grid.xlsx', grid), ('report.xlsx', report)):
+        paths.append(str(tmp_path / name))
+        wb.save(paths[-1])
+    return paths
+
+
+def _run(pool, *args):
+    return asyncio.run(pool.run(*args))
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_pool_runs_and_cancels(tmp_path, workers):
+    grid, report = _files(tmp_path)
+    events = []
+    pool = WorkerPool(workers, on_progress=lambda *event: events.append(event))
+    pool.start()
+    try:
+        result = _run(pool, run_processor, 'rus', grid, report, {'output': 'json'}, 'job1', None, pool.cancel_token())
+        assert result.stats['matched'] == 2
+        index = _run(pool, build_index, grid)
+        assert _run(pool, run_processor, 'rus', None, report, {'output': 'json'}, None, index).stats['matched'] == 2
+
+        # выставленный токен отмены останавливает обработку в воркере
+        cancel = pool.cancel_token()
+        cancel.set()
+        with pytest.raises(ProcessingCancelled):
+            _run(pool, run_processor, 'rus', grid, report, {'output': 'json'}, None, None, cancel)
+    finally:
+        pool.shutdown()
+    # прогресс задания дошёл из воркера до on_progress
+    assert ('job1', 'load', None, None) in events
+    assert pool._executor is None and pool._manager is None and pool._progress_queue is None
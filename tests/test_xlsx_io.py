@@ -0,0 +1,44 @@
+import io
+import zipfile
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from backend.processors.xlsx_io import resolve_compression, save_workbook, workbook_to_bytes
+
+
+def make_workbook():
+    wb = Workbook(); ws = wb.active
+    for r in range(1, 200):
+        ws.cell(r,1).value = f'Гора самоцветов. {r} серия'
+        ws.cell(r,2).value = '01.09.2025 в 8:00'
+    return wb
+
+
+def test_resolve_compression():
+    assert resolve_compression(None) == ('default', 6)
+    assert resolve_compression('Fast') == ('fast', 1)
+    assert resolve_compression('store') == ('store', 0)
+    assert resolve_compression('9') == ('9', 9)
+    with pytest.raises(ValueError):
+        resolve_compression('zstd')
+    with pytest.raises(ValueError):
+        resolve_compression(11)
+
+
+def test_store_and_deflate_roundtrip():
+    stored, stored_stats = workbook_to_bytes(make_workbook(), 'store')
+    packed, packed_stats = workbook_to_bytes(make_workbook(), 'best')
+    assert stored_stats['saved_bytes'] == 0
+    assert packed_stats['saved_bytes'] > 0
+    assert len(packed) < len(stored)
+    with zipfile.ZipFile(io.BytesIO(stored)) as zf:
+        assert all(i.compress_type == zipfile.ZIP_STORED for i in zf.infolist())
+    ws = load_workbook(io.BytesIO(packed)).active
+    assert ws.cell(5,1).value == 'Гора самоцветов. 5 серия'
+
+
+def test_save_to_path(tmp_path):
+    path = tmp_path / 'out.xlsx'
+    stats = save_workbook(make_workbook(), str(path), 'fast')
+    assert stats['compression'] == 'fast' and stats['seconds'] >= 0
+    assert load_workbook(str(path)).active.cell(1,2).value == '01.09.2025 в 8:00'